@@ -1,9 +1,10 @@
 from django.contrib import admin
 from account.models import User
+from holidaybooking.admin import PerformanceAdminMixin
 
 
 @admin.register(User)
-class UserAdmin(admin.ModelAdmin):
+class UserAdmin(PerformanceAdminMixin, admin.ModelAdmin):
     """
     Register customized user model in admin site
     """
@@ -0,0 +1,140 @@
+"""
+Jwt authentication resolving users from signed token claims without loading them from the database.
+
+Tokens carry the user role, superuser and active flags and a fingerprint of the user state they were issued for.
+The current fingerprint of each user is cached, users are built from token claims while both fingerprints match and
+loaded from the primary database otherwise. Cached fingerprints are tagged with the user generation read before the
+user row, user changes replace the generation once committed so fingerprints of rows read before the change are never
+matched again, see account.signals.
+"""
+import time
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.crypto import salted_hmac
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+from holidaybooking import metrics
+
+# Define user fields copied into token claims and fields whose changes make issued tokens stale
+CLAIM_FIELDS = ['role', 'is_superuser', 'is_active']
+FINGERPRINT_FIELDS = CLAIM_FIELDS + ['password']
+FINGERPRINT_CLAIM = 'state'
+
+# Define user lookups of authenticated requests by result
+user_lookups = metrics.counter(
+    'auth_user_lookups_total', 'Users of authenticated requests by cached fingerprint lookup result', ['result'])
+
+
+def get_user_fingerprint(user):
+    """
+    Get fingerprint of user fields granting access, password is included so password changes revoke tokens
+    :param user:
+    :return:
+    """
+    state = '|'.join(str(getattr(user, field)) for field in FINGERPRINT_FIELDS)
+    return salted_hmac('account.authentication.fingerprint', state).hexdigest()[:32]
+
+
+def get_user_cache_key(user_id):
+    return f'auth-user:{user_id}'
+
+
+def get_user_generation_key(user_id):
+    return f'auth-user-generation:{user_id}'
+
+
+def replace_user_generation(user_id):
+    """
+    Replace generation of a user so cached fingerprints of the user, including ones written late by requests that
+    read the user row before the change, no longer match
+    :param user_id:
+    :return:
+    """
+    cache.set(get_user_generation_key(user_id), time.time_ns(), None)
+    cache.delete(get_user_cache_key(user_id))
+
+
+def add_user_claims(token, user):
+    """
+    Add claims of user fields read by permission classes and fingerprint of user state to a token
+    :param token:
+    :param user:
+    :return:
+    """
+    for field in CLAIM_FIELDS:
+        token[field] = getattr(user, field)
+    token[FINGERPRINT_CLAIM] = get_user_fingerprint(user)
+    return token
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    Create jwt authentication building users from token claims while the cached user fingerprint matches the token
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+        fingerprint = validated_token.get(FINGERPRINT_CLAIM)
+        if fingerprint is None:
+            # Tokens issued without user claims are resolved from the database until they expire
+            user_lookups.inc(result='unclaimed')
+            return self.load_user(user_id, validated_token)
+
+        key = get_user_cache_key(user_id)
+        generation_key = get_user_generation_key(user_id)
+        # Read generation before the user row so a change committed in between replaces it
+        cached = cache.get_many([key, generation_key])
+        generation = cached.get(generation_key)
+        entry = cached.get(key)
+        if entry == (generation, fingerprint):
+            if not validated_token['is_active']:
+                raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+            user_lookups.inc(result='hit')
+            return self.build_user(user_id, validated_token)
+
+        user = self.load_user(user_id, validated_token)
+        cache.set(key, (generation, get_user_fingerprint(user)), settings.AUTH_USER_CACHE_TIMEOUT)
+        user_lookups.inc(result='miss' if entry is None else 'stale')
+        return user
+
+    def load_user(self, user_id, validated_token):
+        """
+        Load user of a token from the primary database with the checks of jwt authentication, replicas may not
+        have replayed a deactivation or password change yet
+        :param user_id:
+        :param validated_token:
+        :return:
+        """
+        try:
+            user = self.user_model.objects.using(DEFAULT_DB_ALIAS).get(**{api_settings.USER_ID_FIELD: user_id})
+        except self.user_model.DoesNotExist:
+            raise AuthenticationFailed(_('User not found'), code='user_not_found')
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+        if api_settings.CHECK_REVOKE_TOKEN and \
+                validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+            raise AuthenticationFailed(_('The user\'s password has been changed.'), code='password_changed')
+        return user
+
+    def build_user(self, user_id, validated_token):
+        """
+        Build user instance from token claims as if loaded from the database, fields missing from claims are
+        deferred and loaded on access
+        :param user_id:
+        :param validated_token:
+        :return:
+        """
+        user_model = get_user_model()
+        # Token user id claims are strings
+        user_id = user_model._meta.get_field(api_settings.USER_ID_FIELD).to_python(user_id)
+        values = {api_settings.USER_ID_FIELD: user_id, **{field: validated_token[field] for field in CLAIM_FIELDS}}
+        field_names = [field.attname for field in user_model._meta.concrete_fields if field.attname in values]
+        return user_model.from_db(DEFAULT_DB_ALIAS, field_names, [values[field] for field in field_names])
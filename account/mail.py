@@ -0,0 +1,54 @@
+import base64
+import functools
+from django.conf import settings
+from django.core.mail.backends.base import BaseEmailBackend
+from django.db import transaction
+from account.tasks import send_emails
+
+
+def serialize_message(message):
+    """
+    Serialize email message with its html alternatives and file attachments into json data for the task queue
+    :param message:
+    :return:
+    """
+    attachments = []
+    for filename, content, mimetype in message.attachments:
+        # Send binary attachment content as base64 text
+        if isinstance(content, bytes):
+            attachments.append({'filename': filename, 'content': base64.b64encode(content).decode(),
+                                'mimetype': mimetype, 'base64': True})
+        else:
+            attachments.append({'filename': filename, 'content': content, 'mimetype': mimetype, 'base64': False})
+    return {
+        'subject': message.subject,
+        'body': message.body,
+        'from_email': message.from_email,
+        'to': message.to,
+        'cc': message.cc,
+        'bcc': message.bcc,
+        'reply_to': message.reply_to,
+        'headers': message.extra_headers,
+        'alternatives': getattr(message, 'alternatives', []),
+        'attachments': attachments,
+    }
+
+
+class CeleryEmailBackend(BaseEmailBackend):
+    """
+    Create email backend queueing messages to the celery mail queue in batches once the current transaction commits,
+    workers send them with the backend set in EMAIL_DELIVERY_BACKEND
+    """
+
+    def send_messages(self, email_messages):
+        messages = [serialize_message(message) for message in email_messages]
+        for start in range(0, len(messages), settings.EMAIL_BATCH_SIZE):
+            transaction.on_commit(functools.partial(self.enqueue, messages[start:start + settings.EMAIL_BATCH_SIZE]))
+        return len(messages)
+
+    def enqueue(self, messages):
+        try:
+            send_emails.delay(messages)
+        except Exception:
+            if not self.fail_silently:
+                raise
@@ -1,5 +1,12 @@
 from django.contrib.auth import get_user_model
+from django.db import DEFAULT_DB_ALIAS
 from djoser import serializers
+from rest_framework_simplejwt import serializers as jwt_serializers
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.tokens import AccessToken
+from rest_framework_simplejwt.utils import get_md5_hash_password
+from account.authentication import add_user_claims
 
 # Use get user model method which is a lookup method for AUTH_USER_MODEL in settings
 User = get_user_model()
@@ -13,3 +20,31 @@ class UserCreateSerializer(serializers.UserCreateSerializer):
     class Meta(serializers.UserCreateSerializer.Meta):
         model = User
         fields = ['id', 'email', 'password', 'first_name', 'last_name', 'role', 'date_of_birth', 'photo']
+
+
+class TokenObtainPairSerializer(jwt_serializers.TokenObtainPairSerializer):
+    """
+    Extend token obtain serializer to add user claims read by cached jwt authentication
+    """
+
+    @classmethod
+    def get_token(cls, user):
+        return add_user_claims(super().get_token(user), user)
+
+
+class TokenRefreshSerializer(jwt_serializers.TokenRefreshSerializer):
+    """
+    Extend token refresh serializer to issue access tokens with claims of the current user state
+    """
+
+    def validate(self, attrs):
+        data = super().validate(attrs)
+        access = AccessToken(data['access'])
+        user = User.objects.using(DEFAULT_DB_ALIAS).get(
+            **{api_settings.USER_ID_FIELD: access[api_settings.USER_ID_CLAIM]})
+        # Refuse to refresh tokens issued before the password of their user changed
+        if api_settings.CHECK_REVOKE_TOKEN and \
+                access.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+            raise AuthenticationFailed('The user\'s password has been changed.', code='password_changed')
+        data['access'] = str(add_user_claims(access, user))
+        return data
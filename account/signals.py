@@ -0,0 +1,22 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from account.authentication import FINGERPRINT_FIELDS, replace_user_generation
+from account.models import User
+
+
+@receiver([post_save, post_delete], sender=User)
+def invalidate_user_fingerprint(sender, instance, update_fields=None, **kwargs):
+    """
+    Create a signal to replace generation of a user when fields granting access change or the user is deleted, so
+    tokens issued before the change are resolved from the primary database
+    :param sender:
+    :param instance:
+    :param update_fields:
+    :param kwargs:
+    :return:
+    """
+    if update_fields and not set(update_fields) & set(FINGERPRINT_FIELDS):
+        return
+    user_id = instance.pk
+    transaction.on_commit(lambda: replace_user_generation(user_id))
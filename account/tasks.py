@@ -0,0 +1,102 @@
+import base64
+import logging
+import smtplib
+from celery import shared_task
+from celery.utils.time import get_exponential_backoff_interval
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+
+logger = logging.getLogger(__name__)
+
+# Keep delivery connection of the worker process open across tasks
+delivery_connection = None
+
+
+def get_delivery_connection():
+    """
+    Get open connection of the delivery email backend reused by send email tasks of the worker process
+    :return:
+    """
+    global delivery_connection
+    if delivery_connection is None:
+        delivery_connection = get_connection(settings.EMAIL_DELIVERY_BACKEND)
+    # Opening an open connection is a no-op, and backends keep connections opened before sending open
+    delivery_connection.open()
+    return delivery_connection
+
+
+def close_delivery_connection():
+    global delivery_connection
+    if delivery_connection is not None:
+        try:
+            delivery_connection.close()
+        except (smtplib.SMTPException, OSError):
+            # Connection is dropped either way
+            pass
+        finally:
+            delivery_connection = None
+
+
+def deserialize_message(data):
+    """
+    Build email message from json data queued by celery email backend
+    :param data:
+    :return:
+    """
+    message = EmailMultiAlternatives(
+        subject=data['subject'], body=data['body'], from_email=data['from_email'], to=data['to'], cc=data['cc'],
+        bcc=data['bcc'], reply_to=data['reply_to'], headers=data['headers'],
+        alternatives=[tuple(alternative) for alternative in data['alternatives']])
+    for attachment in data['attachments']:
+        content = attachment['content']
+        if attachment['base64']:
+            content = base64.b64decode(content)
+        message.attach(attachment['filename'], content, attachment['mimetype'])
+    return message
+
+
+@shared_task(bind=True, max_retries=settings.EMAIL_MAX_RETRIES)
+def send_emails(self, messages):
+    """
+    Create a celery task to send a batch of queued emails over the worker delivery connection, emails rejected
+    permanently are skipped and a batch failing on a transient error is retried with exponential backoff from the
+    first unsent email
+    :param messages: emails serialized by celery email backend
+    :return: number of sent and rejected emails
+    """
+    sent = rejected = 0
+    reconnected = False
+    try:
+        connection = get_delivery_connection()
+        for data in messages:
+            while True:
+                try:
+                    connection.send_messages([deserialize_message(data)])
+                    sent += 1
+                except smtplib.SMTPServerDisconnected:
+                    if reconnected:
+                        raise
+                    # Reconnect once right away in case the server dropped the connection reused across tasks
+                    reconnected = True
+                    close_delivery_connection()
+                    connection = get_delivery_connection()
+                    continue
+                except smtplib.SMTPRecipientsRefused as error:
+                    # Retrying emails refused for all their recipients would be refused again
+                    logger.warning('Email %r was refused for all recipients: %s', data['subject'], error.recipients)
+                    rejected += 1
+                except (smtplib.SMTPDataError, smtplib.SMTPSenderRefused) as error:
+                    # Retry only transient 4xx replies, 5xx replies would reject the email again
+                    if error.smtp_code < 500:
+                        raise
+                    logger.warning('Email %r was rejected permanently: %s %s', data['subject'], error.smtp_code,
+                                   error.smtp_error)
+                    rejected += 1
+                break
+    except (smtplib.SMTPException, OSError) as error:
+        # Reconnect on retry in case the server dropped the reused connection
+        close_delivery_connection()
+        countdown = get_exponential_backoff_interval(
+            settings.EMAIL_RETRY_BACKOFF, self.request.retries, settings.EMAIL_RETRY_BACKOFF_MAX, full_jitter=True)
+        raise self.retry(args=[messages[sent + rejected:]], exc=error, countdown=countdown)
+    return {'sent': sent, 'rejected': rejected}
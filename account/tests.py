@@ -1,3 +1,158 @@
-from django.test import TestCase
+import smtplib
+from unittest import mock
+from celery.exceptions import Retry
+from django.conf import settings
+from django.core.cache import cache
+from django.core.mail import EmailMessage
+from django.core.mail.backends.base import BaseEmailBackend
+from django.test import SimpleTestCase, TestCase, RequestFactory, override_settings
+from account import tasks
+from rest_framework.exceptions import AuthenticationFailed
+from account.authentication import CachedJWTAuthentication, get_user_cache_key, get_user_fingerprint, \
+    get_user_generation_key
+from account.mail import serialize_message
+from account.models import User
+from account.serializers import TokenObtainPairSerializer
 
-# Create your tests here.
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class CachedJWTAuthenticationTest(TestCase):
+    """
+    Test that tokens resolved from cached user fingerprints are rejected once their user changes
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('guest@example.com', 'password', first_name='Guest', last_name='User')
+        self.token = str(TokenObtainPairSerializer.get_token(self.user).access_token)
+
+    def authenticate(self):
+        request = RequestFactory().get('/', HTTP_AUTHORIZATION=f'JWT {self.token}')
+        return CachedJWTAuthentication().authenticate(request)[0]
+
+    def change_user(self, **fields):
+        # Run commit callbacks of the user change as a committed transaction would
+        with self.captureOnCommitCallbacks(execute=True):
+            for field, value in fields.items():
+                setattr(self.user, field, value)
+            self.user.save()
+
+    def test_cached_token_resolves_user_without_queries(self):
+        self.authenticate()
+        with self.assertNumQueries(0):
+            user = self.authenticate()
+        self.assertEqual(user.pk, self.user.pk)
+
+    def test_deactivating_user_rejects_old_token(self):
+        self.authenticate()
+        self.change_user(is_active=False)
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+    def test_changing_password_rejects_old_token(self):
+        self.authenticate()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.set_password('new password')
+            self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+    def test_fingerprint_cached_from_row_read_before_change_is_not_matched(self):
+        self.authenticate()
+        generation = cache.get(get_user_generation_key(self.user.pk))
+        old_fingerprint = get_user_fingerprint(self.user)
+        self.change_user(is_active=False)
+        # Write the fingerprint of the row read before the change after the change committed
+        cache.set(get_user_cache_key(self.user.pk), (generation, old_fingerprint))
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+
+class FakeDeliveryBackend(BaseEmailBackend):
+    """
+    Create delivery email backend answering each sent email with the next queued smtp reply instead of sending it
+    """
+    # Queue exceptions to raise for the next sent emails, none sends the email
+    replies = []
+    sent = []
+    opened = 0
+
+    def open(self):
+        FakeDeliveryBackend.opened += 1
+        return True
+
+    def send_messages(self, email_messages):
+        reply = self.replies.pop(0) if self.replies else None
+        if reply is not None:
+            raise reply
+        self.sent.extend(message.subject for message in email_messages)
+        return len(email_messages)
+
+
+@override_settings(EMAIL_DELIVERY_BACKEND=f'{__name__}.FakeDeliveryBackend')
+class SendEmailsTest(SimpleTestCase):
+    """
+    Test that emails rejected permanently are skipped and transient failures retry the unsent emails
+    """
+
+    def setUp(self):
+        tasks.close_delivery_connection()
+        self.addCleanup(tasks.close_delivery_connection)
+        FakeDeliveryBackend.replies = []
+        FakeDeliveryBackend.sent = []
+        FakeDeliveryBackend.opened = 0
+        self.messages = [serialize_message(EmailMessage(f'Email {number}', 'Body', 'host@example.com',
+                                                        ['guest@example.com'])) for number in range(4)]
+
+    def send(self, *replies, retries=0):
+        FakeDeliveryBackend.replies = list(replies)
+        tasks.send_emails.push_request(retries=retries)
+        self.addCleanup(tasks.send_emails.pop_request)
+        return tasks.send_emails.run(self.messages)
+
+    def send_retried(self, *replies, retries=0):
+        with mock.patch.object(tasks.send_emails, 'retry', side_effect=Retry) as retry:
+            with self.assertRaises(Retry):
+                self.send(*replies, retries=retries)
+        return retry.call_args.kwargs
+
+    def test_transient_reply_retries_unsent_emails(self):
+        retry = self.send_retried(None, smtplib.SMTPDataError(451, 'Try again later'))
+        self.assertEqual(FakeDeliveryBackend.sent, ['Email 0'])
+        self.assertEqual(retry['args'], [self.messages[1:]])
+
+    def test_permanent_rejections_are_skipped(self):
+        result = self.send(smtplib.SMTPDataError(550, 'Mailbox unavailable'),
+                           smtplib.SMTPRecipientsRefused({'guest@example.com': (550, 'Unknown user')}),
+                           None, smtplib.SMTPSenderRefused(553, 'Sender not allowed', 'host@example.com'))
+        self.assertEqual(result, {'sent': 1, 'rejected': 3})
+        self.assertEqual(FakeDeliveryBackend.sent, ['Email 2'])
+
+    def test_retry_skips_emails_rejected_before_failure(self):
+        retry = self.send_retried(None, smtplib.SMTPRecipientsRefused({}), smtplib.SMTPSenderRefused(
+            451, 'Try again later', 'host@example.com'))
+        self.assertEqual(retry['args'], [self.messages[2:]])
+
+    def test_dropped_connection_is_reconnected_once(self):
+        result = self.send(smtplib.SMTPServerDisconnected(), None, smtplib.SMTPRecipientsRefused({}))
+        self.assertEqual(result, {'sent': 3, 'rejected': 1})
+        self.assertEqual(FakeDeliveryBackend.sent, ['Email 0', 'Email 2', 'Email 3'])
+        self.assertEqual(FakeDeliveryBackend.opened, 2)
+
+    def test_second_dropped_connection_retries_task(self):
+        retry = self.send_retried(None, smtplib.SMTPServerDisconnected(), smtplib.SMTPServerDisconnected())
+        self.assertEqual(retry['args'], [self.messages[1:]])
+        self.assertEqual(FakeDeliveryBackend.opened, 2)
+
+    def test_failure_resets_delivery_connection(self):
+        self.send_retried(OSError('Connection reset'))
+        self.assertIsNone(tasks.delivery_connection)
+        self.send()
+        self.assertIsNotNone(tasks.delivery_connection)
+        self.assertEqual(FakeDeliveryBackend.opened, 2)
+
+    def test_retry_backoff_is_capped(self):
+        for retries in range(0, settings.EMAIL_MAX_RETRIES * 4):
+            retry = self.send_retried(OSError('Connection reset'), retries=retries)
+            self.assertLessEqual(retry['countdown'], settings.EMAIL_RETRY_BACKOFF_MAX)
+            self.assertLessEqual(retry['countdown'], settings.EMAIL_RETRY_BACKOFF * 2 ** retries)
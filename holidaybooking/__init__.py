@@ -0,0 +1,4 @@
+# Load celery app when django starts so shared tasks are sent through the configured broker
+from holidaybooking.celery import app as celery_app
+
+__all__ = ('celery_app',)
@@ -0,0 +1,93 @@
+"""
+Admin helpers keeping change lists of tables with millions of rows fast.
+
+Change lists of admins using PerformanceAdminMixin are paginated with estimated counts and skip the full count of
+filtered lists. Foreign keys to large tables are filtered by id with RelatedIdFilter instead of a list of every
+related object, and edited with raw id or autocomplete widgets declared by each admin.
+"""
+import json
+from django.contrib import admin
+from django.contrib.admin.views.main import ERROR_FLAG, PAGE_VAR
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
+
+
+def estimate_count(queryset):
+    """
+    Estimate number of rows of a queryset from postgres planner statistics, unfiltered querysets read the table row
+    estimate kept by analyze and filtered querysets read the row estimate of their query plan
+    :param queryset:
+    :return: estimated number of rows or none when no estimate is available
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    if not queryset.query.where:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+                           [connection.ops.quote_name(queryset.model._meta.db_table)])
+            row = cursor.fetchone()
+        # Tables never vacuumed or analyzed have no estimate
+        return row[0] if row and row[0] >= 0 else None
+    plan = json.loads(queryset.explain(format='json'))
+    return plan[0]['Plan']['Plan Rows']
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Create paginator counting pages from estimated row counts, small results are counted exactly
+    """
+    # Count results exactly below this estimated number of rows
+    exact_count_limit = 10000
+
+    @cached_property
+    def count(self):
+        estimate = estimate_count(self.object_list)
+        if estimate is None or estimate < self.exact_count_limit:
+            return super().count
+        return estimate
+
+
+class RelatedIdFilter(admin.FieldListFilter):
+    """
+    Create foreign key list filter taking the related object id in a text input instead of listing every related
+    object in the sidebar
+    """
+    template = 'admin/related_id_filter.html'
+
+    def __init__(self, field, request, params, model, model_admin, field_path):
+        self.lookup_kwarg = f'{field_path}__{field.target_field.name}__exact'
+        # Show all objects when the filter form is submitted empty
+        if params.get(self.lookup_kwarg) == '':
+            params.pop(self.lookup_kwarg)
+        self.lookup_val = params.get(self.lookup_kwarg)
+        super().__init__(field, request, params, model, model_admin, field_path)
+
+    def expected_parameters(self):
+        return [self.lookup_kwarg]
+
+    def choices(self, changelist):
+        # Keep other query parameters of the change list when the filter form is submitted
+        yield {
+            'selected': self.lookup_val is None,
+            'query_string': changelist.get_query_string(remove=[self.lookup_kwarg]),
+            'display': _('All'),
+            'parameter': self.lookup_kwarg,
+            'value': self.lookup_val or '',
+            'hidden_params': [(key, value) for key, value in changelist.params.items()
+                              if key not in (self.lookup_kwarg, PAGE_VAR, ERROR_FLAG)],
+        }
+
+
+class PerformanceAdminMixin:
+    """
+    Create model admin mixin paginating change lists with estimated counts and skipping full result counts, admins
+    set list select related, raw id fields and related id filters for their foreign keys
+    """
+    # Set paginator counting pages from planner estimates
+    paginator = EstimatedCountPaginator
+
+    # Skip counting all rows of the table on filtered change lists
+    show_full_result_count = False
@@ -14,12 +14,19 @@ app.config_from_object('django.conf:settings', namespace='CELERY')
 # Load task modules from all registered Django app configs.
 app.autodiscover_tasks()
 
+# Connect signal hooks recording task metrics
+import holidaybooking.task_metrics  # noqa: E402,F401
+
 # Define periodic task for changing reservation state based reservation time duration
 app.conf.beat_schedule = {
     'update-reservation-state': {
         'task': 'reservation.tasks.update_reservation_state',
         'schedule': crontab(),  # run every minute
     },
+    'clean-stale-media-uploads': {
+        'task': 'reservation.tasks.clean_stale_media_uploads',
+        'schedule': crontab(minute=0),  # run every hour
+    },
 }
 
 
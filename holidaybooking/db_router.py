@@ -0,0 +1,119 @@
+"""
+Database router sending reads of safe api requests to read replicas.
+
+Reads go to the primary unless replica reads are enabled for the current request by the replica routing middleware,
+so tasks, management commands and writes keep reading their own writes. Replicas lagging behind the primary by more
+than the configured limit, not streaming from the primary, or failing the lag check, are skipped until their next
+check.
+"""
+import logging
+import random
+import threading
+import time
+from contextvars import ContextVar
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from holidaybooking import metrics
+
+logger = logging.getLogger(__name__)
+
+# Define replica metrics labelled by database alias
+replica_lag = metrics.gauge(
+    'db_replica_lag_seconds', 'Replication lag measured by the last replica check', ['database'])
+replica_healthy = metrics.gauge('db_replica_healthy', 'Whether a replica was usable at its last check', ['database'])
+reads = metrics.counter('db_reads_routed_total', 'Queryset reads routed by database alias', ['database'])
+
+# Allow replica reads in the request handled in the current thread or task, reads use the primary when not set
+replica_reads_allowed = ContextVar('replica_reads_allowed', default=False)
+
+# Seconds since the last transaction replayed on a replica, zero when the replica replayed everything it received.
+# A replica whose wal receiver stopped has replayed everything it received however far behind it is, so the lag is
+# null when the receiver is not streaming or heard nothing from the primary within the allowed silence
+LAG_QUERY = """
+    SELECT CASE
+        WHEN NOT EXISTS (
+            SELECT 1 FROM pg_stat_wal_receiver
+            WHERE status = 'streaming' AND last_msg_receipt_time > now() - make_interval(secs => %s)
+        ) THEN NULL
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+"""
+
+
+def get_sticky_key(user_id):
+    """
+    Get cache key marking a user that wrote recently, keyed on the user rather than the token so it outlives token
+    refreshes
+    :param user_id:
+    :return:
+    """
+    return f'db-sticky:{user_id}'
+
+
+class ReplicaRouter:
+    """
+    Create database router reading from replicas with a healthy replication lag and writing to the primary
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Keep time of the last check and its result by replica alias
+        self._checks = {}
+
+    def db_for_read(self, model, **hints):
+        if not settings.REPLICA_DATABASES or not replica_reads_allowed.get():
+            return DEFAULT_DB_ALIAS
+        # Keep reads in a transaction on the primary so they see writes of the transaction
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        replicas = [alias for alias in settings.REPLICA_DATABASES if self.is_healthy(alias)]
+        alias = random.choice(replicas) if replicas else DEFAULT_DB_ALIAS
+        reads.inc(database=alias)
+        return alias
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas receive schema changes through replication
+        return db == DEFAULT_DB_ALIAS
+
+    def is_healthy(self, alias):
+        """
+        Check whether a replica lags behind the primary by less than the allowed lag, checks run at most once per
+        check interval in each process
+        :param alias:
+        :return:
+        """
+        now = time.monotonic()
+        with self._lock:
+            checked_at, healthy = self._checks.get(alias, (None, False))
+            if checked_at is not None and now - checked_at < settings.REPLICA_LAG_CHECK_INTERVAL:
+                return healthy
+            # Record check time before checking so concurrent threads reuse the previous result
+            self._checks[alias] = (now, healthy)
+        try:
+            with connections[alias].cursor() as cursor:
+                cursor.execute(LAG_QUERY, [settings.REPLICA_MAX_SILENCE_SECONDS])
+                lag = cursor.fetchone()[0]
+        except DatabaseError as error:
+            logger.warning('Replica %s failed its lag check: %s', alias, error)
+            connections[alias].close()
+            lag = None
+        else:
+            if lag is None:
+                logger.warning('Replica %s is not streaming from the primary', alias)
+            else:
+                lag = float(lag)
+        healthy = lag is not None and lag <= settings.REPLICA_MAX_LAG_SECONDS
+        if lag is not None:
+            replica_lag.set(lag, database=alias)
+        replica_healthy.set(int(healthy), database=alias)
+        with self._lock:
+            self._checks[alias] = (now, healthy)
+        return healthy
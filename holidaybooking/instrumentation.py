@@ -0,0 +1,66 @@
+"""
+Per-request performance counters shared by request metrics middleware, database execute wrappers and serializers.
+"""
+import time
+from contextvars import ContextVar
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from rest_framework.serializers import ListSerializer
+
+# Hold counters of the request handled in the current thread or task
+current_request_stats = ContextVar('current_request_stats', default=None)
+
+
+class RequestStats:
+    """
+    Create counters of sql queries and serializer time of a request
+    """
+    __slots__ = ['queries', 'sql_time', 'serializer_time']
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_time = 0.0
+        self.serializer_time = 0.0
+
+
+def count_query(execute, sql, params, many, context):
+    """
+    Database execute wrapper counting queries and their time into stats of the current request, context variables
+    follow requests into the threads async views run queries in
+    """
+    stats = current_request_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.queries += 1
+        stats.sql_time += time.perf_counter() - started
+
+
+@receiver(connection_created)
+def install_query_counter(sender, connection, **kwargs):
+    # Install query counter once per database connection instead of once per request
+    if count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(count_query)
+
+
+class TimedSerializerMixin:
+    """
+    Create serializer mixin adding time spent serializing top level objects to request stats, nested serializers
+    are timed as part of their top level object
+    """
+
+    def to_representation(self, instance):
+        stats = current_request_stats.get()
+        parent = self.parent
+        if isinstance(parent, ListSerializer):
+            parent = parent.parent
+        if stats is None or parent is not None:
+            return super().to_representation(instance)
+        started = time.perf_counter()
+        try:
+            return super().to_representation(instance)
+        finally:
+            stats.serializer_time += time.perf_counter() - started
@@ -0,0 +1,105 @@
+"""
+Task locks letting a single run of a periodic task run at a time across workers.
+
+Locks are taken in the redis server of the default cache with plain string tokens, and released with a script
+deleting the lock only while it holds the token of the releasing run. Other cache backends, used in development and
+tests, take locks in the cache itself.
+"""
+import functools
+import uuid
+import redis
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache
+from holidaybooking import metrics
+
+# Define periodic task runs skipped because a previous run still held the task lock
+skipped_runs = metrics.counter(
+    'celery_task_overlap_skipped_total', 'Periodic task runs skipped while a previous run was still running',
+    ['task'])
+
+# Define backend of redis caches whose server holds task locks
+REDIS_CACHE_BACKEND = 'django.core.cache.backends.redis.RedisCache'
+
+# Delete a lock key only while it holds the token of the run releasing it, in a single atomic step
+RELEASE_SCRIPT = """
+    if redis.call('get', KEYS[1]) == ARGV[1] then
+        return redis.call('del', KEYS[1])
+    end
+    return 0
+"""
+
+
+@functools.lru_cache
+def get_redis_client(location):
+    # Share connection pool of a redis server between locks of the process
+    return redis.Redis.from_url(location)
+
+
+def get_lock_client():
+    """
+    Get redis client of the default cache server, none when the default cache is not a redis cache
+    :return:
+    """
+    config = settings.CACHES[DEFAULT_CACHE_ALIAS]
+    if config['BACKEND'] != REDIS_CACHE_BACKEND:
+        return None
+    location = config['LOCATION']
+    # Write to the first server of replicated caches
+    if not isinstance(location, str):
+        location = location[0]
+    return get_redis_client(location.split(',')[0])
+
+
+def acquire_lock(key, token, timeout):
+    """
+    Take a task lock unless another run holds it
+    :param key:
+    :param token: token identifying the run taking the lock
+    :param timeout: seconds after which the lock expires
+    :return: whether the lock was taken
+    """
+    client = get_lock_client()
+    if client is None:
+        return cache.add(key, token, timeout)
+    return bool(client.set(key, token, nx=True, ex=timeout))
+
+
+def release_lock(key, token):
+    """
+    Release a task lock unless it expired and was taken over by another run, redis compares and deletes the lock in a
+    script so another run can not take it over between the comparison and the deletion
+    :param key:
+    :param token: token stored by the run when it took the lock
+    :return:
+    """
+    client = get_lock_client()
+    if client is None:
+        if cache.get(key) == token:
+            cache.delete(key)
+        return
+    client.eval(RELEASE_SCRIPT, 1, key, token)
+
+
+def single_instance_task(timeout):
+    """
+    Decorate a periodic task function to skip runs started while a previous run is still running on any worker,
+    the lock expires after timeout seconds in case a worker dies while holding it
+    :param timeout: seconds the lock is held at most, longer than the slowest expected run
+    :return:
+    """
+    def decorator(function):
+        name = f'{function.__module__}.{function.__name__}'
+        key = f'task-lock:{name}'
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            token = uuid.uuid4().hex
+            if not acquire_lock(key, token, timeout):
+                skipped_runs.inc(task=name)
+                return None
+            try:
+                return function(*args, **kwargs)
+            finally:
+                release_lock(key, token)
+        return wrapper
+    return decorator
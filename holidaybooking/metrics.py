@@ -0,0 +1,212 @@
+"""
+In-process metrics registry rendered in prometheus text exposition format.
+
+Metrics are created once at import time with the module level helpers and updated from request, task and service
+code paths. Every metric guards its samples with its own lock so updates stay cheap under concurrent threads.
+
+Registries are not shared between processes. Web instances serve the registry of the process answering the scrape, so
+they run a single worker process scaled with threads, and celery workers serve each pool process on its own port.
+"""
+import math
+import threading
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Default histogram buckets in seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Metric:
+    """
+    Create base metric holding one sample per combination of label values
+    """
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        return tuple(str(labels.get(label, '')) for label in self.labelnames)
+
+    def _format_labels(self, key, extra=()):
+        pairs = list(zip(self.labelnames, key)) + list(extra)
+        if not pairs:
+            return ''
+        return '{' + ','.join(f'{label}="{_escape(value)}"' for label, value in pairs) + '}'
+
+    def render(self):
+        """
+        Render metric samples in prometheus text exposition format
+        :return:
+        """
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.type}']
+        with self._lock:
+            items = [(key, self._copy(value)) for key, value in self._values.items()]
+        for key, value in sorted(items):
+            lines.extend(self._render_sample(key, value))
+        return lines
+
+    def _copy(self, value):
+        return value
+
+    def _render_sample(self, key, value):
+        return [f'{self.name}{self._format_labels(key)} {_format_value(value)}']
+
+
+class Counter(Metric):
+    """
+    Create counter metric that only goes up
+    """
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    """
+    Create gauge metric that can go up and down
+    """
+    type = 'gauge'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def get(self, **labels):
+        key = self._key(labels)
+        with self._lock:
+            return self._values.get(key, 0)
+
+
+class Histogram(Metric):
+    """
+    Create histogram metric counting observations in cumulative buckets
+    """
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            sample = self._values.get(key)
+            if sample is None:
+                # Keep bucket counts, observation sum and observation count
+                sample = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            sample[0][index] += 1
+            sample[1] += value
+            sample[2] += 1
+
+    def _copy(self, value):
+        return [list(value[0]), value[1], value[2]]
+
+    def _render_sample(self, key, value):
+        counts, total, count = value
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets + (math.inf,), counts):
+            cumulative += bucket_count
+            le = '+Inf' if bound == math.inf else _format_value(bound)
+            lines.append(f'{self.name}_bucket{self._format_labels(key, [("le", le)])} {cumulative}')
+        lines.append(f'{self.name}_sum{self._format_labels(key)} {_format_value(total)}')
+        lines.append(f'{self.name}_count{self._format_labels(key)} {count}')
+        return lines
+
+
+class Registry:
+    """
+    Create registry of metrics rendered together
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+
+    def register(self, metric):
+        """
+        Register metric once by name and return the registered metric
+        :param metric:
+        :return:
+        """
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def render(self):
+        """
+        Render all registered metrics in prometheus text exposition format
+        :return:
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in sorted(metrics, key=lambda metric: metric.name):
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+class MetricsRequestHandler(BaseHTTPRequestHandler):
+    """
+    Create http request handler serving registered metrics outside of django, used by celery workers
+    """
+
+    def do_GET(self):
+        body = registry.render().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Do not log every scrape
+        pass
+
+
+def create_metrics_server(host, port):
+    return ThreadingHTTPServer((host, port), MetricsRequestHandler)
+
+
+def counter(name, documentation, labelnames=()):
+    return registry.register(Counter(name, documentation, labelnames))
+
+
+def gauge(name, documentation, labelnames=()):
+    return registry.register(Gauge(name, documentation, labelnames))
+
+
+def histogram(name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+    return registry.register(Histogram(name, documentation, labelnames, buckets))
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_value(value):
+    if isinstance(value, float):
+        if math.isinf(value):
+            return '+Inf' if value > 0 else '-Inf'
+        return repr(value)
+    return str(value)
@@ -0,0 +1,182 @@
+import time
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+from holidaybooking import metrics
+from holidaybooking.db_router import get_sticky_key, replica_reads_allowed
+from holidaybooking.instrumentation import RequestStats, current_request_stats
+
+# Define request metrics labelled by view name, url route and http method
+REQUEST_LABELS = ['view', 'route', 'method']
+request_duration = metrics.histogram(
+    'http_request_duration_seconds', 'Wall time of requests', REQUEST_LABELS + ['status'])
+request_queries = metrics.histogram(
+    'http_request_sql_queries', 'Number of sql queries run by requests', REQUEST_LABELS,
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100, 250))
+request_sql_duration = metrics.histogram(
+    'http_request_sql_duration_seconds', 'Time requests spent running sql queries', REQUEST_LABELS)
+request_serializer_duration = metrics.histogram(
+    'http_request_serializer_duration_seconds', 'Time requests spent serializing objects', REQUEST_LABELS)
+response_size = metrics.histogram(
+    'http_response_size_bytes', 'Size of response bodies', REQUEST_LABELS,
+    buckets=(256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216))
+
+
+class RequestMetricsMiddleware:
+    """
+    Create middleware recording wall time, sql queries, serializer time and response size of each request, it runs
+    in sync and async request handling so async views are not moved to a thread
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        stats = RequestStats()
+        token = current_request_stats.set(stats)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            current_request_stats.reset(token)
+        return self.record(request, response, stats, time.perf_counter() - started)
+
+    async def __acall__(self, request):
+        stats = RequestStats()
+        token = current_request_stats.set(stats)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_request_stats.reset(token)
+        return self.record(request, response, stats, time.perf_counter() - started)
+
+    def record(self, request, response, stats, duration):
+        """
+        Observe request metrics of a handled request
+        :param request:
+        :param response:
+        :param stats: sql and serializer counters of the request
+        :param duration: wall time in seconds
+        :return:
+        """
+        labels = self.get_labels(request)
+        request_duration.observe(duration, status=response.status_code, **labels)
+        request_queries.observe(stats.queries, **labels)
+        request_sql_duration.observe(stats.sql_time, **labels)
+        request_serializer_duration.observe(stats.serializer_time, **labels)
+        if response.streaming:
+            # Observe size of streamed responses once their content is consumed
+            if response.is_async:
+                response.streaming_content = self.count_async_streamed_size(response.streaming_content, labels)
+            else:
+                response.streaming_content = self.count_streamed_size(response.streaming_content, labels)
+        else:
+            response_size.observe(len(response.content), **labels)
+        return response
+
+    def get_labels(self, request):
+        """
+        Get view name and url route of the resolved view
+        :param request:
+        :return:
+        """
+        match = request.resolver_match
+        if match is None:
+            return {'view': 'unresolved', 'route': '', 'method': request.method}
+        return {'view': match.view_name, 'route': match.route, 'method': request.method}
+
+    def count_streamed_size(self, content, labels):
+        size = 0
+        try:
+            for chunk in content:
+                size += len(chunk)
+                yield chunk
+        finally:
+            response_size.observe(size, **labels)
+
+    async def count_async_streamed_size(self, content, labels):
+        size = 0
+        try:
+            async for chunk in content:
+                size += len(chunk)
+                yield chunk
+        finally:
+            response_size.observe(size, **labels)
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Create middleware allowing reads of safe requests to use read replicas, clients read from the primary for a short
+    time after their own unsafe requests so they see what they wrote
+    """
+    sync_capable = True
+    async_capable = True
+
+    # Define http methods that do not write
+    safe_methods = ('GET', 'HEAD', 'OPTIONS')
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        sticky_key = self.get_sticky_key(request)
+        if request.method in self.safe_methods:
+            allowed = sticky_key is None or not cache.get(sticky_key)
+        else:
+            allowed = False
+            if sticky_key is not None:
+                cache.set(sticky_key, True, settings.REPLICA_STICKY_SECONDS)
+        token = replica_reads_allowed.set(allowed)
+        try:
+            return self.get_response(request)
+        finally:
+            replica_reads_allowed.reset(token)
+
+    async def __acall__(self, request):
+        sticky_key = self.get_sticky_key(request)
+        if request.method in self.safe_methods:
+            allowed = sticky_key is None or not await cache.aget(sticky_key)
+        else:
+            allowed = False
+            if sticky_key is not None:
+                await cache.aset(sticky_key, True, settings.REPLICA_STICKY_SECONDS)
+        token = replica_reads_allowed.set(allowed)
+        try:
+            return await self.get_response(request)
+        finally:
+            replica_reads_allowed.reset(token)
+
+    def get_sticky_key(self, request):
+        """
+        Get cache key identifying the client by the user id of its access token, so refreshed tokens of the user stay
+        sticky, anonymous clients and invalid tokens are not sticky
+        :param request:
+        :return:
+        """
+        if not settings.REPLICA_DATABASES:
+            return None
+        authentication = JWTAuthentication()
+        header = authentication.get_header(request)
+        try:
+            raw_token = authentication.get_raw_token(header) if header else None
+            if raw_token is None:
+                return None
+            # Token signatures are verified without reading the user
+            user_id = authentication.get_validated_token(raw_token).get(api_settings.USER_ID_CLAIM)
+        except AuthenticationFailed:
+            return None
+        return get_sticky_key(user_id) if user_id is not None else None
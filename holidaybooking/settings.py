@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/4.1/ref/settings/
 """
 import os
 from datetime import timedelta
+from decimal import Decimal
 from pathlib import Path
 from dotenv import load_dotenv
 
@@ -52,15 +53,19 @@ INSTALLED_APPS = [
     'account.apps.AccountConfig',
     # Add django GIS to enable location fields
     'django.contrib.gis',
+    # Add django postgres to enable range fields and exclusion constraints
+    'django.contrib.postgres',
     # Add created reservation app to installed apps
     'reservation.apps.ReservationConfig',
-    # Add django debug toolbar 
-    'debug_toolbar',
     # Add cross-origin resource sharing to enable frontend access to api endpoints
     'corsheaders',
 ]
 
 MIDDLEWARE = [
+    # Record wall time, sql queries, serializer time and response size of requests
+    'holidaybooking.middleware.RequestMetricsMiddleware',
+    # Route reads of safe requests to read replicas
+    'holidaybooking.middleware.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     # Add cross-origin resource sharing middleware
@@ -70,16 +75,26 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'debug_toolbar.middleware.DebugToolbarMiddleware',
-
 ]
 
+# Enable django debug toolbar in debug mode only, it can be turned off with DEBUG_TOOLBAR environment variable
+DEBUG_TOOLBAR = DEBUG and os.getenv('DEBUG_TOOLBAR', 'True') == 'True'
+if DEBUG_TOOLBAR:
+    INSTALLED_APPS.append('debug_toolbar')
+    MIDDLEWARE.append('debug_toolbar.middleware.DebugToolbarMiddleware')
+
+# Set bearer token required to read metrics endpoint, metrics endpoint is denied when not set unless debug is on.
+# The endpoint renders metrics of the web process answering the scrape, run a single web worker process per instance
+# so every scrape of an instance reads the same registry
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+
 ROOT_URLCONF = 'holidaybooking.urls'
 
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
-        'DIRS': [],
+        # Add project templates overriding and extending admin templates
+        'DIRS': [BASE_DIR / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
@@ -105,9 +120,34 @@ DATABASES = {
         'PASSWORD': str(os.getenv('DATABASE_PASSWORD')),
         'HOST': str(os.getenv('DATABASE_HOST')),
         'PORT': str(os.getenv('DATABASE_PORT')),
+        # Keep connections open across requests and check them before reuse
+        'CONN_MAX_AGE': int(os.getenv('DATABASE_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
+# Add read replicas from comma separated hosts sharing credentials of the primary database
+REPLICA_DATABASES = []
+for index, replica_host in enumerate(filter(None, os.getenv('DATABASE_REPLICA_HOSTS', '').split(','))):
+    replica_host, _, replica_port = replica_host.strip().partition(':')
+    DATABASES[f'replica_{index}'] = dict(DATABASES['default'], HOST=replica_host,
+                                         PORT=replica_port or DATABASES['default']['PORT'],
+                                         TEST={'MIRROR': 'default'})
+    REPLICA_DATABASES.append(f'replica_{index}')
+
+DATABASE_ROUTERS = ['holidaybooking.db_router.ReplicaRouter']
+
+# Set seconds clients read from the primary after their own writes
+REPLICA_STICKY_SECONDS = int(os.getenv('REPLICA_STICKY_SECONDS', 5))
+
+# Set replication lag in seconds above which replicas are skipped and how often lag is checked in each process
+REPLICA_MAX_LAG_SECONDS = float(os.getenv('REPLICA_MAX_LAG_SECONDS', 2))
+REPLICA_LAG_CHECK_INTERVAL = float(os.getenv('REPLICA_LAG_CHECK_INTERVAL', 5))
+
+# Set seconds without messages from the primary after which replica wal receivers are considered stalled, idle
+# replicas request a keepalive from the primary after half of their wal receiver timeout
+REPLICA_MAX_SILENCE_SECONDS = float(os.getenv('REPLICA_MAX_SILENCE_SECONDS', 60))
+
 # Password validation
 # https://docs.djangoproject.com/en/4.1/ref/settings/#auth-password-validators
 
@@ -148,6 +188,35 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 MEDIA_URL = 'media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Set widths in pixels of resized photo variants created for property media, and their encoding quality
+MEDIA_PHOTO_VARIANTS = {
+    'thumbnail': 320,
+    'medium': 768,
+    'large': 1600,
+}
+MEDIA_PHOTO_QUALITY = 80
+
+# Set directory in the default storage keeping chunks of partially uploaded videos and largest accepted chunk size in
+# bytes of chunked video uploads, chunks of an upload reach any web node so the default storage, like media root,
+# must be shared by all nodes
+MEDIA_UPLOAD_CHUNK_DIR = 'uploads'
+MEDIA_UPLOAD_MAX_CHUNK_SIZE = 8 * 1024 * 1024
+
+# Set hours after which unfinished chunked uploads are removed
+MEDIA_UPLOAD_EXPIRY_HOURS = 24
+
+# Set number of property rows validated and inserted together and largest import body kept in memory in bytes
+PROPERTY_IMPORT_BATCH_SIZE = 1000
+PROPERTY_IMPORT_SPOOL_SIZE = 10 * 1024 * 1024
+
+# Set number of rows exports fetch from the database at a time
+RESERVATION_EXPORT_CHUNK_SIZE = 2000
+
+# Set service fee rate added to reservation fees, and largest number of properties and nights priced in one quote
+RESERVATION_SERVICE_FEE_RATE = Decimal('0.12')
+QUOTE_MAX_PROPERTIES = 100
+QUOTE_MAX_NIGHTS = 365
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.1/ref/settings/#default-auto-field
 
@@ -159,6 +228,30 @@ EMAIL_HOST_USER = str(os.getenv('EMAIL_HOST_USER'))
 EMAIL_HOST_PASSWORD = str(os.getenv('EMAIL_HOST_PASSWORD'))
 EMAIL_PORT = str(os.getenv('EMAIL_PORT'))
 EMAIL_USE_TLS = str(os.getenv('EMAIL_USE_TLS'))
+EMAIL_TIMEOUT = 10
+
+# Queue emails to celery workers which send them with the delivery backend, console or file based backends can stand
+# in for smtp in local development and tests with EMAIL_DELIVERY_BACKEND and EMAIL_FILE_PATH environment variables
+EMAIL_BACKEND = 'account.mail.CeleryEmailBackend'
+EMAIL_DELIVERY_BACKEND = os.getenv('EMAIL_DELIVERY_BACKEND', 'django.core.mail.backends.smtp.EmailBackend')
+EMAIL_FILE_PATH = os.getenv('EMAIL_FILE_PATH', BASE_DIR / 'sent_emails')
+
+# Set number of emails sent by one task, and retries of failed batches with exponential backoff in seconds
+EMAIL_BATCH_SIZE = 50
+EMAIL_MAX_RETRIES = 8
+EMAIL_RETRY_BACKOFF = 5
+EMAIL_RETRY_BACKOFF_MAX = 600
+
+# Set cache configuration, local memory cache backend can stand in for redis in tests
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.redis.RedisCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'redis://localhost:6379/1'),
+    }
+}
+
+# Set time in seconds to keep cached api responses
+API_CACHE_TIMEOUT = 300
 
 # Set customized user model as default model
 AUTH_USER_MODEL = 'account.User'
@@ -166,9 +259,11 @@ AUTH_USER_MODEL = 'account.User'
 # Set django rest framework configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        # Set jwt authentication method for djoser authentication backend
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        # Set jwt authentication method for djoser authentication backend resolving users from token claims
+        'account.authentication.CachedJWTAuthentication',
     ),
+    # Set default page size of cursor paginated list endpoints
+    'PAGE_SIZE': 20,
 }
 
 # Set account serializer
@@ -200,9 +295,17 @@ SIMPLE_JWT = {
     'REFRESH_TOKEN_LIFETIME': timedelta(days=3),
     'AUTH_TOKEN_CLASSES': (
         'rest_framework_simplejwt.tokens.AccessToken',
-    )
+    ),
+    # Add user claims read by cached jwt authentication to issued tokens
+    'TOKEN_OBTAIN_SERIALIZER': 'account.serializers.TokenObtainPairSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'account.serializers.TokenRefreshSerializer',
+    # Reject tokens issued before the password of their user changed
+    'CHECK_REVOKE_TOKEN': True,
 }
 
+# Set time in seconds to keep cached user fingerprints of jwt authentication
+AUTH_USER_CACHE_TIMEOUT = 3600
+
 GEOIP_PATH = os.path.join(BASE_DIR, 'geoip')
 
 # Celery cron job configuration
@@ -212,6 +315,10 @@ CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 
+# Set address celery workers serve their metrics on, prefork pool processes listen on the following ports
+CELERY_METRICS_HOST = os.getenv('CELERY_METRICS_HOST', '0.0.0.0')
+CELERY_METRICS_PORT = int(os.getenv('CELERY_METRICS_PORT', '9808'))
+
 # Set allowed CORS urls
 CORS_ALLOWED_ORIGINS = [
     'http://localhost:3000',
@@ -0,0 +1,98 @@
+"""
+Celery signal hooks recording task telemetry in the metrics registry shared with the web tier.
+
+Publishers stamp every task message with its publish time so workers can measure how long tasks waited in the
+queue. Workers serve their metrics over http, see start_worker_metrics_server.
+"""
+import logging
+import threading
+import time
+from billiard.process import current_process
+from celery import signals
+from django.conf import settings
+from holidaybooking import metrics
+
+logger = logging.getLogger(__name__)
+
+# Define task metrics labelled by task name
+task_queue_wait = metrics.histogram(
+    'celery_task_queue_wait_seconds', 'Time tasks waited in the queue before a worker started them', ['task'],
+    buckets=(0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0))
+task_duration = metrics.histogram(
+    'celery_task_duration_seconds', 'Run time of tasks by final state', ['task', 'state'],
+    buckets=(0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0))
+task_retries = metrics.counter('celery_task_retries_total', 'Task retries', ['task'])
+task_failures = metrics.counter('celery_task_failures_total', 'Task failures', ['task'])
+task_rows = metrics.counter(
+    'celery_task_rows_processed_total', 'Rows processed by tasks as reported in their result', ['task', 'kind'])
+tasks_running = metrics.gauge('celery_tasks_running', 'Tasks running in this worker process', ['task'])
+
+# Keep start times of running tasks by task id
+started_at = {}
+
+
+@signals.before_task_publish.connect
+def stamp_publish_time(headers=None, **kwargs):
+    # Stamp task message with publish time to measure queue wait when a worker starts it
+    if headers is not None:
+        headers.setdefault('published_at', time.time())
+
+
+@signals.task_prerun.connect
+def record_task_start(task_id=None, task=None, **kwargs):
+    published_at = getattr(task.request, 'published_at', None)
+    if published_at is not None and not task.request.retries:
+        task_queue_wait.observe(max(time.time() - published_at, 0), task=task.name)
+    tasks_running.inc(task=task.name)
+    started_at[task_id] = time.perf_counter()
+
+
+@signals.task_postrun.connect
+def record_task_end(task_id=None, task=None, retval=None, state=None, **kwargs):
+    started = started_at.pop(task_id, None)
+    tasks_running.dec(task=task.name)
+    if started is not None:
+        task_duration.observe(time.perf_counter() - started, task=task.name, state=state or 'UNKNOWN')
+    # Count rows tasks report in their result like {'activated': 3, 'deactivated': 1}
+    if isinstance(retval, dict):
+        for kind, count in retval.items():
+            if isinstance(count, int) and not isinstance(count, bool):
+                task_rows.inc(count, task=task.name, kind=kind)
+
+
+@signals.task_retry.connect
+def record_task_retry(sender=None, **kwargs):
+    task_retries.inc(task=sender.name)
+
+
+@signals.task_failure.connect
+def record_task_failure(sender=None, **kwargs):
+    task_failures.inc(task=sender.name)
+
+
+@signals.worker_ready.connect
+def start_main_metrics_server(**kwargs):
+    # Serve metrics of the main worker process, which runs the tasks of solo and thread pools
+    start_worker_metrics_server(settings.CELERY_METRICS_PORT)
+
+
+@signals.worker_process_init.connect
+def start_child_metrics_server(**kwargs):
+    # Serve metrics of each prefork pool process on the port after the main process port plus its index
+    start_worker_metrics_server(settings.CELERY_METRICS_PORT + 1 + (current_process().index or 0))
+
+
+def start_worker_metrics_server(port):
+    """
+    Serve metrics of the current worker process in a daemon thread, disabled when no port is configured
+    :param port:
+    :return:
+    """
+    if not settings.CELERY_METRICS_PORT:
+        return
+    try:
+        server = metrics.create_metrics_server(settings.CELERY_METRICS_HOST, port)
+    except OSError as error:
+        logger.warning('Worker metrics server could not listen on port %s: %s', port, error)
+        return
+    threading.Thread(target=server.serve_forever, name='metrics-server', daemon=True).start()
@@ -0,0 +1,199 @@
+from unittest import mock
+from django.contrib.auth.models import Group
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from rest_framework_simplejwt.tokens import AccessToken
+from holidaybooking import db_router, locks
+from holidaybooking.db_router import ReplicaRouter, get_sticky_key, replica_reads_allowed
+from holidaybooking.locks import RELEASE_SCRIPT, single_instance_task
+from holidaybooking.middleware import ReplicaRoutingMiddleware
+
+# Use a local memory cache in tests instead of redis
+TEST_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@override_settings(CACHES=TEST_CACHES)
+class SingleInstanceTaskTest(SimpleTestCase):
+    """
+    Test that periodic task runs overlapping a running run are skipped and runs only release their own lock
+    """
+    key = f'task-lock:{__name__}.run'
+
+    def setUp(self):
+        cache.clear()
+        self.runs = []
+
+    def test_overlapping_run_is_skipped(self):
+        @single_instance_task(timeout=60)
+        def run():
+            self.runs.append('outer')
+            # Start another run while this one holds the lock
+            self.runs.append(run())
+            return 'done'
+
+        self.assertEqual(run(), 'done')
+        self.assertEqual(self.runs, ['outer', None])
+        # Lock is released once the run ends
+        self.assertIsNone(cache.get(self.key))
+
+    def test_expired_run_does_not_release_lock_of_another_run(self):
+        @single_instance_task(timeout=60)
+        def run():
+            # Let the lock expire and another run take it over while this run is still running
+            cache.set(self.key, 'other run')
+
+        run()
+        self.assertEqual(cache.get(self.key), 'other run')
+
+    def test_redis_locks_use_plain_tokens_and_compare_and_delete_release(self):
+        client = mock.Mock()
+        client.set.return_value = True
+
+        @single_instance_task(timeout=60)
+        def run():
+            return 'done'
+
+        with mock.patch.object(locks, 'get_lock_client', return_value=client):
+            self.assertEqual(run(), 'done')
+        key, token = client.set.call_args.args
+        self.assertEqual(key, self.key)
+        self.assertEqual(client.set.call_args.kwargs, {'nx': True, 'ex': 60})
+        client.eval.assert_called_once_with(RELEASE_SCRIPT, 1, self.key, token)
+
+    def test_redis_lock_held_by_another_run_skips_run(self):
+        client = mock.Mock()
+        client.set.return_value = None
+
+        @single_instance_task(timeout=60)
+        def run():
+            self.runs.append('run')
+
+        with mock.patch.object(locks, 'get_lock_client', return_value=client):
+            self.assertIsNone(run())
+        self.assertEqual(self.runs, [])
+        client.eval.assert_not_called()
+
+
+@override_settings(REPLICA_DATABASES=['replica_0'])
+class ReplicaRouterTest(SimpleTestCase):
+    """
+    Test that reads go to a healthy replica only when replica reads are allowed outside transactions
+    """
+
+    def setUp(self):
+        self.router = ReplicaRouter()
+
+    def route(self, allowed=True):
+        token = replica_reads_allowed.set(allowed)
+        try:
+            return self.router.db_for_read(Group)
+        finally:
+            replica_reads_allowed.reset(token)
+
+    def mock_connections(self, lag=None, error=None):
+        # Answer the lag check of every alias with the given lag or database error
+        connection = mock.MagicMock(in_atomic_block=False)
+        cursor = connection.cursor.return_value.__enter__.return_value
+        cursor.fetchone.return_value = (lag,)
+        cursor.execute.side_effect = error
+        patcher = mock.patch.object(db_router, 'connections', {DEFAULT_DB_ALIAS: connection, 'replica_0': connection})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return connection, cursor
+
+    def test_reads_use_primary_unless_allowed(self):
+        with mock.patch.object(ReplicaRouter, 'is_healthy', return_value=True):
+            self.assertEqual(self.route(allowed=False), DEFAULT_DB_ALIAS)
+            self.assertEqual(self.route(), 'replica_0')
+
+    @override_settings(REPLICA_DATABASES=[])
+    def test_reads_use_primary_without_replicas(self):
+        self.assertEqual(self.route(), DEFAULT_DB_ALIAS)
+
+    def test_reads_in_transaction_use_primary(self):
+        with mock.patch.object(ReplicaRouter, 'is_healthy', return_value=True), \
+                mock.patch.object(connections[DEFAULT_DB_ALIAS], 'in_atomic_block', True):
+            self.assertEqual(self.route(), DEFAULT_DB_ALIAS)
+
+    def test_writes_use_primary(self):
+        self.assertEqual(self.router.db_for_write(Group), DEFAULT_DB_ALIAS)
+
+    @override_settings(REPLICA_MAX_SILENCE_SECONDS=30)
+    def test_replica_within_allowed_lag_is_used(self):
+        _, cursor = self.mock_connections(lag=0.5)
+        self.assertEqual(self.route(), 'replica_0')
+        cursor.execute.assert_called_once_with(db_router.LAG_QUERY, [30])
+
+    @override_settings(REPLICA_MAX_LAG_SECONDS=2)
+    def test_lagging_replica_falls_back_to_primary(self):
+        self.mock_connections(lag=5.0)
+        self.assertEqual(self.route(), DEFAULT_DB_ALIAS)
+
+    def test_replica_not_streaming_falls_back_to_primary(self):
+        self.mock_connections(lag=None)
+        with self.assertLogs(db_router.logger, 'WARNING'):
+            self.assertEqual(self.route(), DEFAULT_DB_ALIAS)
+
+    def test_failed_lag_check_falls_back_to_primary(self):
+        connection, cursor = self.mock_connections(error=DatabaseError('connection refused'))
+        with self.assertLogs(db_router.logger, 'WARNING'):
+            self.assertEqual(self.route(), DEFAULT_DB_ALIAS)
+        connection.close.assert_called_once_with()
+        # Reuse the failed check until the check interval passes
+        self.assertEqual(self.route(), DEFAULT_DB_ALIAS)
+        self.assertEqual(cursor.execute.call_count, 1)
+
+
+@override_settings(CACHES=TEST_CACHES, REPLICA_DATABASES=['replica_0'], REPLICA_STICKY_SECONDS=5)
+class ReplicaRoutingMiddlewareTest(SimpleTestCase):
+    """
+    Test that safe requests may read from replicas unless their user wrote recently
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+        self.middleware = ReplicaRoutingMiddleware(self.get_response)
+
+    def get_response(self, request):
+        # Answer with whether the view was allowed to read from replicas
+        return HttpResponse(str(replica_reads_allowed.get()))
+
+    def request(self, method, user_id=None, authorization=None):
+        if user_id is not None:
+            token = AccessToken()
+            token['user_id'] = user_id
+            authorization = f'JWT {token}'
+        headers = {'HTTP_AUTHORIZATION': authorization} if authorization else {}
+        response = self.middleware(self.factory.generic(method, '/properties/', **headers))
+        return response.content == b'True'
+
+    def test_safe_requests_may_read_from_replicas(self):
+        for method in ReplicaRoutingMiddleware.safe_methods:
+            self.assertTrue(self.request(method))
+            self.assertTrue(self.request(method, user_id=1))
+
+    def test_unsafe_requests_read_from_primary(self):
+        for method in ['POST', 'PUT', 'PATCH', 'DELETE']:
+            self.assertFalse(self.request(method))
+        self.assertFalse(replica_reads_allowed.get())
+
+    def test_user_reads_from_primary_after_writing(self):
+        self.assertFalse(self.request('POST', user_id=1))
+        self.assertFalse(self.request('GET', user_id=1))
+        # Other users and anonymous clients keep reading from replicas
+        self.assertTrue(self.request('GET', user_id=2))
+        self.assertTrue(self.request('GET'))
+        cache.delete(get_sticky_key(1))
+        self.assertTrue(self.request('GET', user_id=1))
+
+    def test_invalid_token_is_not_sticky(self):
+        self.assertFalse(self.request('POST', authorization='JWT invalid'))
+        self.assertTrue(self.request('GET', authorization='JWT invalid'))
+
+    @override_settings(REPLICA_DATABASES=[])
+    def test_writes_are_not_tracked_without_replicas(self):
+        self.assertFalse(self.request('POST', user_id=1))
+        self.assertIsNone(cache.get(get_sticky_key(1)))
@@ -17,6 +17,7 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
+from holidaybooking.views import metrics_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -24,9 +25,13 @@ urlpatterns = [
     path('auth/', include('djoser.urls')),
     path('auth/', include('djoser.urls.jwt')),
     path('', include('reservation.urls')),
-    path('__debug__/', include('debug_toolbar.urls')),
+    # Expose request, task and service metrics to prometheus
+    path('metrics', metrics_view, name='metrics'),
 ]
 
+if settings.DEBUG_TOOLBAR:
+    urlpatterns += [path('__debug__/', include('debug_toolbar.urls'))]
+
 if settings.DEBUG:
     urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
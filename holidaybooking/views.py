@@ -0,0 +1,21 @@
+import hmac
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from holidaybooking.metrics import registry
+
+
+def metrics_view(request):
+    """
+    Expose metrics collected by the process serving the request in prometheus text exposition format, protected by
+    bearer token and denied when no token is configured outside of debug mode. Each web worker process keeps its own
+    registry, so web servers exposing metrics run a single worker process per instance and scale with threads
+    :param request:
+    :return:
+    """
+    if settings.METRICS_TOKEN:
+        authorization = request.headers.get('Authorization', '')
+        if not hmac.compare_digest(authorization, f'Bearer {settings.METRICS_TOKEN}'):
+            return HttpResponseForbidden()
+    elif not settings.DEBUG:
+        return HttpResponseForbidden()
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -1,23 +1,30 @@
 from django.contrib import admin
-from reservation.models import Property, Media, Feature, FeatureCategory, Review, Category, Reservation
+from holidaybooking.admin import PerformanceAdminMixin, RelatedIdFilter
+from reservation.models import Property, Media, Feature, FeatureCategory, Review, Category, Reservation, \
+    PropertyRate, StayDiscount
 
 
 @admin.register(Media)
-class PropertyMedia(admin.ModelAdmin):
+class PropertyMedia(PerformanceAdminMixin, admin.ModelAdmin):
     """
     Register property media model in admin site
     """
     list_display = ['name', 'property']
-    list_filter = ['property']
+    list_filter = [('property', RelatedIdFilter)]
+    list_select_related = ['property']
+    raw_id_fields = ['property']
 
 
 @admin.register(Property)
-class PropertyAdmin(admin.ModelAdmin):
+class PropertyAdmin(PerformanceAdminMixin, admin.ModelAdmin):
     """
     Register property model in admin site
     """
     list_display = ['name', 'description', 'owner', 'address', 'available']
-    list_filter = ['category', 'available']
+    list_filter = ['category', 'available', ('owner', RelatedIdFilter)]
+    list_select_related = ['owner']
+    raw_id_fields = ['owner']
+    autocomplete_fields = ['category']
 
 
 @admin.register(FeatureCategory)
@@ -27,24 +34,29 @@ class PropertyFeatureCategoryAdmin(admin.ModelAdmin):
     """
     list_display = ['name', 'description']
     list_filter = ['name']
+    search_fields = ['name']
 
 
 @admin.register(Feature)
-class PropertyFeatureAdmin(admin.ModelAdmin):
+class PropertyFeatureAdmin(PerformanceAdminMixin, admin.ModelAdmin):
     """
     Add property media model in admin site
     """
     list_display = ['name', 'description']
-    list_filter = ['name']
+    list_filter = ['name', ('property', RelatedIdFilter)]
+    raw_id_fields = ['property']
+    autocomplete_fields = ['feature_category']
 
 
 @admin.register(Review)
-class PropertyReviewAdmin(admin.ModelAdmin):
+class PropertyReviewAdmin(PerformanceAdminMixin, admin.ModelAdmin):
     """
     Add property review model in admin site
     """
     list_display = ['user', 'property', 'rate']
-    list_filter = ['rate']
+    list_filter = ['rate', ('property', RelatedIdFilter), ('user', RelatedIdFilter)]
+    list_select_related = ['user', 'property']
+    raw_id_fields = ['user', 'property']
 
 
 @admin.register(Category)
@@ -54,9 +66,34 @@ class PropertyCategoryAdmin(admin.ModelAdmin):
     """
     list_display = ['name', 'description', 'slug']
     list_filter = ['name']
+    search_fields = ['name']
 
 
 @admin.register(Reservation)
-class ReservationAdmin(admin.ModelAdmin):
+class ReservationAdmin(PerformanceAdminMixin, admin.ModelAdmin):
     list_display = ['property', 'reservation_from', 'reservation_to', 'reservation_to', 'guest']
-    list_filter = ['guest', 'property']
+    list_filter = [('guest', RelatedIdFilter), ('property', RelatedIdFilter)]
+    list_select_related = ['property', 'guest']
+    raw_id_fields = ['property', 'guest']
+
+
+@admin.register(PropertyRate)
+class PropertyRateAdmin(PerformanceAdminMixin, admin.ModelAdmin):
+    """
+    Add property rate model in admin site
+    """
+    list_display = ['name', 'property', 'start_date', 'end_date', 'weekday', 'price_per_night', 'priority']
+    list_filter = ['weekday', ('property', RelatedIdFilter)]
+    list_select_related = ['property']
+    raw_id_fields = ['property']
+
+
+@admin.register(StayDiscount)
+class StayDiscountAdmin(PerformanceAdminMixin, admin.ModelAdmin):
+    """
+    Add property stay discount model in admin site
+    """
+    list_display = ['property', 'min_nights', 'percent']
+    list_filter = [('property', RelatedIdFilter)]
+    list_select_related = ['property']
+    raw_id_fields = ['property']
@@ -0,0 +1,219 @@
+"""
+Async read views of the hot property, category and review endpoints served without a thread per request under asgi.
+
+Views load their rows with the async orm and await independent queries together, then serialize loaded rows with
+the same serializers as the sync view sets. Lists are paginated with a keyset cursor over creation time and id.
+"""
+import asyncio
+import base64
+import binascii
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Count, Q
+from django.http import JsonResponse
+from django.utils.dateparse import parse_datetime
+from django.views import View
+from rest_framework.exceptions import AuthenticationFailed, ValidationError
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework.utils.urls import replace_query_param
+from account.authentication import CachedJWTAuthentication
+from reservation.models import Category, Feature, Media, Property, Review
+from reservation.serializers import CategorySerializer, FeatureSerializer, MediaSerializer, PropertyListSerializer, \
+    PropertySerializer, ReviewSerializer
+
+# Define serializers and models of property relations output by property views
+PROPERTY_RELATIONS = {
+    'media': (Media, MediaSerializer),
+    'reviews': (Review, ReviewSerializer),
+    'features': (Feature, FeatureSerializer),
+}
+
+# Let client choose page size up to a maximum
+MAX_PAGE_SIZE = 100
+
+
+class InvalidCursor(Exception):
+    """
+    Raised when a cursor query parameter can not be decoded
+    """
+
+
+def encode_cursor(obj):
+    position = f'{obj.created_at.isoformat()}|{obj.pk}'
+    return base64.urlsafe_b64encode(position.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """
+    Decode cursor into creation time and id of the last object of the previous page
+    :param cursor:
+    :return:
+    """
+    try:
+        created_at, pk = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        created_at = parse_datetime(created_at)
+        pk = int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise InvalidCursor()
+    if created_at is None:
+        raise InvalidCursor()
+    return created_at, pk
+
+
+def render(data, status=200):
+    # Encode response data like the api json renderer of sync views
+    return JsonResponse(data, status=status, safe=False, encoder=JSONEncoder)
+
+
+def get_page_size(request):
+    try:
+        page_size = int(request.GET.get('page_size', settings.REST_FRAMEWORK['PAGE_SIZE']))
+    except ValueError:
+        page_size = settings.REST_FRAMEWORK['PAGE_SIZE']
+    return min(max(page_size, 1), MAX_PAGE_SIZE)
+
+
+async def paginate(request, queryset):
+    """
+    Load a page of objects newest first after the cursor position
+    :param request:
+    :param queryset:
+    :return: page objects and url of the next page
+    """
+    page_size = get_page_size(request)
+    cursor = request.GET.get('cursor')
+    if cursor:
+        created_at, pk = decode_cursor(cursor)
+        queryset = queryset.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, pk__lt=pk))
+    rows = [obj async for obj in queryset.order_by('-created_at', '-id')[:page_size + 1]]
+    page = rows[:page_size]
+    next_url = None
+    if len(rows) > page_size:
+        next_url = replace_query_param(request.build_absolute_uri(), 'cursor', encode_cursor(page[-1]))
+    return page, next_url
+
+
+async def load_property_relations(property_ids, relations):
+    """
+    Load requested relations of properties with one query per relation awaited together
+    :param property_ids:
+    :param relations: relation names
+    :return: related objects by relation name and property id
+    """
+    async def load(relation):
+        model = PROPERTY_RELATIONS[relation][0]
+        related = {property_id: [] for property_id in property_ids}
+        async for obj in model.objects.filter(property_id__in=property_ids):
+            related[obj.property_id].append(obj)
+        return related
+
+    loaded = await asyncio.gather(*(load(relation) for relation in relations))
+    return dict(zip(relations, loaded))
+
+
+def serialize_properties(serializer_class, properties, requested_fields, related, context):
+    """
+    Serialize properties with their relations loaded separately
+    :param serializer_class:
+    :param properties:
+    :param requested_fields:
+    :param related: related objects by relation name and property id
+    :param context:
+    :return:
+    """
+    data = serializer_class(properties, many=True,
+                            context={**context, 'requested_fields': requested_fields - set(related)}).data
+    for item, property in zip(data, properties):
+        for relation, objects in related.items():
+            item[relation] = PROPERTY_RELATIONS[relation][1](objects[property.pk], many=True, context=context).data
+    return data
+
+
+class AsyncReadView(View):
+    """
+    Create base async view authenticating requests with jwt access tokens
+    """
+    http_method_names = ['get']
+
+    # Set authentication class shared with sync api views
+    authentication_class = CachedJWTAuthentication
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            authenticated = await sync_to_async(self.authentication_class().authenticate)(request)
+        except AuthenticationFailed as error:
+            return render({'detail': error.detail}, status=401)
+        if authenticated is None:
+            return render({'detail': 'Authentication credentials were not provided.'}, status=401)
+        request.user = authenticated[0]
+        try:
+            return await super().dispatch(request, *args, **kwargs)
+        except ValidationError as error:
+            return render(error.detail, status=400)
+        except InvalidCursor:
+            return render({'detail': 'Invalid cursor'}, status=404)
+
+
+class AsyncPropertyListView(AsyncReadView):
+    """
+    Create async property list view with relations loaded only when expanded
+    """
+    serializer_class = PropertyListSerializer
+
+    async def get(self, request, *args, **kwargs):
+        requested_fields = self.serializer_class.get_requested_fields(request.GET)
+        queryset = Property.objects.only(*self.serializer_class.get_model_fields(requested_fields), 'created_at')
+        page, next_url = await paginate(request, queryset)
+        relations = self.serializer_class.get_prefetch_fields(requested_fields)
+        related = await load_property_relations([property.pk for property in page], relations)
+        results = serialize_properties(self.serializer_class, page, requested_fields, related, {'request': request})
+        return render({'next': next_url, 'previous': None, 'results': results})
+
+
+class AsyncPropertyDetailView(AsyncReadView):
+    """
+    Create async property detail view loading property and its relations together
+    """
+    serializer_class = PropertySerializer
+
+    async def get(self, request, pk, *args, **kwargs):
+        requested_fields = self.serializer_class.get_requested_fields(request.GET)
+        queryset = Property.objects.only(*self.serializer_class.get_model_fields(requested_fields), 'created_at')
+        relations = self.serializer_class.get_prefetch_fields(requested_fields)
+        property, related = await asyncio.gather(queryset.filter(pk=pk).afirst(),
+                                                 load_property_relations([pk], relations))
+        if property is None:
+            return render({'detail': 'Not found.'}, status=404)
+        results = serialize_properties(self.serializer_class, [property], requested_fields, related,
+                                       {'request': request})
+        return render(results[0])
+
+
+class AsyncCategoryListView(AsyncReadView):
+    """
+    Create async category list view with property counts
+    """
+
+    async def get(self, request, *args, **kwargs):
+        page, next_url = await paginate(request, Category.objects.annotate(property_count=Count('properties')))
+        results = CategorySerializer(page, many=True, context={'request': request}).data
+        return render({'next': next_url, 'previous': None, 'results': results})
+
+
+class AsyncReviewListView(AsyncReadView):
+    """
+    Create async property review list view returning a page of reviews with the property rating aggregates
+    """
+
+    async def get(self, request, property_pk, *args, **kwargs):
+        (page, next_url), rating = await asyncio.gather(
+            paginate(request, Review.objects.filter(property_id=property_pk)),
+            Property.objects.filter(pk=property_pk).values('rating_average', 'rating_count',
+                                                           'rating_histogram').afirst())
+        if rating is None:
+            return render({'detail': 'Not found.'}, status=404)
+        # Stored rating average is zero for properties without reviews
+        rating = {'average_rate': rating['rating_average'] if rating['rating_count'] else None,
+                  'rating_count': rating['rating_count'], 'rating_histogram': rating['rating_histogram']}
+        results = ReviewSerializer(page, many=True, context={'request': request, 'property_id': property_pk}).data
+        return render({'next': next_url, 'previous': None, 'rating': rating, 'results': results})
@@ -0,0 +1,205 @@
+import math
+import random
+import time
+from dataclasses import dataclass
+from datetime import timedelta
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.contrib.gis.geos import Point
+from django.db import connection
+from django.db.backends.postgresql.psycopg_any import DateTimeTZRange
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from reservation.budgets import QUERY_BUDGETS
+from reservation.models import Category, Feature, FeatureCategory, Media, Property, Reservation, Review
+from reservation.tasks import sync_reservation_state
+
+# Disable response caching while benchmarking so every request runs its queries
+BENCHMARK_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+
+# Define words property names and descriptions are made of
+WORDS = ['beach', 'villa', 'cabin', 'lake', 'mountain', 'city', 'loft', 'garden', 'pool', 'sea', 'view', 'forest',
+         'cottage', 'studio', 'family', 'quiet', 'sunny', 'historic', 'modern', 'river']
+
+
+class BenchmarkError(Exception):
+    """
+    Raised when a benchmark scenario request fails
+    """
+
+
+@dataclass(frozen=True)
+class BenchmarkResult:
+    """
+    Latency percentiles in milliseconds and largest query count of a benchmark scenario
+    """
+    name: str
+    iterations: int
+    p50: float
+    p95: float
+    p99: float
+    max_queries: int
+    budget: int
+
+    @property
+    def over_budget(self):
+        return self.max_queries > self.budget
+
+
+def seed_benchmark_data(properties=1000, reviews_per_property=10, media_per_property=3, features_per_property=5,
+                        reservations_per_property=5, seed=0):
+    """
+    Insert users, categories and properties with reviews, media, features and past reservations in bulk
+    :param properties: number of properties
+    :param reviews_per_property:
+    :param media_per_property:
+    :param features_per_property:
+    :param reservations_per_property:
+    :param seed: random seed making seeded data reproducible
+    :return: seeded host, guest, categories and properties
+    """
+    generator = random.Random(seed)
+    now = timezone.now()
+    user_model = get_user_model()
+    host = user_model.objects.create(email='benchmark-host@example.com', username='benchmark-host@example.com',
+                                     role=user_model.HOST)
+    guest = user_model.objects.create(email='benchmark-guest@example.com', username='benchmark-guest@example.com',
+                                      role=user_model.GUEST)
+    reviewers = user_model.objects.bulk_create([
+        user_model(email=f'benchmark-reviewer-{index}@example.com', username=f'benchmark-reviewer-{index}@example.com',
+                   role=user_model.GUEST) for index in range(reviews_per_property)])
+    categories = Category.objects.bulk_create([
+        Category(name=name, description=f'{name} stays', slug=name) for name in ['apartment', 'house', 'cabin']])
+    feature_category = FeatureCategory.objects.create(name='amenities', description='Property amenities')
+
+    seeded_properties = Property.objects.bulk_create([
+        Property(name=' '.join(generator.sample(WORDS, 3)), description=' '.join(generator.choices(WORDS, k=30)),
+                 slug=f'benchmark-property-{index}', owner=host, category=generator.choice(categories),
+                 address=f'{index} Benchmark Street', size=generator.uniform(30, 300),
+                 location=Point(generator.uniform(-10, 30), generator.uniform(35, 60), srid=4326),
+                 number_of_bedrooms=generator.randint(1, 5), number_of_beds=generator.randint(1, 8),
+                 number_of_baths=generator.randint(1, 3), number_of_adult_guests=generator.randint(1, 8),
+                 number_of_child_guests=generator.randint(0, 4),
+                 price_per_night=Decimal(generator.randint(4000, 50000)) / 100, available=True,
+                 available_from=now - timedelta(days=365), available_to=now + timedelta(days=3 * 365))
+        for index in range(properties)], batch_size=1000)
+
+    Review.objects.bulk_create([
+        Review(user=reviewer, property=property, comment=' '.join(generator.choices(WORDS, k=12)),
+               rate=generator.randint(1, 5))
+        for property in seeded_properties for reviewer in reviewers], batch_size=5000)
+    Media.objects.bulk_create([
+        Media(name=f'photo {index}', property=property, processing_state=Media.PROCESSING_READY)
+        for property in seeded_properties for index in range(media_per_property)], batch_size=5000)
+    Feature.objects.bulk_create([
+        Feature(name=generator.choice(WORDS), property=property, feature_category=feature_category)
+        for property in seeded_properties for index in range(features_per_property)], batch_size=5000)
+    # Seed reservations of past weeks leaving future dates free for booking scenarios
+    reservations = []
+    for property in seeded_properties:
+        for index in range(reservations_per_property):
+            reservation_from = now - timedelta(days=7 * (index + 1))
+            reservation = Reservation(property=property, guest=guest, reservation_from=reservation_from,
+                                      reservation_to=reservation_from + timedelta(days=3))
+            # Set period here since bulk inserts skip the reservation save method
+            reservation.period = DateTimeTZRange(reservation.reservation_from, reservation.reservation_to, '[)')
+            reservations.append(reservation)
+    Reservation.objects.bulk_create(reservations, batch_size=5000)
+    Property.objects.filter(pk__in=[property.pk for property in seeded_properties]).refresh_review_aggregates()
+    return {'host': host, 'guest': guest, 'categories': categories, 'properties': seeded_properties}
+
+
+def check_response(response):
+    if response.status_code >= 400:
+        raise BenchmarkError(f'{response.request["REQUEST_METHOD"]} {response.request["PATH_INFO"]} answered '
+                             f'{response.status_code}: {response.content[:500]!r}')
+    return response
+
+
+def property_list(client, dataset, iteration):
+    return check_response(client.get('/properties/'))
+
+
+def property_detail(client, dataset, iteration):
+    property = dataset['properties'][iteration % len(dataset['properties'])]
+    return check_response(client.get(f'/properties/{property.pk}/'))
+
+
+def property_search(client, dataset, iteration):
+    return check_response(client.get('/properties/', {'search': WORDS[iteration % len(WORDS)]}))
+
+
+def property_available(client, dataset, iteration):
+    check_in = timezone.now() + timedelta(days=30 + iteration % 300)
+    return check_response(client.get('/properties/', {
+        'check_in': check_in.isoformat(), 'check_out': (check_in + timedelta(days=3)).isoformat(), 'adults': 2}))
+
+
+def category_list(client, dataset, iteration):
+    return check_response(client.get('/categories/'))
+
+
+def review_list(client, dataset, iteration):
+    property = dataset['properties'][iteration % len(dataset['properties'])]
+    return check_response(client.get(f'/properties/{property.pk}/reviews/'))
+
+
+def reservation_create(client, dataset, iteration):
+    # Book each property for consecutive future stays so iterations never overlap
+    properties = dataset['properties']
+    property = properties[iteration % len(properties)]
+    reservation_from = timezone.now() + timedelta(days=30 + 3 * (iteration // len(properties)))
+    return check_response(client.post('/reservations/', {
+        'property': property.pk, 'reservation_from': reservation_from.isoformat(),
+        'reservation_to': (reservation_from + timedelta(days=2)).isoformat()}, format='json'))
+
+
+def reservation_state_task(client, dataset, iteration):
+    return sync_reservation_state(timezone.now() + timedelta(minutes=iteration))
+
+
+# Define benchmark scenarios by name, each runs one request or task run for an iteration number
+SCENARIOS = {
+    'property-list': property_list,
+    'property-detail': property_detail,
+    'property-search': property_search,
+    'property-available': property_available,
+    'category-list': category_list,
+    'review-list': review_list,
+    'reservation-create': reservation_create,
+    'reservation-state-task': reservation_state_task,
+}
+
+
+def run_scenario(name, client, dataset, iterations):
+    """
+    Run a scenario a number of times measuring latency and sql queries of each run
+    :param name: scenario name
+    :param client: api test client authenticated as a guest
+    :param dataset: seeded data as returned by seed_benchmark_data
+    :param iterations:
+    :return:
+    """
+    scenario = SCENARIOS[name]
+    durations = []
+    max_queries = 0
+    for iteration in range(iterations):
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            scenario(client, dataset, iteration)
+            durations.append((time.perf_counter() - started) * 1000)
+        max_queries = max(max_queries, len(queries))
+    return BenchmarkResult(name=name, iterations=iterations, p50=percentile(durations, 50),
+                           p95=percentile(durations, 95), p99=percentile(durations, 99), max_queries=max_queries,
+                           budget=QUERY_BUDGETS[name])
+
+
+def percentile(values, percent):
+    """
+    Get nearest rank percentile of values
+    :param values:
+    :param percent:
+    :return:
+    """
+    ordered = sorted(values)
+    return ordered[max(math.ceil(percent / 100 * len(ordered)) - 1, 0)]
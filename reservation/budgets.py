@@ -0,0 +1,20 @@
+# Define largest number of sql queries each benchmark scenario may run in one request or task run, shared by query
+# budget tests and the benchmark command so both fail when a change adds queries per listed row
+QUERY_BUDGETS = {
+    # Page of properties without nested relations
+    'property-list': 1,
+    # Property with prefetched media, reviews and features
+    'property-detail': 4,
+    # Full text search ranked by relevance
+    'property-search': 1,
+    # Availability search anti joining overlapping reservations
+    'property-available': 1,
+    # Page of categories with annotated property counts
+    'category-list': 1,
+    # Page of property reviews
+    'review-list': 1,
+    # Property lookup, rates and discounts, reservation insert and transaction savepoints
+    'reservation-create': 8,
+    # Activation and release updates of reservation states
+    'reservation-state-task': 2,
+}
@@ -0,0 +1,121 @@
+import hashlib
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from rest_framework.response import Response
+from holidaybooking.db_router import replica_reads_allowed
+
+CACHE_KEY_PREFIX = 'api-cache'
+
+
+def invalidate_cache(*namespaces):
+    """
+    Invalidate cached responses of namespaces by replacing their versions once the current transaction commits
+    :param namespaces: list namespaces like property:list or object namespaces like property:1
+    :return:
+    """
+    def replace_versions():
+        version = time.time_ns()
+        cache.set_many({f'{CACHE_KEY_PREFIX}:version:{namespace}': version for namespace in namespaces}, None)
+
+    transaction.on_commit(replace_versions)
+
+
+class CachedReadMixin:
+    """
+    Create view set mixin caching serialized list and detail responses until their data changes
+    """
+    # Define namespace of cached responses, lists are cached under namespace list and objects under namespace and
+    # primary key, all responses of the namespace expire with namespace all
+    cache_namespace = None
+
+    def list(self, request, *args, **kwargs):
+        return self.get_cached_response(request, self.get_cache_namespaces(), super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        pk = kwargs[self.lookup_url_kwarg or self.lookup_field]
+        return self.get_cached_response(request, self.get_cache_namespaces(pk), super().retrieve, *args, **kwargs)
+
+    def get_cache_namespaces(self, pk=None):
+        """
+        Define namespaces whose invalidation expires cached list or detail responses
+        :param pk: primary key of the object for detail responses
+        :return:
+        """
+        if pk is None:
+            return [f'{self.cache_namespace}:list', f'{self.cache_namespace}:all']
+        return [f'{self.cache_namespace}:{pk}', f'{self.cache_namespace}:all']
+
+    def get_cached_response(self, request, namespaces, view, *args, **kwargs):
+        """
+        Get response from cache or render it with view and cache it, then answer conditional requests
+        :param request:
+        :param namespaces:
+        :param view: view set action to build response on cache miss
+        :return:
+        """
+        version_keys = [f'{CACHE_KEY_PREFIX}:version:{namespace}' for namespace in namespaces]
+        versions = cache.get_many(version_keys)
+        version = ':'.join(str(versions.get(key, 0)) for key in version_keys)
+        # Versions are replaced with the invalidation time in nanoseconds
+        invalidated_at = max(versions.values(), default=0) // 10 ** 9
+        # Key responses by scheme and host as well as path, pagination and media links are absolute urls
+        url_hash = hashlib.md5(request.build_absolute_uri().encode()).hexdigest()
+        key = f'{CACHE_KEY_PREFIX}:response:{url_hash}:{version}'
+
+        entry = cache.get(key)
+        if entry is None:
+            # Render cached responses from the primary, a replica may not have replayed the change that replaced the
+            # version yet and its stale rows would be cached under the new version
+            token = replica_reads_allowed.set(False)
+            try:
+                response = view(request, *args, **kwargs)
+            finally:
+                replica_reads_allowed.reset(token)
+            if response.status_code != 200:
+                return response
+            entry = {'data': response.data, **self.get_cache_validators(version, invalidated_at)}
+            cache.set(key, entry, settings.API_CACHE_TIMEOUT)
+
+        response = Response(entry['data'])
+        if entry['etag']:
+            response['ETag'] = entry['etag']
+        if entry['last_modified']:
+            response['Last-Modified'] = http_date(entry['last_modified'])
+        # Let clients store responses but revalidate them with etag and last modified headers
+        patch_cache_control(response, private=True, no_cache=True)
+        return get_conditional_response(request, etag=entry['etag'], last_modified=entry['last_modified'],
+                                        response=response)
+
+    def get_cache_validators(self, version, invalidated_at=0):
+        """
+        Derive etag and last modified time from update times of rendered objects and cache version, changes of related
+        rows expire the cache version without updating the rendered objects
+        :param version:
+        :param invalidated_at: time in seconds the cache version was last replaced
+        :return:
+        """
+        objects = getattr(self, 'cached_objects', None)
+        if objects is None:
+            return {'etag': None, 'last_modified': None}
+        fingerprint = ':'.join(f'{obj.pk}@{obj.updated_at.timestamp()}' for obj in objects)
+        last_modified = max((int(obj.updated_at.timestamp()) for obj in objects), default=None)
+        if last_modified is not None:
+            last_modified = max(last_modified, invalidated_at)
+        etag = quote_etag(hashlib.md5(f'{version}|{fingerprint}'.encode()).hexdigest())
+        return {'etag': etag, 'last_modified': last_modified}
+
+    def paginate_queryset(self, queryset):
+        # Keep rendered page objects to derive cache validators from
+        page = super().paginate_queryset(queryset)
+        self.cached_objects = page
+        return page
+
+    def get_object(self):
+        # Keep rendered object to derive cache validators from
+        obj = super().get_object()
+        self.cached_objects = [obj]
+        return obj
@@ -0,0 +1,204 @@
+"""
+Synthetic dataset generation loading production shaped rows with postgres COPY.
+
+Property ids are reserved from the property sequence up front so worker processes can generate properties and
+their child rows in independent chunks. Every chunk draws from its own random generator seeded with the dataset
+seed and chunk number, so a seed always produces the same rows whatever the number of workers.
+"""
+import io
+import random
+from datetime import datetime, timedelta
+from decimal import Decimal, ROUND_HALF_UP
+from django.conf import settings
+from django.db import connection, transaction
+from reservation.models import Feature, Media, Property, Reservation, Review
+
+# Define city centers as latitude, longitude and spread in degrees properties are scattered around
+CITIES = [
+    (40.7128, -74.0060, 0.25), (34.0522, -118.2437, 0.35), (25.7617, -80.1918, 0.2), (51.5074, -0.1278, 0.25),
+    (48.8566, 2.3522, 0.2), (41.3874, 2.1686, 0.15), (41.9028, 12.4964, 0.15), (52.5200, 13.4050, 0.2),
+    (38.7223, -9.1393, 0.15), (37.9838, 23.7275, 0.15), (36.3932, 25.4615, 0.1), (35.6762, 139.6503, 0.3),
+    (13.7563, 100.5018, 0.25), (-8.3405, 115.0920, 0.3), (25.2048, 55.2708, 0.2), (31.9539, 35.9106, 0.15),
+    (30.0444, 31.2357, 0.2), (-33.9249, 18.4241, 0.2), (-33.8688, 151.2093, 0.3), (-22.9068, -43.1729, 0.2),
+    (19.4326, -99.1332, 0.25), (21.1619, -86.8515, 0.15), (49.2827, -123.1207, 0.2), (46.2044, 6.1432, 0.1),
+]
+
+# Define words generated names, descriptions and comments are made of
+ADJECTIVES = ['cozy', 'sunny', 'quiet', 'modern', 'historic', 'spacious', 'charming', 'bright', 'rustic', 'elegant',
+              'luxury', 'family', 'romantic', 'central', 'secluded', 'seaside']
+NOUNS = ['apartment', 'villa', 'cabin', 'loft', 'studio', 'cottage', 'house', 'chalet', 'bungalow', 'penthouse',
+         'farmhouse', 'suite', 'townhouse', 'retreat']
+FEATURES = ['wifi', 'pool', 'parking', 'air conditioning', 'kitchen', 'washer', 'balcony', 'garden', 'fireplace',
+            'hot tub', 'gym', 'sea view', 'workspace', 'bbq grill', 'pet friendly']
+COMMENT_WORDS = ['great', 'clean', 'location', 'host', 'friendly', 'comfortable', 'view', 'quiet', 'recommend',
+                 'stay', 'again', 'spacious', 'beds', 'kitchen', 'walk', 'beach', 'noisy', 'small', 'perfect']
+STREETS = ['Main Street', 'Harbour Road', 'Park Avenue', 'Hill Lane', 'Market Square', 'Ocean Drive', 'Old Town',
+           'River Walk', 'Garden Road', 'Station Street']
+
+CENT = Decimal('0.01')
+
+# Hold dataset options of the current worker process, set once per worker instead of sent with every chunk
+worker_options = {}
+
+
+def init_worker(options):
+    """
+    Set dataset options of a worker process
+    :param options: dataset options with generated user and category ids
+    :return:
+    """
+    worker_options.clear()
+    worker_options.update(options)
+
+
+def copy_rows(model, columns, rows):
+    """
+    Load rows into the table of a model with COPY in text format
+    :param model:
+    :param columns: model field names in row order
+    :param rows: iterable of row values, generated values never contain tabs, newlines or backslashes
+    :return: number of loaded rows
+    """
+    buffer = io.StringIO()
+    count = 0
+    for row in rows:
+        buffer.write('\t'.join('\\N' if value is None else str(value) for value in row))
+        buffer.write('\n')
+        count += 1
+    if not count:
+        return 0
+    buffer.seek(0)
+    table = connection.ops.quote_name(model._meta.db_table)
+    column_names = ', '.join(connection.ops.quote_name(model._meta.get_field(name).column) for name in columns)
+    with connection.cursor() as cursor:
+        cursor.copy_expert(f'COPY {table} ({column_names}) FROM STDIN', buffer)
+    return count
+
+
+def reserve_property_ids(count):
+    """
+    Reserve a contiguous range of property ids from the property id sequence
+    :param count:
+    :return: first reserved id
+    """
+    table = Property._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                       f"nextval(pg_get_serial_sequence('{table}', 'id')) + %s - 1)", [count])
+        last_id = cursor.fetchone()[0]
+    return last_id - count + 1
+
+
+def generate_chunk(task):
+    """
+    Generate and load properties of a chunk with their features, media, reviews and reservations
+    :param task: chunk number, first property id and number of properties
+    :return: number of loaded rows by model
+    """
+    chunk, first_id, count = task
+    generator = random.Random(f'{worker_options["seed"]}:{chunk}')
+    with transaction.atomic():
+        return load_chunk(generator, first_id, count, worker_options)
+
+
+def load_chunk(generator, first_id, count, options):
+    """
+    Generate and load rows of a chunk with a chunk random generator
+    :param generator:
+    :param first_id:
+    :param count:
+    :param options:
+    :return:
+    """
+    now = datetime.fromisoformat(options['now'])
+    host_ids = options['host_ids']
+    guest_ids = options['guest_ids']
+    fee_rate = settings.RESERVATION_SERVICE_FEE_RATE
+
+    properties = []
+    property_rows = []
+    for property_id in range(first_id, first_id + count):
+        latitude, longitude, spread = generator.choice(CITIES)
+        bedrooms = generator.randint(1, 6)
+        available_from = now - timedelta(days=generator.randint(0, 365))
+        created_at = (available_from - timedelta(days=generator.randint(1, 60))).isoformat()
+        paid_cancellation = generator.random() < 0.3
+        data = {
+            'id': property_id,
+            'price_per_night': Decimal(generator.randint(30 * bedrooms, 150 * bedrooms) * 100 + 99) / 100,
+            'cancellation_fee_per_night': Decimal(generator.randint(0, 999)) / 100 if paid_cancellation else 0,
+            'available_from': available_from,
+            'available_to': now + timedelta(days=generator.randint(180, 730)),
+        }
+        properties.append(data)
+        property_rows.append([
+            property_id, f'{generator.choice(ADJECTIVES).title()} {generator.choice(NOUNS)} {property_id}',
+            f'{generator.choice(ADJECTIVES)} {generator.choice(NOUNS)} close to {generator.choice(FEATURES)} '
+            f'with {bedrooms} bedrooms',
+            f'{generator.choice(NOUNS)}-{property_id}', generator.choice(host_ids),
+            generator.choice(options['category_ids']), f'{generator.randint(1, 300)} {generator.choice(STREETS)}',
+            round(generator.uniform(20, 60) * bedrooms, 1),
+            # Write geography as extended well known text scattered around the city center
+            f'SRID=4326;POINT({longitude + generator.gauss(0, spread):.6f} '
+            f'{max(min(latitude + generator.gauss(0, spread), 90), -90):.6f})',
+            bedrooms, bedrooms + generator.randint(0, 3), generator.randint(1, bedrooms), bedrooms * 2,
+            generator.randint(0, bedrooms), data['price_per_night'], True, available_from.isoformat(),
+            data['available_to'].isoformat(), created_at, created_at,
+            Property.PAID_CANCELLATION if paid_cancellation else Property.FREE_CANCELLATION,
+            data['cancellation_fee_per_night'], 0, 0, '{}',
+        ])
+    loaded = {'properties': copy_rows(Property, [
+        'id', 'name', 'description', 'slug', 'owner', 'category', 'address', 'size', 'location', 'number_of_bedrooms',
+        'number_of_beds', 'number_of_baths', 'number_of_adult_guests', 'number_of_child_guests', 'price_per_night',
+        'available', 'available_from', 'available_to', 'created_at', 'updated_at', 'cancellation_policy',
+        'cancellation_fee_per_night', 'rating_average', 'rating_count', 'rating_histogram',
+    ], property_rows)}
+
+    loaded['features'] = copy_rows(Feature, ['name', 'description', 'property', 'feature_category'], (
+        [feature, '', data['id'], generator.choice(options['feature_category_ids'])]
+        for data in properties
+        for feature in generator.sample(
+            FEATURES, min(generator.randint(0, options['features_per_property'] * 2), len(FEATURES)))))
+
+    loaded['media'] = copy_rows(Media, [
+        'name', 'description', 'property', 'photo', 'video', 'variants', 'processing_state',
+    ], (
+        [f'photo {index + 1}', '', data['id'], f'property/photos/{data["id"]}-{index + 1}.jpg', '', '{}',
+         Media.PROCESSING_READY]
+        for data in properties for index in range(generator.randint(1, options['media_per_property'] * 2))))
+
+    def reviews():
+        for data in properties:
+            review_count = min(generator.randint(0, options['reviews_per_property'] * 2), len(guest_ids))
+            for guest_id in generator.sample(guest_ids, review_count):
+                created_at = (data['available_from'] + timedelta(minutes=generator.randint(
+                    0, max(int((now - data['available_from']).total_seconds() // 60), 1)))).isoformat()
+                yield [guest_id, data['id'], ' '.join(generator.choices(COMMENT_WORDS, k=generator.randint(3, 20))),
+                       min(max(round(generator.gauss(4.2, 0.9)), 1), 5), created_at, created_at]
+
+    loaded['reviews'] = copy_rows(Review, ['user', 'property', 'comment', 'rate', 'created_at', 'updated_at'],
+                                  reviews())
+
+    def reservations():
+        for data in properties:
+            # Place stays one after another with gaps so reservations of a property never overlap
+            reservation_from = data['available_from'] + timedelta(days=generator.randint(0, 14))
+            for index in range(generator.randint(0, options['reservations_per_property'] * 2)):
+                nights = generator.randint(1, 14)
+                reservation_to = reservation_from + timedelta(days=nights)
+                if reservation_to > data['available_to']:
+                    break
+                subtotal = data['price_per_night'] * nights
+                service_fee = (subtotal * fee_rate).quantize(CENT, ROUND_HALF_UP)
+                cancellation_fee = data['cancellation_fee_per_night'] * nights
+                yield [data['id'], reservation_from.isoformat(), reservation_to.isoformat(),
+                       f'[{reservation_from.isoformat()},{reservation_to.isoformat()})', generator.choice(guest_ids),
+                       reservation_from <= now < reservation_to, nights, subtotal, service_fee, cancellation_fee,
+                       subtotal + service_fee]
+                reservation_from = reservation_to + timedelta(days=generator.randint(0, 21))
+
+    loaded['reservations'] = copy_rows(Reservation, [
+        'property', 'reservation_from', 'reservation_to', 'period', 'guest', 'reserved', 'nights', 'subtotal',
+        'service_fee', 'cancellation_fee', 'total',
+    ], reservations())
+    return loaded
@@ -0,0 +1,143 @@
+import csv
+import datetime
+import io
+import json
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+from reservation.models import Reservation
+
+# Define export formats and the content types they are downloaded with
+CSV_FORMAT = 'csv'
+NDJSON_FORMAT = 'ndjson'
+EXPORT_CONTENT_TYPES = {
+    CSV_FORMAT: 'text/csv',
+    NDJSON_FORMAT: 'application/x-ndjson',
+}
+
+# Define columns of exported reservations and the fields they are read from through property and guest joins
+RESERVATION_COLUMNS = {
+    'id': 'id',
+    'property_id': 'property_id',
+    'property_name': 'property__name',
+    'host_email': 'property__owner__email',
+    'guest_id': 'guest_id',
+    'guest_email': 'guest__email',
+    'guest_first_name': 'guest__first_name',
+    'guest_last_name': 'guest__last_name',
+    'reservation_from': 'reservation_from',
+    'reservation_to': 'reservation_to',
+    'reserved': 'reserved',
+    'nights': 'nights',
+    'subtotal': 'subtotal',
+    'service_fee': 'service_fee',
+    'cancellation_fee': 'cancellation_fee',
+    'total': 'total',
+}
+
+# Define columns of monthly property earnings summed from stored reservation prices
+EARNINGS_COLUMNS = ['month', 'property_id', 'property_name', 'host_email', 'reservations', 'nights', 'subtotal',
+                    'service_fees', 'total']
+
+# Flush buffered rows to the response once they reach this size in characters
+FLUSH_SIZE = 64 * 1024
+
+# Define leading characters spreadsheets read csv cells starting with as formulas
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def escape_csv_cell(value):
+    """
+    Escape text cells read as formulas by spreadsheets by prefixing them with a quote, guest and property names are
+    written by users
+    :param value:
+    :return:
+    """
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return f"'{value}"
+    return value
+
+
+def start_of(date):
+    """
+    Get start of a date in the current time zone
+    :param date:
+    :return:
+    """
+    return timezone.make_aware(datetime.datetime.combine(date, datetime.time.min))
+
+
+def filter_reservations(owner=None, date_from=None, date_to=None):
+    """
+    Filter reservations of properties of an owner starting in a date range
+    :param owner: host user, reservations of all properties are exported when not given
+    :param date_from: first reservation start date included
+    :param date_to: last reservation start date included
+    :return:
+    """
+    queryset = Reservation.objects.all()
+    if owner is not None:
+        queryset = queryset.filter(property__owner=owner)
+    # Compare reservation starts with time bounds of the dates instead of casting every start to a date
+    if date_from is not None:
+        queryset = queryset.filter(reservation_from__gte=start_of(date_from))
+    if date_to is not None:
+        queryset = queryset.filter(reservation_from__lt=start_of(date_to + datetime.timedelta(days=1)))
+    return queryset
+
+
+def export_reservations(queryset):
+    """
+    Select reservation rows joined with property and guest as tuples ordered by id
+    :param queryset:
+    :return: columns and queryset of row tuples
+    """
+    return list(RESERVATION_COLUMNS), queryset.order_by('id').values_list(*RESERVATION_COLUMNS.values())
+
+
+def export_earnings(queryset):
+    """
+    Sum priced reservations of each property by month of reservation start
+    :param queryset:
+    :return: columns and queryset of row tuples
+    """
+    rows = (queryset.filter(total__isnull=False)
+            .annotate(export_month=TruncMonth('reservation_from'))
+            .values('export_month', 'property_id', 'property__name', 'property__owner__email')
+            .annotate(reservations=Count('id'), total_nights=Sum('nights'), total_subtotal=Sum('subtotal'),
+                      service_fees=Sum('service_fee'), total_amount=Sum('total'))
+            .order_by('export_month', 'property_id')
+            .values_list('export_month', 'property_id', 'property__name', 'property__owner__email', 'reservations',
+                         'total_nights', 'total_subtotal', 'service_fees', 'total_amount'))
+    return EARNINGS_COLUMNS, rows
+
+
+def write_rows(columns, rows, export_format, chunk_size):
+    """
+    Write rows as csv or newline delimited json read with a server side cursor, rows are buffered and yielded in
+    chunks so memory use does not grow with the number of rows
+    :param columns:
+    :param rows: queryset of row tuples
+    :param export_format:
+    :param chunk_size: number of rows fetched from the database at a time
+    :return: generator of text chunks
+    """
+    buffer = io.StringIO()
+    if export_format == CSV_FORMAT:
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+
+        def write(row):
+            writer.writerow([escape_csv_cell(value) for value in row])
+    else:
+        def write(row):
+            buffer.write(json.dumps(dict(zip(columns, row)), cls=DjangoJSONEncoder) + '\n')
+
+    for row in rows.iterator(chunk_size=chunk_size):
+        write(row)
+        if buffer.tell() >= FLUSH_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
@@ -0,0 +1,131 @@
+from django.contrib.gis.db.models import PointField
+from django.contrib.gis.db.models.functions import GeometryDistance
+from django.contrib.gis.geos import Point
+from django.contrib.gis.measure import D
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramSimilarity
+from django.db.backends.postgresql.psycopg_any import DateTimeTZRange
+from django.db.models import Exists, F, OuterRef, Q, Value
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend, SearchFilter
+from reservation.models import Reservation, TsTzRange
+from reservation.serializers import AvailabilitySearchSerializer
+
+
+class FullTextSearchFilter(SearchFilter):
+    """
+    Create search filter backend matching stored search vectors and name trigrams ranked by relevance
+    """
+    search_config = 'english'
+    trigram_field = 'name'
+
+    def filter_queryset(self, request, queryset, view):
+        """
+        Filter query-set by full text search or trigram similarity and order results by relevance
+        :param request:
+        :param queryset:
+        :param view:
+        :return:
+        """
+        search_terms = ' '.join(self.get_search_terms(request))
+        if not search_terms:
+            return queryset
+        query = SearchQuery(search_terms, config=self.search_config, search_type='websearch')
+
+        # Match search terms through gin indexes of search vector and name trigrams to tolerate typos
+        trigram_match = Q(**{f'{self.trigram_field}__trigram_similar': search_terms})
+        queryset = queryset.filter(Q(search_vector=query) | trigram_match)
+        search_rank = SearchRank(F('search_vector'), query) + TrigramSimilarity(self.trigram_field, search_terms)
+        return queryset.annotate(search_rank=search_rank).order_by('-search_rank', '-id')
+
+
+class NearbyPropertyFilter(BaseFilterBackend):
+    """
+    Create filter backend to search properties within a radius of a point ordered by nearest first
+    """
+    near_query_param = 'near'
+    radius_query_param = 'radius_km'
+    max_radius_km = 500
+
+    def filter_queryset(self, request, queryset, view):
+        """
+        Annotate properties with their distance to the requested point and filter them by radius
+        :param request:
+        :param queryset:
+        :param view:
+        :return:
+        """
+        near = request.query_params.get(self.near_query_param)
+        if not near:
+            return queryset
+        point = self.get_point(near)
+
+        # Use knn distance operator so nearest properties are read in order from the location gist index
+        distance = GeometryDistance('location', Value(point, output_field=PointField(geography=True, srid=4326)))
+        queryset = queryset.annotate(distance=distance).order_by('distance', 'id')
+
+        radius = request.query_params.get(self.radius_query_param)
+        if radius:
+            queryset = queryset.filter(location__dwithin=(point, D(km=self.get_radius(radius))))
+        return queryset
+
+    def get_point(self, near):
+        """
+        Parse near query parameter formatted as latitude and longitude separated by comma
+        :param near:
+        :return:
+        """
+        try:
+            latitude, longitude = (float(value) for value in near.split(','))
+        except ValueError:
+            raise ValidationError({self.near_query_param: 'Near must be formatted as latitude,longitude'})
+        if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+            raise ValidationError({self.near_query_param: 'Near coordinates are out of range'})
+        return Point(longitude, latitude, srid=4326)
+
+    def get_radius(self, radius):
+        """
+        Parse radius query parameter in kilometers
+        :param radius:
+        :return:
+        """
+        try:
+            radius = float(radius)
+        except ValueError:
+            raise ValidationError({self.radius_query_param: 'Radius must be a number of kilometers'})
+        if not 0 < radius <= self.max_radius_km:
+            raise ValidationError(
+                {self.radius_query_param: f'Radius must be between 0 and {self.max_radius_km} kilometers'})
+        return radius
+
+
+class AvailablePropertyFilter(BaseFilterBackend):
+    """
+    Create filter backend to search properties free between check in and check out dates for a number of guests
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        """
+        Filter properties by availability window, guest capacity and reservations overlapping requested dates
+        :param request:
+        :param queryset:
+        :param view:
+        :return:
+        """
+        if 'check_in' not in request.query_params and 'check_out' not in request.query_params:
+            return queryset
+        serializer = AvailabilitySearchSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        search = serializer.validated_data
+        requested_period = DateTimeTZRange(search['check_in'], search['check_out'], '[)')
+
+        # Match availability window through the property availability gist index
+        queryset = queryset.alias(availability=TsTzRange('available_from', 'available_to')).filter(
+            available=True,
+            availability__contains=requested_period,
+            number_of_adult_guests__gte=search['adults'],
+            number_of_child_guests__gte=search['children'],
+        )
+
+        # Anti join overlapping reservations through the reservation exclusion constraint gist index
+        reserved = Reservation.objects.filter(property=OuterRef('pk'), period__overlap=requested_period)
+        return queryset.filter(~Exists(reserved))
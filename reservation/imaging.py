@@ -0,0 +1,39 @@
+from io import BytesIO
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+# Define file formats of resized photo variants and their extensions
+VARIANT_FORMATS = [('WEBP', 'webp'), ('JPEG', 'jpeg')]
+
+
+def create_photo_variants(media):
+    """
+    Create resized photo variants without metadata for each configured width and format
+    :param media: media instance with a photo
+    :return: original photo width and height and stored variants
+    """
+    with media.photo.open('rb') as photo:
+        image = Image.open(photo)
+        image.load()
+    # Apply exif orientation before metadata is dropped, variants are saved without exif or other metadata
+    image = ImageOps.exif_transpose(image).convert('RGB')
+    width, height = image.size
+
+    variants = {}
+    for variant_name, variant_width in settings.MEDIA_PHOTO_VARIANTS.items():
+        resized = image.copy()
+        # Shrink photo to variant width keeping aspect ratio, smaller photos are never enlarged
+        resized.thumbnail((variant_width, height), Image.LANCZOS)
+        variant = {'width': resized.width, 'height': resized.height}
+        for image_format, extension in VARIANT_FORMATS:
+            buffer = BytesIO()
+            resized.save(buffer, image_format, quality=settings.MEDIA_PHOTO_QUALITY, optimize=True)
+            path = f'property/photos/variants/{media.pk}/{variant_name}.{extension}'
+            # Replace variants of a previously processed photo
+            if default_storage.exists(path):
+                default_storage.delete(path)
+            variant[extension] = default_storage.save(path, ContentFile(buffer.getvalue()))
+        variants[variant_name] = variant
+    return width, height, variants
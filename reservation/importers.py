@@ -0,0 +1,121 @@
+import csv
+import json
+from django.db import DatabaseError, transaction
+from django.utils.text import slugify
+from rest_framework.exceptions import ValidationError
+from reservation.cache import invalidate_cache
+from reservation.models import Category, Feature, FeatureCategory, Property
+from reservation.serializers import PropertyImportSerializer
+
+# Define import formats and the content types they are uploaded with
+CSV_FORMAT = 'csv'
+NDJSON_FORMAT = 'ndjson'
+IMPORT_CONTENT_TYPES = {
+    'text/csv': CSV_FORMAT,
+    'application/x-ndjson': NDJSON_FORMAT,
+    'application/jsonlines': NDJSON_FORMAT,
+}
+
+
+def read_rows(lines, import_format):
+    """
+    Read property rows from csv or newline delimited json lines, csv rows carry features as a json array column
+    :param lines: iterable of text lines
+    :param import_format:
+    :return: generator of line number and row data, or line number and parse error message
+    """
+    if import_format == CSV_FORMAT:
+        reader = csv.DictReader(lines)
+        for row in reader:
+            # Drop empty optional columns so serializer defaults apply
+            row = {key: value for key, value in row.items() if key and value not in ('', None)}
+            try:
+                if 'features' in row:
+                    row['features'] = json.loads(row['features'])
+            except ValueError:
+                yield reader.line_num, 'Features column must be a json array'
+                continue
+            yield reader.line_num, row
+        return
+    for line_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            yield line_number, 'Line is not valid json'
+            continue
+        if not isinstance(row, dict):
+            yield line_number, 'Line must be a json object'
+            continue
+        yield line_number, row
+
+
+def import_properties(rows, owner, batch_size=1000):
+    """
+    Validate and insert property rows with their features in batches reporting invalid rows as they are found
+    :param rows: iterable of line number and row data as read by read_rows
+    :param owner: user owning imported properties
+    :param batch_size: number of rows validated and inserted together
+    :return: generator of row error, batch and summary events
+    """
+    imported = failed = 0
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            inserted = yield from _import_batch(batch, owner)
+            imported, failed = imported + inserted, failed + len(batch) - inserted
+            batch = []
+    if batch:
+        inserted = yield from _import_batch(batch, owner)
+        imported, failed = imported + inserted, failed + len(batch) - inserted
+    if imported:
+        # Expire cached property and category responses since bulk inserts do not send signals
+        invalidate_cache('property:all', 'category:list')
+    yield {'imported': imported, 'failed': failed}
+
+
+def _import_batch(batch, owner):
+    """
+    Validate a batch of rows with related primary keys loaded once and bulk insert its valid rows
+    :param batch: list of line number and row data
+    :param owner:
+    :return: generator of row error and batch events returning number of inserted rows
+    """
+    context = {
+        'category_ids': set(Category.objects.values_list('pk', flat=True)),
+        'feature_category_ids': set(FeatureCategory.objects.values_list('pk', flat=True)),
+    }
+    # Build serializer fields once per batch and run validation of each row against them
+    serializer = PropertyImportSerializer(context=context)
+    valid = []
+    for line_number, row in batch:
+        if isinstance(row, str):
+            yield {'line': line_number, 'errors': {'non_field_errors': [row]}}
+            continue
+        try:
+            valid.append((line_number, serializer.run_validation(row)))
+        except ValidationError as error:
+            yield {'line': line_number, 'errors': error.detail}
+
+    properties = []
+    features = []
+    for line_number, data in valid:
+        features.append(data.pop('features', []))
+        # Assign slugs here since bulk inserts skip the property save method
+        data['slug'] = data.get('slug') or slugify(data['name'])
+        properties.append(Property(owner=owner, **data))
+    try:
+        with transaction.atomic():
+            # Insert properties in multi row statements returning their primary keys to attach features
+            Property.objects.bulk_create(properties)
+            Feature.objects.bulk_create([Feature(property=property, **feature)
+                                         for property, feature_rows in zip(properties, features)
+                                         for feature in feature_rows])
+    except DatabaseError as error:
+        for line_number, data in valid:
+            yield {'line': line_number, 'errors': {'non_field_errors': [f'Batch was not saved: {error}']}}
+        return 0
+    yield {'lines': [batch[0][0], batch[-1][0]], 'imported': len(valid)}
+    return len(valid)
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from reservation.models import Reservation
+from reservation.pricing import PRICING_FIELDS, SNAPSHOT_FIELDS, apply_quote, quote_many
+
+
+class Command(BaseCommand):
+    """
+    Create management command to store price snapshots of reservations booked before snapshots were stored
+    """
+    help = 'Store price snapshots of reservations without one'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000,
+                            help='Number of reservations to price in each batch')
+        parser.add_argument('--all', action='store_true',
+                            help='Reprice all reservations with current property rates, not only missing snapshots')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        reservations = Reservation.objects.select_related('property').only(
+            'id', 'reservation_from', 'reservation_to', 'property_id',
+            *(f'property__{field}' for field in PRICING_FIELDS))
+        if not options['all']:
+            reservations = reservations.filter(total__isnull=True)
+        last_id = 0
+        priced = 0
+        # Walk reservations by primary key in batches priced together and written in one update statement
+        while True:
+            batch = list(reservations.filter(pk__gt=last_id).order_by('pk')[:batch_size])
+            if not batch:
+                break
+            quotes = quote_many([(reservation.property, reservation.reservation_from, reservation.reservation_to)
+                                 for reservation in batch])
+            for reservation, reservation_quote in zip(batch, quotes):
+                apply_quote(reservation, reservation_quote)
+            with transaction.atomic():
+                Reservation.objects.bulk_update(batch, SNAPSHOT_FIELDS)
+            priced += len(batch)
+            last_id = batch[-1].pk
+            self.stdout.write(f'Stored price snapshots of {priced} reservations')
+        self.stdout.write(self.style.SUCCESS(f'Finished storing price snapshots of {priced} reservations'))
@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test.utils import override_settings
+from rest_framework.test import APIClient
+from reservation.benchmarks import BENCHMARK_CACHES, SCENARIOS, run_scenario, seed_benchmark_data
+
+
+class Command(BaseCommand):
+    """
+    Create management command to benchmark api endpoints and tasks against seeded data and their query budgets
+    """
+    help = 'Seed benchmark data, measure latency percentiles and query counts of api scenarios and roll back'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS),
+                            help='Scenario to run, can be repeated, all scenarios run when not given')
+        parser.add_argument('--iterations', type=int, default=50, help='Number of runs of each scenario')
+        parser.add_argument('--properties', type=int, default=5000, help='Number of seeded properties')
+        parser.add_argument('--reviews-per-property', type=int, default=10)
+        parser.add_argument('--reservations-per-property', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=0, help='Random seed of seeded data')
+
+    def handle(self, *args, **options):
+        scenarios = options['scenario'] or list(SCENARIOS)
+        # Run against uncached responses from the test client and discard seeded data and bookings afterwards
+        with override_settings(CACHES=BENCHMARK_CACHES, ALLOWED_HOSTS=['testserver']), transaction.atomic():
+            self.stdout.write(f'Seeding {options["properties"]} properties')
+            dataset = seed_benchmark_data(properties=options['properties'],
+                                          reviews_per_property=options['reviews_per_property'],
+                                          reservations_per_property=options['reservations_per_property'],
+                                          seed=options['seed'])
+            client = APIClient()
+            client.force_authenticate(dataset['guest'])
+            results = [run_scenario(name, client, dataset, options['iterations']) for name in scenarios]
+            transaction.set_rollback(True)
+
+        self.stdout.write(f'{"scenario":<24}{"p50 ms":>10}{"p95 ms":>10}{"p99 ms":>10}{"queries":>10}{"budget":>8}')
+        for result in results:
+            line = (f'{result.name:<24}{result.p50:>10.1f}{result.p95:>10.1f}{result.p99:>10.1f}'
+                    f'{result.max_queries:>10}{result.budget:>8}')
+            self.stdout.write(self.style.ERROR(line) if result.over_budget else line)
+        over_budget = [result.name for result in results if result.over_budget]
+        if over_budget:
+            raise CommandError(f'Scenarios over their query budget: {", ".join(over_budget)}')
+        self.stdout.write(self.style.SUCCESS('All scenarios are within their query budgets'))
@@ -0,0 +1,50 @@
+from datetime import date
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from reservation.exports import CSV_FORMAT, EXPORT_CONTENT_TYPES, export_earnings, export_reservations, \
+    filter_reservations, write_rows
+
+# Define exports by name
+EXPORTS = {
+    'reservations': export_reservations,
+    'earnings': export_earnings,
+}
+
+
+class Command(BaseCommand):
+    """
+    Create management command to export reservations or monthly property earnings as csv or newline delimited json
+    """
+    help = 'Export reservations or monthly property earnings streamed from a server side cursor'
+
+    def add_arguments(self, parser):
+        parser.add_argument('export', choices=list(EXPORTS), help='Name of the export')
+        parser.add_argument('--output', help='Path of the written file, written to standard output when not given')
+        parser.add_argument('--format', choices=list(EXPORT_CONTENT_TYPES), default=CSV_FORMAT,
+                            help='Format of the written file')
+        parser.add_argument('--host', help='Email of the host to export reservations of, all hosts when not given')
+        parser.add_argument('--date-from', type=date.fromisoformat,
+                            help='First reservation start date included, as YYYY-MM-DD')
+        parser.add_argument('--date-to', type=date.fromisoformat,
+                            help='Last reservation start date included, as YYYY-MM-DD')
+        parser.add_argument('--chunk-size', type=int, default=settings.RESERVATION_EXPORT_CHUNK_SIZE,
+                            help='Number of rows fetched from the database at a time')
+
+    def handle(self, *args, **options):
+        owner = None
+        if options['host']:
+            owner = get_user_model().objects.filter(email=options['host']).first()
+            if owner is None:
+                raise CommandError(f'User with email {options["host"]} does not exist')
+        columns, rows = EXPORTS[options['export']](
+            filter_reservations(owner, options['date_from'], options['date_to']))
+        chunks = write_rows(columns, rows, options['format'], options['chunk_size'])
+
+        if options['output'] is None:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
+            return
+        with open(options['output'], 'w', encoding='utf-8', newline='') as output:
+            output.writelines(chunks)
+        self.stdout.write(self.style.SUCCESS(f'Exported {options["export"]} to {options["output"]}'))
@@ -0,0 +1,115 @@
+import multiprocessing
+import os
+import time
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+from django.utils import timezone
+from reservation.cache import invalidate_cache
+from reservation.datasets import generate_chunk, init_worker, reserve_property_ids
+from reservation.models import Category, Feature, FeatureCategory, Media, Property, Reservation, Review
+
+# Define categories and feature categories of generated properties
+CATEGORIES = ['Apartment', 'House', 'Villa', 'Cabin', 'Cottage', 'Loft', 'Chalet', 'Bungalow']
+FEATURE_CATEGORIES = ['Amenities', 'Safety', 'Accessibility', 'Outdoors', 'Family']
+
+
+class Command(BaseCommand):
+    """
+    Create management command to generate a large synthetic dataset of hosts, guests and properties
+    """
+    help = 'Generate a deterministic synthetic dataset in parallel worker processes loaded with COPY'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--properties', type=int, default=1000000, help='Number of generated properties')
+        parser.add_argument('--hosts', type=int, default=20000, help='Number of generated host users')
+        parser.add_argument('--guests', type=int, default=200000, help='Number of generated guest users')
+        parser.add_argument('--reviews-per-property', type=int, default=5, help='Average reviews of a property')
+        parser.add_argument('--media-per-property', type=int, default=3, help='Average media of a property')
+        parser.add_argument('--features-per-property', type=int, default=5, help='Average features of a property')
+        parser.add_argument('--reservations-per-property', type=int, default=4,
+                            help='Average reservations of a property')
+        parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Number of worker processes')
+        parser.add_argument('--chunk-size', type=int, default=20000,
+                            help='Number of properties generated and loaded by a worker at a time')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed making generated data reproducible')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        options = dict(options, now=timezone.now().isoformat(),
+                       host_ids=self.create_users('host', options['hosts'], options['seed']),
+                       guest_ids=self.create_users('guest', options['guests'], options['seed']),
+                       category_ids=self.create_named(Category, CATEGORIES),
+                       feature_category_ids=self.create_named(FeatureCategory, FEATURE_CATEGORIES))
+
+        first_id = reserve_property_ids(options['properties'])
+        chunk_size = options['chunk_size']
+        tasks = [(chunk, first_id + offset, min(chunk_size, options['properties'] - offset))
+                 for chunk, offset in enumerate(range(0, options['properties'], chunk_size))]
+
+        totals = {}
+        # Close connections before forking so every worker opens its own database connection
+        connections.close_all()
+        if options['workers'] > 1:
+            with multiprocessing.get_context('fork').Pool(options['workers'], init_worker, (options,)) as pool:
+                self.collect(pool.imap_unordered(generate_chunk, tasks), totals, started)
+        else:
+            init_worker(options)
+            self.collect(map(generate_chunk, tasks), totals, started)
+
+        self.stdout.write('Analyzing tables and rebuilding review aggregates')
+        with connection.cursor() as cursor:
+            for model in [Property, Feature, Media, Review, Reservation]:
+                cursor.execute(f'ANALYZE {connection.ops.quote_name(model._meta.db_table)}')
+        call_command('rebuild_review_aggregates', stdout=self.stdout)
+        invalidate_cache('category:all')
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated {", ".join(f"{count} {name}" for name, count in totals.items())} '
+            f'in {time.perf_counter() - started:.1f}s'))
+
+    def collect(self, results, totals, started):
+        """
+        Sum loaded rows of finished chunks and report progress
+        :param results: loaded rows by model of each chunk
+        :param totals:
+        :param started:
+        :return:
+        """
+        for loaded in results:
+            for name, count in loaded.items():
+                totals[name] = totals.get(name, 0) + count
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f'Loaded {totals["properties"]} properties '
+                              f'({totals["properties"] / elapsed:.0f} properties/s)')
+
+    def create_users(self, role, count, seed):
+        """
+        Create missing generated users of a role and get ids of all generated users of the role
+        :param role:
+        :param count:
+        :param seed:
+        :return:
+        """
+        user_model = get_user_model()
+        prefix = f'dataset-{seed}-{role}-'
+        for start in range(0, count, 10000):
+            user_model.objects.bulk_create([
+                user_model(email=f'{prefix}{index}@example.com', username=f'{prefix}{index}@example.com',
+                           first_name=role.title(), last_name=str(index), role=role, password='!')
+                for index in range(start, min(start + 10000, count))], ignore_conflicts=True)
+        return list(user_model.objects.filter(email__startswith=prefix).order_by('pk')
+                    .values_list('pk', flat=True)[:count])
+
+    def create_named(self, model, names):
+        """
+        Create missing categories or feature categories by name
+        :param model:
+        :param names:
+        :return: ids of named objects
+        """
+        ids = []
+        for name in names:
+            obj, created = model.objects.get_or_create(name=name, defaults={'description': f'{name} properties'})
+            ids.append(obj.pk)
+        return ids
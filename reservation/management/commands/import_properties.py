@@ -0,0 +1,51 @@
+import json
+import os
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from reservation.importers import CSV_FORMAT, NDJSON_FORMAT, import_properties, read_rows
+
+
+class Command(BaseCommand):
+    """
+    Create management command to import properties with their features from csv or newline delimited json files
+    """
+    help = 'Import properties with their features from a csv or newline delimited json file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Path of csv or newline delimited json file to import')
+        parser.add_argument('--owner', required=True, help='Email of the host owning imported properties')
+        parser.add_argument('--format', choices=[CSV_FORMAT, NDJSON_FORMAT],
+                            help='Format of imported file, detected from file extension when not given')
+        parser.add_argument('--batch-size', type=int, default=settings.PROPERTY_IMPORT_BATCH_SIZE,
+                            help='Number of rows to validate and insert together')
+
+    def handle(self, *args, **options):
+        owner = get_user_model().objects.filter(email=options['owner']).first()
+        if owner is None:
+            raise CommandError(f'User with email {options["owner"]} does not exist')
+        import_format = options['format'] or self.get_format(options['path'])
+
+        with open(options['path'], encoding='utf-8', newline='') as lines:
+            for event in import_properties(read_rows(lines, import_format), owner, options['batch_size']):
+                if 'errors' in event:
+                    self.stderr.write(json.dumps(event))
+                elif 'lines' in event:
+                    self.stdout.write(f'Imported {event["imported"]} properties from lines {event["lines"][0]} '
+                                      f'to {event["lines"][1]}')
+                else:
+                    self.stdout.write(self.style.SUCCESS(
+                        f'Finished importing {event["imported"]} properties, {event["failed"]} rows failed'))
+
+    def get_format(self, path):
+        """
+        Detect import format from file extension
+        :param path:
+        :return:
+        """
+        extension = os.path.splitext(path)[1].lower()
+        if extension == '.csv':
+            return CSV_FORMAT
+        if extension in ('.ndjson', '.jsonl'):
+            return NDJSON_FORMAT
+        raise CommandError('Import format can not be detected from file extension, pass --format')
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from reservation.models import Media
+from reservation.tasks import process_media_photo
+
+
+class Command(BaseCommand):
+    """
+    Create management command to queue processing of media photos without resized variants
+    """
+    help = 'Queue processing of pending or failed media photos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--failed', action='store_true', help='Queue failed photos as well as pending photos')
+
+    def handle(self, *args, **options):
+        states = [Media.PROCESSING_PENDING]
+        if options['failed']:
+            states.append(Media.PROCESSING_FAILED)
+        media_ids = Media.objects.filter(processing_state__in=states).exclude(photo='').values_list('pk', flat=True)
+        queued = 0
+        for media_id in media_ids.iterator():
+            process_media_photo.delay(media_id)
+            queued += 1
+        self.stdout.write(self.style.SUCCESS(f'Queued processing of {queued} media photos'))
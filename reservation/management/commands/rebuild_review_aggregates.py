@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from reservation.cache import invalidate_cache
+from reservation.models import Property
+
+
+class Command(BaseCommand):
+    """
+    Create management command to rebuild stored review aggregates of all properties
+    """
+    help = 'Rebuild stored review aggregates of properties from their reviews'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help='Number of properties to rebuild in each update statement')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        last_id = 0
+        rebuilt = 0
+        # Walk properties by primary key in batches to keep each update statement short
+        while True:
+            property_ids = list(Property.objects.filter(pk__gt=last_id).order_by('pk')
+                                .values_list('pk', flat=True)[:batch_size])
+            if not property_ids:
+                break
+            rebuilt += Property.objects.filter(pk__in=property_ids).refresh_review_aggregates()
+            last_id = property_ids[-1]
+            self.stdout.write(f'Rebuilt review aggregates of {rebuilt} properties')
+        # Expire cached property responses since bulk updates do not send signals
+        invalidate_cache('property:all')
+        self.stdout.write(self.style.SUCCESS(f'Finished rebuilding review aggregates of {rebuilt} properties'))
@@ -0,0 +1,48 @@
+# Generated by Django 4.2 on 2026-10-17 09:12
+
+from django.conf import settings
+import django.contrib.postgres.constraints
+import django.contrib.postgres.fields.ranges
+from django.contrib.postgres.operations import BtreeGistExtension
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('reservation', '0009_remove_reservation_reservation_fees_and_more'),
+    ]
+
+    operations = [
+        BtreeGistExtension(),
+        migrations.AlterField(
+            model_name='reservation',
+            name='guest',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservations', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='reservation',
+            name='property',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservations', to='reservation.property'),
+        ),
+        migrations.AddField(
+            model_name='reservation',
+            name='period',
+            field=django.contrib.postgres.fields.ranges.DateTimeRangeField(editable=False, null=True),
+        ),
+        migrations.RunSQL(
+            sql="UPDATE reservation_reservation SET period = tstzrange(reservation_from, reservation_to, '[)')",
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.AlterField(
+            model_name='reservation',
+            name='period',
+            field=django.contrib.postgres.fields.ranges.DateTimeRangeField(editable=False),
+        ),
+        migrations.AddConstraint(
+            model_name='reservation',
+            constraint=django.contrib.postgres.constraints.ExclusionConstraint(expressions=[('property', '='), ('period', '&&')], index_type='gist', name='reservation_no_overlap'),
+        ),
+    ]
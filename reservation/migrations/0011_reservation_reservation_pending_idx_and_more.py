@@ -0,0 +1,21 @@
+# Generated by Django 4.2 on 2026-10-17 09:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservation', '0010_alter_reservation_guest_alter_reservation_property_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(condition=models.Q(('reserved', False)), fields=['reservation_to'], name='reservation_pending_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(condition=models.Q(('reserved', True)), fields=['reservation_to'], name='reservation_active_idx'),
+        ),
+    ]
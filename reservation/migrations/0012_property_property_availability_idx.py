@@ -0,0 +1,19 @@
+# Generated by Django 4.2 on 2026-10-17 10:05
+
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+import reservation.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservation', '0011_reservation_reservation_pending_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='property',
+            index=django.contrib.postgres.indexes.GistIndex(reservation.models.TsTzRange(models.F('available_from'), models.F('available_to')), condition=models.Q(('available', True)), name='property_availability_idx'),
+        ),
+    ]
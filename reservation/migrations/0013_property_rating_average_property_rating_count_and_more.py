@@ -0,0 +1,56 @@
+# Generated by Django 4.2 on 2026-10-17 10:31
+
+from django.db import migrations, models
+
+POPULATE_REVIEW_AGGREGATES = """
+UPDATE reservation_property AS property
+SET rating_count = aggregates.rating_count,
+    rating_average = aggregates.rating_average,
+    rating_histogram = aggregates.rating_histogram
+FROM (
+    SELECT property_id,
+           COUNT(id) AS rating_count,
+           AVG(rate) AS rating_average,
+           JSONB_BUILD_OBJECT(
+               '0', COUNT(id) FILTER (WHERE rate >= -0.5 AND rate < 0.5),
+               '1', COUNT(id) FILTER (WHERE rate >= 0.5 AND rate < 1.5),
+               '2', COUNT(id) FILTER (WHERE rate >= 1.5 AND rate < 2.5),
+               '3', COUNT(id) FILTER (WHERE rate >= 2.5 AND rate < 3.5),
+               '4', COUNT(id) FILTER (WHERE rate >= 3.5 AND rate < 4.5),
+               '5', COUNT(id) FILTER (WHERE rate >= 4.5 AND rate < 5.5)
+           ) AS rating_histogram
+    FROM reservation_review
+    GROUP BY property_id
+) AS aggregates
+WHERE property.id = aggregates.property_id
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservation', '0012_property_property_availability_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='property',
+            name='rating_average',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='property',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='property',
+            name='rating_histogram',
+            field=models.JSONField(default=dict, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='property',
+            index=models.Index(fields=['rating_average'], name='property_rating_idx'),
+        ),
+        migrations.RunSQL(sql=POPULATE_REVIEW_AGGREGATES, reverse_sql=migrations.RunSQL.noop),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 4.2 on 2026-10-17 11:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservation', '0013_property_rating_average_property_rating_count_and_more'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='property',
+            name='property_rating_idx',
+        ),
+        migrations.RunSQL(
+            sql='UPDATE reservation_property SET rating_average = 0 WHERE rating_average IS NULL',
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.AlterField(
+            model_name='property',
+            name='rating_average',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='category',
+            index=models.Index(fields=['created_at', 'id'], name='category_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='category',
+            index=models.Index(fields=['name', 'id'], name='category_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='property',
+            index=models.Index(fields=['created_at', 'id'], name='property_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='property',
+            index=models.Index(fields=['name', 'id'], name='property_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='property',
+            index=models.Index(fields=['price_per_night', 'id'], name='property_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='property',
+            index=models.Index(fields=['rating_average', 'id'], name='property_rating_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='property',
+            index=models.Index(fields=['rating_count', 'id'], name='property_rating_count_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['property', 'created_at', 'id'], name='review_property_created_idx'),
+        ),
+    ]
@@ -0,0 +1,74 @@
+# Generated by Django 4.2 on 2026-10-17 11:48
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+# Keep search vectors of properties and categories in sync with their name and description on every write,
+# including bulk inserts and copies that bypass model save
+CREATE_SEARCH_VECTOR_TRIGGERS = """
+CREATE FUNCTION reservation_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('english', coalesce(NEW.name, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(NEW.description, '')), 'B');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER reservation_property_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF name, description ON reservation_property
+    FOR EACH ROW EXECUTE FUNCTION reservation_search_vector_update();
+
+CREATE TRIGGER reservation_category_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF name, description ON reservation_category
+    FOR EACH ROW EXECUTE FUNCTION reservation_search_vector_update();
+
+UPDATE reservation_property SET name = name;
+UPDATE reservation_category SET name = name;
+"""
+
+DROP_SEARCH_VECTOR_TRIGGERS = """
+DROP TRIGGER reservation_property_search_vector_trigger ON reservation_property;
+DROP TRIGGER reservation_category_search_vector_trigger ON reservation_category;
+DROP FUNCTION reservation_search_vector_update();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservation', '0014_remove_property_property_rating_idx_and_more'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='category',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='property',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='category',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='category_search_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='category',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['name'], name='category_name_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='property',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='property_search_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='property',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['name'], name='property_name_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.RunSQL(sql=CREATE_SEARCH_VECTOR_TRIGGERS, reverse_sql=DROP_SEARCH_VECTOR_TRIGGERS),
+    ]
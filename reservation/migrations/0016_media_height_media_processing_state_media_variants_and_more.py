@@ -0,0 +1,33 @@
+# Generated by Django 4.2 on 2026-10-17 12:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservation', '0015_category_search_vector_property_search_vector_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='media',
+            name='height',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='media',
+            name='processing_state',
+            field=models.CharField(choices=[('pending', 'pending'), ('ready', 'ready'), ('failed', 'failed')], default='pending', editable=False, max_length=10),
+        ),
+        migrations.AddField(
+            model_name='media',
+            name='variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name='media',
+            name='width',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 4.2 on 2026-10-17 13:20
+
+from django.conf import settings
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('reservation', '0016_media_height_media_processing_state_media_variants_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaUpload',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=250)),
+                ('description', models.TextField(blank=True)),
+                ('filename', models.CharField(max_length=250)),
+                ('total_size', models.PositiveBigIntegerField(validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(104857600)])),
+                ('received_size', models.PositiveBigIntegerField(default=0)),
+                ('state', models.CharField(choices=[('uploading', 'uploading'), ('complete', 'complete')], default='uploading', max_length=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('media', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='upload', to='reservation.media')),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='media_uploads', to=settings.AUTH_USER_MODEL)),
+                ('property', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='media_uploads', to='reservation.property')),
+            ],
+            options={
+                'verbose_name': 'Property Media Upload',
+                'verbose_name_plural': 'Property Media Uploads',
+            },
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 4.2 on 2026-10-17 14:05
+
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservation', '0017_mediaupload'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PropertyRate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=250)),
+                ('start_date', models.DateField(blank=True, null=True)),
+                ('end_date', models.DateField(blank=True, null=True)),
+                ('weekday', models.PositiveSmallIntegerField(blank=True, choices=[(0, 'Monday'), (1, 'Tuesday'), (2, 'Wednesday'), (3, 'Thursday'), (4, 'Friday'), (5, 'Saturday'), (6, 'Sunday')], null=True)),
+                ('price_per_night', models.DecimalField(decimal_places=2, max_digits=6, validators=[django.core.validators.MinValueValidator(0)])),
+                ('priority', models.PositiveSmallIntegerField(default=0)),
+                ('property', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rates', to='reservation.property')),
+            ],
+            options={
+                'verbose_name': 'Property Rate',
+                'verbose_name_plural': 'Property Rates',
+                'ordering': ['-priority', '-id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='StayDiscount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('min_nights', models.PositiveSmallIntegerField(validators=[django.core.validators.MinValueValidator(2)])),
+                ('percent', models.DecimalField(decimal_places=2, max_digits=5, validators=[django.core.validators.MinValueValidator(0), django.core.validators.MaxValueValidator(100)])),
+                ('property', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stay_discounts', to='reservation.property')),
+            ],
+            options={
+                'verbose_name': 'Property Stay Discount',
+                'verbose_name_plural': 'Property Stay Discounts',
+                'ordering': ['-min_nights'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='propertyrate',
+            index=models.Index(fields=['property', 'start_date', 'end_date'], name='property_rate_season_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='staydiscount',
+            constraint=models.UniqueConstraint(fields=('property', 'min_nights'), name='stay_discount_unique_min_nights'),
+        ),
+    ]
@@ -1,9 +1,25 @@
+import uuid
 from django.conf import settings
 from django.contrib.gis.db import models
 from django.contrib.gis.geos import Point
+from django.contrib.postgres.constraints import ExclusionConstraint
+from django.contrib.postgres.fields import DateTimeRangeField, RangeOperators
+from django.contrib.postgres.indexes import GinIndex, GistIndex
+from django.contrib.postgres.search import SearchVectorField
+from django.db import transaction
+from django.db.backends.postgresql.psycopg_any import DateTimeTZRange
+from django.db.models.functions import Coalesce, JSONObject
 from django.core.validators import MinValueValidator, FileExtensionValidator, MaxValueValidator
 from django.utils.text import slugify
-from reservation.validators import validate_image_size, validate_video_size
+from reservation.validators import validate_image_size, validate_video_size, MAX_VIDEO_SIZE_IN_MB, VIDEO_EXTENSIONS
+
+
+class TsTzRange(models.Func):
+    """
+    Create database function to build a half-open datetime range from two datetime expressions
+    """
+    function = 'TSTZRANGE'
+    output_field = DateTimeRangeField()
 
 
 class Category(models.Model):
@@ -15,11 +31,21 @@ class Category(models.Model):
     slug = models.SlugField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Store weighted search document of name and description maintained by a database trigger
+    search_vector = SearchVectorField(null=True, editable=False)
 
     class Meta():
         ordering = ['-created_at']
         verbose_name = 'Property Category'
         verbose_name_plural = 'Property Categories'
+        indexes = [
+            # Indexes for full text search and trigram similarity search
+            GinIndex(fields=['search_vector'], name='category_search_idx'),
+            GinIndex(fields=['name'], name='category_name_trgm_idx', opclasses=['gin_trgm_ops']),
+            # Composite indexes on cursor pagination orderings
+            models.Index(fields=['created_at', 'id'], name='category_created_idx'),
+            models.Index(fields=['name', 'id'], name='category_name_idx'),
+        ]
 
     def save(self, *args, **kwargs):
         # Override save method to automatically assign the slug field based on the property name using slugify
@@ -31,6 +57,38 @@ class Category(models.Model):
         return self.name
 
 
+class PropertyQuerySet(models.QuerySet):
+    """
+    Create property query-set to maintain stored review aggregates
+    """
+
+    def refresh_review_aggregates(self):
+        """
+        Recalculate stored review aggregates of properties in query-set from their reviews in a single update, property
+        rows are locked first so concurrent refreshes of a property run one after another
+        :return: number of updated properties
+        """
+        reviews = Review.objects.filter(property=models.OuterRef('pk')).order_by().values('property')
+        # Count reviews per star by rounding each rate to the nearest star
+        histogram = {
+            str(star): models.Count('id', filter=models.Q(rate__gte=star - 0.5, rate__lt=star + 0.5))
+            for star in range(6)
+        }
+        locked = self.select_for_update().order_by('pk')
+        with transaction.atomic(using=locked.db):
+            # Take the lock in its own statement, the update then reads reviews committed by refreshes holding the
+            # lock before, an update waiting on the row lock would compute aggregates from its own older snapshot
+            list(locked.values_list('pk', flat=True))
+            return self.update(
+                rating_count=Coalesce(models.Subquery(reviews.annotate(count=models.Count('id')).values('count')), 0),
+                rating_average=Coalesce(
+                    models.Subquery(reviews.annotate(average=models.Avg('rate')).values('average')), 0.0),
+                rating_histogram=Coalesce(
+                    models.Subquery(reviews.annotate(histogram=JSONObject(**histogram)).values('histogram')),
+                    models.Value({}, output_field=models.JSONField())),
+            )
+
+
 class Property(models.Model):
     """
     Create property model
@@ -65,12 +123,34 @@ class Property(models.Model):
     cancellation_policy = models.CharField(max_length=25, choices=CANCELLATION_POLICY_CHOICES,
                                            default=FREE_CANCELLATION)
     cancellation_fee_per_night = models.DecimalField(max_digits=3, decimal_places=2, default=0)
+    # Store review aggregates maintained by review signals to list and sort properties by rating
+    rating_average = models.FloatField(default=0, editable=False)
+    rating_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_histogram = models.JSONField(default=dict, editable=False)
+    # Store weighted search document of name and description maintained by a database trigger
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    objects = PropertyQuerySet.as_manager()
 
     class Meta():
         # Define meta attributes
         ordering = ['-created_at']
         verbose_name = 'Property'
         verbose_name_plural = 'Properties'
+        indexes = [
+            # Index availability window of available properties as a range to search properties free in given dates
+            GistIndex(TsTzRange('available_from', 'available_to'), name='property_availability_idx',
+                      condition=models.Q(available=True)),
+            # Composite indexes on cursor pagination orderings
+            models.Index(fields=['created_at', 'id'], name='property_created_idx'),
+            models.Index(fields=['name', 'id'], name='property_name_idx'),
+            models.Index(fields=['price_per_night', 'id'], name='property_price_idx'),
+            models.Index(fields=['rating_average', 'id'], name='property_rating_idx'),
+            models.Index(fields=['rating_count', 'id'], name='property_rating_count_idx'),
+            # Indexes for full text search and trigram similarity search
+            GinIndex(fields=['search_vector'], name='property_search_idx'),
+            GinIndex(fields=['name'], name='property_name_trgm_idx', opclasses=['gin_trgm_ops']),
+        ]
 
     def save(self, *args, **kwargs):
         # Override save method to automatically assign the slug field based on the property name using slugify
@@ -86,14 +166,28 @@ class Media(models.Model):
     """
     Create property media model and associate it with many-to-one relationship with property model
     """
+    # Define photo processing state choices
+    PROCESSING_PENDING = 'pending'
+    PROCESSING_READY = 'ready'
+    PROCESSING_FAILED = 'failed'
+    PROCESSING_STATE_CHOICES = [
+        (PROCESSING_PENDING, PROCESSING_PENDING),
+        (PROCESSING_READY, PROCESSING_READY),
+        (PROCESSING_FAILED, PROCESSING_FAILED),
+    ]
     name = models.CharField(max_length=250)
     description = models.TextField(blank=True)
     property = models.ForeignKey(Property, on_delete=models.CASCADE, related_name='media')
     photo = models.ImageField(blank=True, upload_to='property/photos',
                               validators=[validate_image_size, FileExtensionValidator(['jpg', 'png', 'jpeg'])])
     video = models.FileField(blank=True, upload_to='property/videos',
-                             validators=[validate_video_size, FileExtensionValidator(
-                                 ['mp4', 'webm', 'mkv', 'flv', 'wmv'])])
+                             validators=[validate_video_size, FileExtensionValidator(VIDEO_EXTENSIONS)])
+    # Store photo dimensions and resized photo variants created by media processing task
+    width = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    height = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    variants = models.JSONField(default=dict, blank=True, editable=False)
+    processing_state = models.CharField(max_length=10, choices=PROCESSING_STATE_CHOICES, default=PROCESSING_PENDING,
+                                        editable=False)
 
     class Meta():
         verbose_name = 'Property Media'
@@ -103,6 +197,42 @@ class Media(models.Model):
         return self.name
 
 
+class MediaUpload(models.Model):
+    """
+    Create chunked upload model to assemble a property video uploaded in chunks before attaching it to media
+    """
+    # Define upload state choices
+    UPLOADING = 'uploading'
+    COMPLETE = 'complete'
+    STATE_CHOICES = [
+        (UPLOADING, UPLOADING),
+        (COMPLETE, COMPLETE),
+    ]
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    property = models.ForeignKey(Property, on_delete=models.CASCADE, related_name='media_uploads')
+    owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='media_uploads')
+    name = models.CharField(max_length=250)
+    description = models.TextField(blank=True)
+    filename = models.CharField(max_length=250)
+    total_size = models.PositiveBigIntegerField(
+        validators=[MinValueValidator(1), MaxValueValidator(MAX_VIDEO_SIZE_IN_MB * 1024 * 1024)])
+    received_size = models.PositiveBigIntegerField(default=0)
+    state = models.CharField(max_length=10, choices=STATE_CHOICES, default=UPLOADING)
+    media = models.OneToOneField(Media, null=True, blank=True, on_delete=models.SET_NULL, related_name='upload')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta():
+        verbose_name = 'Property Media Upload'
+        verbose_name_plural = 'Property Media Uploads'
+
+    def get_extension(self):
+        return self.filename.rsplit('.', 1)[-1].lower()
+
+    def __str__(self):
+        return self.filename
+
+
 class Review(models.Model):
     """
     Create property review model and associate it with many-to-one relationship with property model
@@ -118,6 +248,10 @@ class Review(models.Model):
         ordering = ['-created_at']
         verbose_name = 'Property Review'
         verbose_name_plural = 'Property Reviews'
+        indexes = [
+            # Composite index on cursor pagination ordering of property reviews
+            models.Index(fields=['property', 'created_at', 'id'], name='review_property_created_idx'),
+        ]
 
     def total_reviews(self):
         return self.comment.count()
@@ -166,19 +300,117 @@ class Feature(models.Model):
         return self.name
 
 
+class PropertyRate(models.Model):
+    """
+    Create property rate model overriding price per night of a property in a season, on a weekday or both
+    """
+    # Define weekday choices numbered like python date weekday
+    WEEKDAY_CHOICES = [
+        (0, 'Monday'),
+        (1, 'Tuesday'),
+        (2, 'Wednesday'),
+        (3, 'Thursday'),
+        (4, 'Friday'),
+        (5, 'Saturday'),
+        (6, 'Sunday'),
+    ]
+    property = models.ForeignKey(Property, on_delete=models.CASCADE, related_name='rates')
+    name = models.CharField(max_length=250)
+    # Define first and last night of the season, rate applies all year when not set
+    start_date = models.DateField(blank=True, null=True)
+    end_date = models.DateField(blank=True, null=True)
+    # Define weekday of nights the rate applies to, rate applies every day when not set
+    weekday = models.PositiveSmallIntegerField(choices=WEEKDAY_CHOICES, blank=True, null=True)
+    price_per_night = models.DecimalField(max_digits=6, decimal_places=2, validators=[MinValueValidator(0)])
+    # Rates with higher priority win when several rates apply to the same night
+    priority = models.PositiveSmallIntegerField(default=0)
+
+    class Meta():
+        ordering = ['-priority', '-id']
+        verbose_name = 'Property Rate'
+        verbose_name_plural = 'Property Rates'
+        indexes = [
+            models.Index(fields=['property', 'start_date', 'end_date'], name='property_rate_season_idx'),
+        ]
+
+    def applies_to(self, night):
+        """
+        Check whether rate applies to a night
+        :param night: date of the night
+        :return:
+        """
+        if self.start_date is not None and night < self.start_date:
+            return False
+        if self.end_date is not None and night > self.end_date:
+            return False
+        return self.weekday is None or night.weekday() == self.weekday
+
+    def __str__(self):
+        return self.name
+
+
+class StayDiscount(models.Model):
+    """
+    Create length of stay discount model applied to reservations of at least a number of nights
+    """
+    property = models.ForeignKey(Property, on_delete=models.CASCADE, related_name='stay_discounts')
+    min_nights = models.PositiveSmallIntegerField(validators=[MinValueValidator(2)])
+    percent = models.DecimalField(max_digits=5, decimal_places=2,
+                                  validators=[MinValueValidator(0), MaxValueValidator(100)])
+
+    class Meta():
+        ordering = ['-min_nights']
+        verbose_name = 'Property Stay Discount'
+        verbose_name_plural = 'Property Stay Discounts'
+        constraints = [
+            models.UniqueConstraint(fields=['property', 'min_nights'], name='stay_discount_unique_min_nights'),
+        ]
+
+    def __str__(self):
+        return f'{self.percent}% from {self.min_nights} nights'
+
+
 class Reservation(models.Model):
     """
     Create reservation model and associate it with property and user models
     """
-    property = models.OneToOneField(Property, on_delete=models.CASCADE)
+    property = models.ForeignKey(Property, on_delete=models.CASCADE, related_name='reservations')
     reservation_from = models.DateTimeField()
     reservation_to = models.DateTimeField()
-    guest = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    # Store reservation dates as a half-open range to let postgres exclude overlapping reservations
+    period = DateTimeRangeField(editable=False)
+    guest = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='reservations')
     reserved = models.BooleanField(default=False)
+    # Store price of the reservation when it is booked so later property price changes do not alter it
+    nights = models.PositiveIntegerField(null=True, editable=False)
+    subtotal = models.DecimalField(max_digits=10, decimal_places=2, null=True, editable=False)
+    service_fee = models.DecimalField(max_digits=10, decimal_places=2, null=True, editable=False)
+    cancellation_fee = models.DecimalField(max_digits=10, decimal_places=2, null=True, editable=False)
+    total = models.DecimalField(max_digits=10, decimal_places=2, null=True, editable=False)
 
     class Meta:
         verbose_name = 'Reservation'
         verbose_name_plural = 'Reservations'
+        constraints = [
+            # Reject overlapping reservations of the same property using a gist index on property and period
+            ExclusionConstraint(
+                name='reservation_no_overlap',
+                expressions=[('property', RangeOperators.EQUAL), ('period', RangeOperators.OVERLAPS)],
+                index_type='gist',
+            ),
+        ]
+        indexes = [
+            # Partial indexes on the boundary each reservation state flips at to keep state updates set-based
+            models.Index(fields=['reservation_to'], name='reservation_pending_idx',
+                         condition=models.Q(reserved=False)),
+            models.Index(fields=['reservation_to'], name='reservation_active_idx',
+                         condition=models.Q(reserved=True)),
+        ]
+
+    def save(self, *args, **kwargs):
+        # Override save method to keep reservation period in sync with reservation dates
+        self.period = DateTimeTZRange(self.reservation_from, self.reservation_to, '[)')
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f'{self.guest}\'s reservation'
@@ -0,0 +1,128 @@
+import json
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, Cursor
+
+
+def reverse_ordering(ordering):
+    # Flip direction of every ordering field to read pages backwards
+    return tuple(field[1:] if field.startswith('-') else f'-{field}' for field in ordering)
+
+
+class KeysetCursorPagination(CursorPagination):
+    """
+    Create cursor pagination that reads every page through an index on the ordering fields and id, cursors carry the
+    values of every ordering field of the last item so pages seek past it with a row comparison instead of an offset
+    """
+    # Order by creation time and break ties on id unless a filter backend orders the query-set
+    ordering = ('-created_at', '-id')
+
+    # Let client choose page size up to a maximum
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+    def get_ordering(self, request, queryset, view):
+        """
+        Define cursor ordering from the query-set ordering applied by filter backends, falling back to default
+        ordering, and add id as a tie breaker to make cursor positions unique
+        :param request:
+        :param queryset:
+        :param view:
+        :return:
+        """
+        ordering = tuple(queryset.query.order_by)
+        if not ordering or not all(isinstance(field, str) for field in ordering):
+            ordering = super().get_ordering(request, queryset, view)
+        if not {'id', '-id', 'pk', '-pk'} & set(ordering):
+            ordering += ('-id' if ordering[0].startswith('-') else 'id',)
+        return ordering
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        if self.cursor is None:
+            offset, reverse, current_position = 0, False, None
+        else:
+            offset, reverse, current_position = self.cursor
+
+        # Cursor pagination always enforces an ordering
+        queryset = queryset.order_by(*(reverse_ordering(self.ordering) if reverse else self.ordering))
+        if current_position is not None:
+            queryset = queryset.filter(self.get_keyset_filter(current_position, reverse))
+
+        # Fetch an extra item to determine if there is a page following on from this one
+        results = list(queryset[offset:offset + self.page_size + 1])
+        self.page = results[:self.page_size]
+        has_following_position = len(results) > len(self.page)
+        following_position = self._get_position_from_instance(results[-1], self.ordering) \
+            if has_following_position else None
+
+        if reverse:
+            # Reverse queries read the page backwards
+            self.page.reverse()
+            self.has_next = current_position is not None or offset > 0
+            self.has_previous = has_following_position
+            self.next_position = current_position
+            self.previous_position = following_position
+        else:
+            self.has_next = has_following_position
+            self.has_previous = current_position is not None or offset > 0
+            self.next_position = following_position
+            self.previous_position = current_position
+
+        # Display page controls in the browsable api if there is more than one page
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    def get_keyset_filter(self, position, reverse):
+        """
+        Build row comparison filter selecting items after a cursor position in the direction of each ordering field,
+        (field, id) > (value, pk) is expanded to field > value or field = value and id > pk
+        :param position: values of the ordering fields of the last item read
+        :param reverse: whether the cursor pages backwards
+        :return:
+        """
+        condition = Q()
+        preceding = {}
+        for order, value in zip(self.ordering, position):
+            field_name = order.lstrip('-')
+            lookup = '__lt' if order.startswith('-') != reverse else '__gt'
+            condition |= Q(**preceding, **{field_name + lookup: value})
+            preceding[field_name] = value
+        return condition
+
+    def decode_cursor(self, request):
+        cursor = super().decode_cursor(request)
+        if cursor is None or cursor.position is None:
+            return cursor
+        try:
+            position = json.loads(cursor.position)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(self.ordering) or \
+                not all(isinstance(value, str) for value in position):
+            raise NotFound(self.invalid_cursor_message)
+        return Cursor(offset=cursor.offset, reverse=cursor.reverse, position=tuple(position))
+
+    def encode_cursor(self, cursor):
+        if cursor.position is not None:
+            cursor = Cursor(offset=cursor.offset, reverse=cursor.reverse, position=json.dumps(cursor.position))
+        return super().encode_cursor(cursor)
+
+    def _get_position_from_instance(self, instance, ordering):
+        # Ordering fields are not nullable, annotated fields are read from the annotation of each item
+        return tuple(str(instance[order.lstrip('-')] if isinstance(instance, dict) else
+                         getattr(instance, order.lstrip('-'))) for order in ordering)
+
+
+class IdCursorPagination(KeysetCursorPagination):
+    """
+    Create cursor pagination for models without creation time ordered by id
+    """
+    ordering = ('-id',)
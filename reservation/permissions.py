@@ -35,3 +35,19 @@ class CanAddOrUpdateReservation(BasePermission):
         guest_user = bool(request.user and request.user.role == 'guest')
         admin_user = bool(request.user and request.user.is_superuser)
         return guest_user or admin_user
+
+
+def can_export_all_reservations(user):
+    # Let admin users and finance users granted the view reservation permission export reservations of all hosts
+    return bool(user and (user.is_superuser or user.has_perm('reservation.view_reservation')))
+
+
+class CanExportReservations(BasePermission):
+    """
+    Custom permission class for host users to export reservations of their properties and admin or finance users to
+    export reservations of all properties
+    """
+
+    def has_permission(self, request, view):
+        host_user = bool(request.user and request.user.role == 'host')
+        return host_user or can_export_all_reservations(request.user)
@@ -0,0 +1,131 @@
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from decimal import Decimal, ROUND_HALF_UP
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from reservation.models import Property, PropertyRate, StayDiscount
+
+# Quantize amounts to cents
+CENT = Decimal('0.01')
+
+# Define property columns read to price stays
+PRICING_FIELDS = ['id', 'price_per_night', 'cancellation_policy', 'cancellation_fee_per_night']
+
+# Define reservation columns storing the price snapshot of a booking
+SNAPSHOT_FIELDS = ['nights', 'subtotal', 'service_fee', 'cancellation_fee', 'total']
+
+
+@dataclass(frozen=True)
+class Quote:
+    """
+    Price of a stay in a property, amounts are exact decimals rounded to cents
+    """
+    property_id: int
+    check_in: object
+    check_out: object
+    nights: int
+    nightly_total: Decimal
+    discount: Decimal
+    subtotal: Decimal
+    service_fee: Decimal
+    cancellation_fee: Decimal
+    total: Decimal
+
+
+def to_date(value):
+    """
+    Get date of a date or of an aware datetime in current time zone
+    :param value:
+    :return:
+    """
+    if isinstance(value, datetime):
+        return timezone.localtime(value).date() if timezone.is_aware(value) else value.date()
+    return value
+
+
+def quote(property, check_in, check_out):
+    """
+    Price a single stay in a property
+    :param property:
+    :param check_in:
+    :param check_out:
+    :return:
+    """
+    return quote_many([(property, check_in, check_out)])[0]
+
+
+def quote_many(stays):
+    """
+    Price many stays with rates and discounts of all their properties loaded in two queries
+    :param stays: list of property, check in and check out, dates or datetimes counted by calendar nights
+    :return: list of quotes in the order of stays
+    """
+    stays = [(property, to_date(check_in), to_date(check_out)) for property, check_in, check_out in stays]
+    if not stays:
+        return []
+    property_ids = {property.pk for property, check_in, check_out in stays}
+    first_night = min(check_in for property, check_in, check_out in stays)
+    last_night = max(check_out for property, check_in, check_out in stays) - timedelta(days=1)
+
+    # Load only rates whose season overlaps the nights of any stay, ordered by precedence
+    rates = defaultdict(list)
+    season_overlap = ((Q(start_date__isnull=True) | Q(start_date__lte=last_night))
+                      & (Q(end_date__isnull=True) | Q(end_date__gte=first_night)))
+    for rate in PropertyRate.objects.filter(season_overlap, property_id__in=property_ids).order_by(
+            'property_id', '-priority', '-id'):
+        rates[rate.property_id].append(rate)
+    discounts = defaultdict(list)
+    for discount in StayDiscount.objects.filter(property_id__in=property_ids).order_by('property_id', '-min_nights'):
+        discounts[discount.property_id].append(discount)
+
+    fee_rate = settings.RESERVATION_SERVICE_FEE_RATE
+    quotes = []
+    for property, check_in, check_out in stays:
+        nights = max((check_out - check_in).days, 0)
+        property_rates = rates[property.pk]
+        nightly_total = sum((get_night_price(property, property_rates, check_in + timedelta(days=night))
+                             for night in range(nights)), Decimal(0))
+        percent = next((discount.percent for discount in discounts[property.pk] if nights >= discount.min_nights),
+                       Decimal(0))
+        discount = (nightly_total * percent / 100).quantize(CENT, ROUND_HALF_UP)
+        subtotal = nightly_total - discount
+        service_fee = (subtotal * fee_rate).quantize(CENT, ROUND_HALF_UP)
+        cancellation_fee = Decimal(0)
+        if property.cancellation_policy == Property.PAID_CANCELLATION:
+            cancellation_fee = property.cancellation_fee_per_night * nights
+        quotes.append(Quote(property_id=property.pk, check_in=check_in, check_out=check_out, nights=nights,
+                            nightly_total=nightly_total, discount=discount, subtotal=subtotal,
+                            service_fee=service_fee, cancellation_fee=cancellation_fee,
+                            total=subtotal + service_fee))
+    return quotes
+
+
+def apply_quote(reservation, quote):
+    """
+    Store quoted price on a reservation as its price snapshot
+    :param reservation:
+    :param quote:
+    :return:
+    """
+    reservation.nights = quote.nights
+    reservation.subtotal = quote.subtotal
+    reservation.service_fee = quote.service_fee
+    reservation.cancellation_fee = quote.cancellation_fee
+    reservation.total = quote.total
+    return reservation
+
+
+def get_night_price(property, rates, night):
+    """
+    Get price of a night from the first applying rate in precedence order or property price per night
+    :param property:
+    :param rates: property rates ordered by precedence
+    :param night:
+    :return:
+    """
+    for rate in rates:
+        if rate.applies_to(night):
+            return rate.price_per_night
+    return property.price_per_night
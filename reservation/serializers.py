@@ -1,28 +1,52 @@
 import json
 import os
 import requests
-from decimal import Decimal
-from django.db.models.aggregates import Avg
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from django.contrib.gis.geos import Point
 from django.utils import timezone
 from rest_framework import serializers
 from rest_framework_gis.serializers import GeoFeatureModelSerializer
-from reservation.models import Property, Category, Media, Feature, FeatureCategory, Review, Reservation
+from holidaybooking.instrumentation import TimedSerializerMixin
+from reservation.models import Property, Category, Media, MediaUpload, Feature, FeatureCategory, Review, Reservation, \
+    PropertyRate, StayDiscount
+from reservation.exports import CSV_FORMAT, EXPORT_CONTENT_TYPES
+from reservation.pricing import PRICING_FIELDS, apply_quote, quote
+from reservation.services import BookingConflict, book_property, is_overlap_violation
+from reservation.tasks import process_media_photo
+from reservation.validators import VIDEO_EXTENSIONS
 from django.contrib.gis.geoip2 import GeoIP2
 
 
-class MediaSerializer(serializers.ModelSerializer):
+class MediaSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """
     Create serializer for media model
     """
 
     class Meta():
         model = Media
-        fields = ['id', 'name', 'description', 'photo', 'video', 'user']
+        fields = ['id', 'name', 'description', 'photo', 'video', 'user', 'width', 'height', 'processing_state',
+                  'variants']
+        read_only_fields = ['width', 'height', 'processing_state']
 
         # Get current authenticated user
 
     user = serializers.HiddenField(default=serializers.CurrentUserDefault())
 
+    # Custom field for urls of resized photo variants
+    variants = serializers.SerializerMethodField(method_name='get_variants')
+
+    def get_variants(self, media):
+        request = self.context.get('request')
+        variants = {}
+        for variant_name, variant in media.variants.items():
+            variants[variant_name] = {key: value for key, value in variant.items() if key in ('width', 'height')}
+            for extension in ('webp', 'jpeg'):
+                url = default_storage.url(variant[extension])
+                variants[variant_name][extension] = request.build_absolute_uri(url) if request else url
+        return variants
+
     def validate(self, attrs):
         """
         Custom validation to allow owner only to add media to property
@@ -37,15 +61,89 @@ class MediaSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         """
-        Override create method to allow nested route for media in property api endpoint
+        Override create method to allow nested route for media in property api endpoint and process uploaded photo
+        in background
+        :param validated_data:
+        :return:
+        """
+        property_id = self.context['property_id']
+        validated_data.pop('user', None)
+        media = Media.objects.create(property_id=property_id, **validated_data)
+        self.schedule_processing(media)
+        return media
+
+    def update(self, instance, validated_data):
+        """
+        Override update method to process replaced photo in background
+        :param instance:
+        :param validated_data:
+        :return:
+        """
+        validated_data.pop('user', None)
+        if 'photo' in validated_data:
+            instance.processing_state = Media.PROCESSING_PENDING
+            instance.width = instance.height = None
+            instance.variants = {}
+        media = super().update(instance, validated_data)
+        if 'photo' in validated_data:
+            self.schedule_processing(media)
+        return media
+
+    def schedule_processing(self, media):
+        # Process photo once the media row is committed so the task can read it
+        transaction.on_commit(lambda: process_media_photo.delay(media.pk))
+
+
+class MediaUploadSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    """
+    Create serializer for chunked media upload model
+    """
+    # Get current authenticated user
+    owner = serializers.HiddenField(default=serializers.CurrentUserDefault())
+
+    # Custom field for largest chunk size accepted by chunk endpoint
+    max_chunk_size = serializers.SerializerMethodField(method_name='get_max_chunk_size')
+
+    class Meta():
+        model = MediaUpload
+        fields = ['id', 'name', 'description', 'filename', 'total_size', 'received_size', 'state', 'media',
+                  'max_chunk_size', 'owner']
+        read_only_fields = ['received_size', 'state', 'media']
+
+    def get_max_chunk_size(self, upload):
+        return settings.MEDIA_UPLOAD_MAX_CHUNK_SIZE
+
+    def validate_filename(self, filename):
+        """
+        Custom validation for uploaded video file extension
+        :param filename:
+        :return:
+        """
+        if filename.rsplit('.', 1)[-1].lower() not in VIDEO_EXTENSIONS:
+            raise serializers.ValidationError(f'Video file extension must be one of {", ".join(VIDEO_EXTENSIONS)}')
+        return filename
+
+    def validate(self, attrs):
+        """
+        Custom validation to allow owner only to upload media to property
+        :param attrs:
+        :return:
+        """
+        if not Property.objects.filter(pk=self.context['property_id'], owner=attrs['owner']).exists():
+            raise serializers.ValidationError('Only property owner can add media to their own property')
+        return attrs
+
+    def create(self, validated_data):
+        """
+        Override create method to allow nested route for media upload in property api endpoint
         :param validated_data:
         :return:
         """
         property_id = self.context['property_id']
-        return Media.objects.create(property_id=property_id, **validated_data)
+        return MediaUpload.objects.create(property_id=property_id, **validated_data)
 
 
-class ReviewSerializer(serializers.ModelSerializer):
+class ReviewSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """
     Create serializer for review model
     """
@@ -78,7 +176,7 @@ class ReviewSerializer(serializers.ModelSerializer):
         return Review.objects.create(property_id=property_id, **validated_data)
 
 
-class FeatureCategorySerializer(serializers.ModelSerializer):
+class FeatureCategorySerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """
     Create serializer for feature category model
     """
@@ -88,7 +186,7 @@ class FeatureCategorySerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'description', 'slug']
 
 
-class FeatureSerializer(serializers.ModelSerializer):
+class FeatureSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """
     Create serializer for feature model
     """
@@ -107,7 +205,87 @@ class FeatureSerializer(serializers.ModelSerializer):
         return Feature.objects.create(property_id=property_id, **validated_data)
 
 
-class CategorySerializer(serializers.ModelSerializer):
+def validate_property_owner(context, message):
+    """
+    Validate that the nested route property belongs to the requesting user unless the user is an admin
+    :param context: serializer context with request and property id
+    :param message: validation error message
+    :return:
+    """
+    user = context['request'].user
+    if not user.is_superuser and not Property.objects.filter(pk=context['property_id'], owner_id=user.id).exists():
+        raise serializers.ValidationError(message)
+
+
+class PropertyRateSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    """
+    Create serializer for property rate model
+    """
+
+    class Meta():
+        model = PropertyRate
+        fields = ['id', 'name', 'start_date', 'end_date', 'weekday', 'price_per_night', 'priority']
+
+    def validate(self, attrs):
+        """
+        Custom validation to allow owner only to add rates to property, and for season start and end dates
+        :param attrs:
+        :return:
+        """
+        validate_property_owner(self.context, 'Only property owner can add rates to their own property')
+        start_date = attrs.get('start_date', getattr(self.instance, 'start_date', None))
+        end_date = attrs.get('end_date', getattr(self.instance, 'end_date', None))
+        if start_date and end_date and start_date > end_date:
+            raise serializers.ValidationError('Season end date must not occur before start date')
+        return attrs
+
+    def create(self, validated_data):
+        """
+        Override create method to allow nested route for rate in property api endpoint
+        :param validated_data:
+        :return:
+        """
+        property_id = self.context['property_id']
+        return PropertyRate.objects.create(property_id=property_id, **validated_data)
+
+
+class StayDiscountSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    """
+    Create serializer for length of stay discount model
+    """
+
+    class Meta():
+        model = StayDiscount
+        fields = ['id', 'min_nights', 'percent']
+
+    def validate(self, attrs):
+        """
+        Custom validation to allow owner only to add discounts to property
+        :param attrs:
+        :return:
+        """
+        validate_property_owner(self.context, 'Only property owner can add discounts to their own property')
+        return attrs
+
+    def validate_min_nights(self, min_nights):
+        discounts = StayDiscount.objects.filter(property_id=self.context['property_id'], min_nights=min_nights)
+        if self.instance is not None:
+            discounts = discounts.exclude(pk=self.instance.pk)
+        if discounts.exists():
+            raise serializers.ValidationError('Property already has a discount for this number of nights')
+        return min_nights
+
+    def create(self, validated_data):
+        """
+        Override create method to allow nested route for discount in property api endpoint
+        :param validated_data:
+        :return:
+        """
+        property_id = self.context['property_id']
+        return StayDiscount.objects.create(property_id=property_id, **validated_data)
+
+
+class CategorySerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """
     Create serializer for category model
     """
@@ -120,11 +298,79 @@ class CategorySerializer(serializers.ModelSerializer):
     property_count = serializers.SerializerMethodField(method_name='get_property_count')
 
     def get_property_count(self, property_category):
-        # Custom method to get number of properties in a category
-        return property_category.properties.count()
+        # Read number of properties annotated by category views and count them only for categories loaded elsewhere
+        property_count = getattr(property_category, 'property_count', None)
+        if property_count is None:
+            property_count = property_category.properties.count()
+        return property_count
 
 
-class PropertySerializer(serializers.ModelSerializer):
+class SparseFieldsetMixin:
+    """
+    Create serializer mixin to output only fields requested with fields and expand query parameters
+    """
+    # Define fields to output when fields query parameter is not given, all fields are output when not set
+    default_fields = None
+
+    # Define nested relation fields to output only when requested with expand query parameter
+    expandable_fields = []
+
+    # Define model fields read by serializer method fields
+    method_field_sources = {}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Drop fields not requested, requested fields are passed in context by views on read requests only
+        requested_fields = self.context.get('requested_fields')
+        if requested_fields is not None:
+            for field_name in set(self.fields) - requested_fields:
+                self.fields.pop(field_name)
+
+    @classmethod
+    def get_requested_fields(cls, query_params):
+        """
+        Get serializer fields requested with comma separated fields and expand query parameters
+        :param query_params:
+        :return:
+        """
+        fields = [field.strip() for field in query_params.get('fields', '').split(',') if field.strip()]
+        expand = [field.strip() for field in query_params.get('expand', '').split(',') if field.strip()]
+        unknown_fields = set(fields) - set(cls.Meta.fields)
+        if unknown_fields:
+            raise serializers.ValidationError({'fields': f'Unknown fields: {", ".join(sorted(unknown_fields))}'})
+        unknown_relations = set(expand) - set(cls.expandable_fields)
+        if unknown_relations:
+            raise serializers.ValidationError(
+                {'expand': f'Unknown relations: {", ".join(sorted(unknown_relations))}'})
+        if not fields:
+            fields = cls.default_fields or [field for field in cls.Meta.fields if field not in cls.expandable_fields]
+        return {'id', *fields, *expand}
+
+    @classmethod
+    def get_model_fields(cls, requested_fields):
+        """
+        Get model columns to load for requested fields
+        :param requested_fields:
+        :return:
+        """
+        concrete_fields = {field.name for field in cls.Meta.model._meta.concrete_fields}
+        model_fields = set()
+        for field_name in requested_fields:
+            model_fields.update(cls.method_field_sources.get(field_name, [field_name]))
+        return model_fields & concrete_fields
+
+    @classmethod
+    def get_prefetch_fields(cls, requested_fields):
+        """
+        Get reverse relations to prefetch for requested fields
+        :param requested_fields:
+        :return:
+        """
+        relations = {relation.get_accessor_name() for relation in cls.Meta.model._meta.related_objects}
+        return sorted(requested_fields & relations)
+
+
+class PropertySerializer(TimedSerializerMixin, SparseFieldsetMixin, serializers.ModelSerializer):
     """
     Create serializer for property model
     """
@@ -132,6 +378,9 @@ class PropertySerializer(serializers.ModelSerializer):
     owner = serializers.HiddenField(default=serializers.CurrentUserDefault())
     available = serializers.BooleanField(default=True, read_only=True)
 
+    # Define model fields read by custom fields
+    method_field_sources = {'average_rate': ['rating_average', 'rating_count'], 'distance_km': []}
+
     def validate(self, attrs):
         """
         Custom validation for available from and available to fields
@@ -150,7 +399,7 @@ class PropertySerializer(serializers.ModelSerializer):
                   'number_of_bedrooms', 'number_of_beds', 'number_of_baths', 'number_of_adult_guests',
                   'number_of_child_guests', 'price_per_night', 'available_from', 'available_to',
                   'cancellation_policy', 'cancellation_fee_per_night', 'media', 'reviews', 'features', 'available',
-                  'average_rate']
+                  'average_rate', 'rating_count', 'rating_histogram', 'distance_km']
         read_only_fields = ['available']
 
     # Display property media
@@ -162,11 +411,22 @@ class PropertySerializer(serializers.ModelSerializer):
     # Display property features
     features = FeatureSerializer(many=True, read_only=True)
 
-    # Custom field for average review rate
+    # Display stored review aggregates
     average_rate = serializers.SerializerMethodField(method_name='get_average_rate')
+    rating_count = serializers.IntegerField(read_only=True)
+    rating_histogram = serializers.JSONField(read_only=True)
 
     def get_average_rate(self, property):
-        return property.reviews.all().aggregate(Avg('rate'))
+        # Stored rating average is zero for properties without reviews
+        return property.rating_average if property.rating_count else None
+
+    # Custom field for distance to the point properties are searched near
+    distance_km = serializers.SerializerMethodField(method_name='get_distance_km')
+
+    def get_distance_km(self, property):
+        # Distance in meters is annotated by nearby property filter only when near query parameter is given
+        distance = getattr(property, 'distance', None)
+        return None if distance is None else round(distance / 1000, 3)
 
     # location_geo = serializers.SerializerMethodField(method_name='get_user_location')
     #
@@ -176,57 +436,170 @@ class PropertySerializer(serializers.ModelSerializer):
     #     return geo.geos('94.122.149.41').wkt
 
 
-class ReservationSerializer(serializers.ModelSerializer):
+class PropertyListSerializer(PropertySerializer):
     """
-    Create base reservation serializer for http methods except for post and patch
+    Create compact serializer for property list with nested relations output only when expanded
     """
+    default_fields = ['id', 'name', 'slug', 'category', 'address', 'location', 'price_per_night', 'average_rate',
+                      'rating_count', 'distance_km']
+    expandable_fields = ['media', 'reviews', 'features']
 
-    guest = serializers.HiddenField(default=serializers.CurrentUserDefault())
-    property = PropertySerializer
-    available_from = serializers.DateTimeField(source='property.available_to', read_only=True)
-    available_to = serializers.DateTimeField(source='property.available_to', read_only=True)
 
-    class Meta:
-        model = Reservation
-        fields = ['id', 'guest', 'property', 'reservation_from', 'reservation_to', 'reserved',
-                  'reservation_in_nights', 'reservation_fees', 'total_fees', 'available_from',
-                  'available_to']
-        read_only_fields = ['available_from', 'available_to']
+class FeatureImportSerializer(serializers.Serializer):
+    """
+    Create serializer for features of an imported property validated against feature categories loaded per batch
+    """
+    name = serializers.CharField(max_length=250)
+    description = serializers.CharField(required=False, allow_blank=True, default='')
+    feature_category = serializers.IntegerField(source='feature_category_id')
+
+    def validate_feature_category(self, feature_category):
+        if feature_category not in self.context['feature_category_ids']:
+            raise serializers.ValidationError(f'Invalid pk "{feature_category}" - object does not exist.')
+        return feature_category
+
+
+class PropertyImportSerializer(PropertySerializer):
+    """
+    Create serializer for imported property rows validated without a query per row, related objects are checked
+    against primary keys loaded once per batch
+    """
+    category = serializers.IntegerField(source='category_id')
+    available = serializers.BooleanField(default=True)
+    latitude = serializers.FloatField(min_value=-90, max_value=90, write_only=True)
+    longitude = serializers.FloatField(min_value=-180, max_value=180, write_only=True)
+    features = FeatureImportSerializer(many=True, required=False)
+
+    class Meta():
+        model = Property
+        fields = ['name', 'description', 'slug', 'category', 'address', 'size', 'latitude', 'longitude',
+                  'number_of_bedrooms', 'number_of_beds', 'number_of_baths', 'number_of_adult_guests',
+                  'number_of_child_guests', 'price_per_night', 'available', 'available_from', 'available_to',
+                  'cancellation_policy', 'cancellation_fee_per_night', 'features']
 
-    # Custom field for reservation duration in days
-    reservation_in_nights = serializers.SerializerMethodField(method_name='get_reservation_in_nights')
+    def validate_category(self, category):
+        if category not in self.context['category_ids']:
+            raise serializers.ValidationError(f'Invalid pk "{category}" - object does not exist.')
+        return category
 
-    # Custom field for reservation fee calculation
-    reservation_fees = serializers.SerializerMethodField(method_name='calculate_reservation_fees')
+    def validate(self, attrs):
+        """
+        Custom validation for availability dates and location coordinates
+        :param attrs:
+        :return:
+        """
+        attrs = super().validate(attrs)
+        attrs['location'] = Point(attrs.pop('longitude'), attrs.pop('latitude'), srid=4326)
+        return attrs
 
-    # Custom field for total fees
-    total_fees = serializers.SerializerMethodField(method_name='calculate_total_fees')
 
-    def get_reservation_in_nights(self, reservation):
-        start_date = reservation.reservation_from
-        end_date = reservation.reservation_to
-        return abs((end_date - start_date).days)
+class AvailabilitySearchSerializer(serializers.Serializer):
+    """
+    Create serializer for property availability search query parameters
+    """
+    check_in = serializers.DateTimeField()
+    check_out = serializers.DateTimeField()
+    adults = serializers.IntegerField(min_value=1, default=1)
+    children = serializers.IntegerField(min_value=0, default=0)
 
-    def calculate_reservation_fees(self, reservation):
-        reservation_fees = reservation.property.price_per_night * self.get_reservation_in_nights(reservation)
-        return reservation_fees
+    def validate(self, attrs):
+        """
+        Custom validation for check in and check out dates
+        :param attrs:
+        :return:
+        """
+        if attrs['check_in'] >= attrs['check_out']:
+            raise serializers.ValidationError('Check out date must occur after check in date')
+        return attrs
 
-    def calculate_total_fees(self, reservation):
+
+class ExportRequestSerializer(serializers.Serializer):
+    """
+    Create serializer for reservation export query parameters
+    """
+    # Name format parameter apart from format query parameter used by api renderer negotiation
+    export_format = serializers.ChoiceField(choices=list(EXPORT_CONTENT_TYPES), default=CSV_FORMAT)
+    date_from = serializers.DateField(required=False)
+    date_to = serializers.DateField(required=False)
+
+    def validate(self, attrs):
         """
-        Assumption: total reservations fees are service fees in 12% added to reservation fees
-        :param reservation:
+        Custom validation for export date range
+        :param attrs:
         :return:
         """
-        service_fees = (Decimal(0.12) * self.calculate_reservation_fees(reservation))
-        return service_fees + self.calculate_reservation_fees(reservation)
+        if 'date_from' in attrs and 'date_to' in attrs and attrs['date_from'] > attrs['date_to']:
+            raise serializers.ValidationError('Date to must not occur before date from')
+        return attrs
 
 
-class CreateReservationSerializer(serializers.ModelSerializer):
+class QuoteRequestSerializer(serializers.Serializer):
+    """
+    Create serializer for pricing stays in a page of properties between check in and check out dates
+    """
+    check_in = serializers.DateField()
+    check_out = serializers.DateField()
+    properties = serializers.ListField(child=serializers.IntegerField(), min_length=1,
+                                       max_length=settings.QUOTE_MAX_PROPERTIES)
+
+    def validate(self, attrs):
+        """
+        Custom validation for check in and check out dates
+        :param attrs:
+        :return:
+        """
+        nights = (attrs['check_out'] - attrs['check_in']).days
+        if nights < 1:
+            raise serializers.ValidationError('Check out date must occur after check in date')
+        if nights > settings.QUOTE_MAX_NIGHTS:
+            raise serializers.ValidationError(f'Stays can not be longer than {settings.QUOTE_MAX_NIGHTS} nights')
+        return attrs
+
+
+class QuoteSerializer(TimedSerializerMixin, serializers.Serializer):
+    """
+    Create serializer for priced stays
+    """
+    property = serializers.IntegerField(source='property_id')
+    check_in = serializers.DateField()
+    check_out = serializers.DateField()
+    nights = serializers.IntegerField()
+    nightly_total = serializers.DecimalField(max_digits=12, decimal_places=2)
+    discount = serializers.DecimalField(max_digits=12, decimal_places=2)
+    subtotal = serializers.DecimalField(max_digits=12, decimal_places=2)
+    service_fee = serializers.DecimalField(max_digits=12, decimal_places=2)
+    cancellation_fee = serializers.DecimalField(max_digits=12, decimal_places=2)
+    total = serializers.DecimalField(max_digits=12, decimal_places=2)
+
+
+class ReservationSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    """
+    Create base reservation serializer for http methods except for post and patch
+    """
+
+    guest = serializers.HiddenField(default=serializers.CurrentUserDefault())
+    property = PropertySerializer
+
+    class Meta:
+        model = Reservation
+        fields = ['id', 'guest', 'property', 'reservation_from', 'reservation_to', 'reserved',
+                  'reservation_in_nights', 'reservation_fees', 'service_fees', 'cancellation_fees', 'total_fees']
+
+    # Display price snapshot stored when reservation was booked
+    reservation_in_nights = serializers.IntegerField(source='nights', read_only=True)
+    reservation_fees = serializers.DecimalField(source='subtotal', max_digits=10, decimal_places=2, read_only=True)
+    service_fees = serializers.DecimalField(source='service_fee', max_digits=10, decimal_places=2, read_only=True)
+    cancellation_fees = serializers.DecimalField(source='cancellation_fee', max_digits=10, decimal_places=2,
+                                                 read_only=True)
+    total_fees = serializers.DecimalField(source='total', max_digits=10, decimal_places=2, read_only=True)
+
+
+class CreateReservationSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """
     Create custom serializer for http method post (reservation creation action)
     """
     guest = serializers.HiddenField(default=serializers.CurrentUserDefault())
-    reserved = serializers.HiddenField(default=False)
+    reserved = serializers.BooleanField(read_only=True)
     # available_from = serializers.DateTimeField(source='property.available_to', read_only=True)
     # available_to = serializers.DateTimeField(source='property.available_to', read_only=True)
 
@@ -242,14 +615,11 @@ class CreateReservationSerializer(serializers.ModelSerializer):
         """
         # custom reservation property validation
         property_instance = attrs['property']
-        if Property.objects.filter(id=property_instance.id, available=False).exists():
+        if not property_instance.available:
             raise serializers.ValidationError('Property does not exist')
 
-        if Reservation.objects.filter(property_id=property_instance.id, reserved=True).exists():
-            raise serializers.ValidationError('This property is currently reserved')
-
         # Custom reservation dates validation
-        if attrs['reservation_from'] > attrs['reservation_to']:
+        if attrs['reservation_from'] >= attrs['reservation_to']:
             raise serializers.ValidationError('Reservation must occur in available dates')
 
         if attrs['reservation_from'] < property_instance.available_from:
@@ -265,8 +635,19 @@ class CreateReservationSerializer(serializers.ModelSerializer):
 
         return attrs
 
+    def create(self, validated_data):
+        """
+        Override create method to book property in a single insert rejected by the database on overlapping dates
+        :param validated_data:
+        :return:
+        """
+        try:
+            return book_property(**validated_data)
+        except BookingConflict as error:
+            raise serializers.ValidationError(str(error))
+
 
-class UpdateReservationSerializer(serializers.ModelSerializer):
+class UpdateReservationSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """
     Create custom serializer for http method patch (reservation update action)
     """
@@ -274,3 +655,38 @@ class UpdateReservationSerializer(serializers.ModelSerializer):
     class Meta:
         model = Reservation
         fields = ['reservation_from', 'reservation_to']
+
+    def validate(self, attrs):
+        """
+        Custom validation for reservation dates on update
+        :param attrs:
+        :return:
+        """
+        reservation_from = attrs.get('reservation_from', self.instance.reservation_from)
+        reservation_to = attrs.get('reservation_to', self.instance.reservation_to)
+        if reservation_from >= reservation_to:
+            raise serializers.ValidationError('Reservation must occur in available dates')
+        return attrs
+
+    def update(self, instance, validated_data):
+        """
+        Override update method to reprice reservation and its reserved state, dates overlapping another reservation
+        are rejected by the reservation exclusion constraint
+        :param instance:
+        :param validated_data:
+        :return:
+        """
+        reservation_from = validated_data.get('reservation_from', instance.reservation_from)
+        reservation_to = validated_data.get('reservation_to', instance.reservation_to)
+        # Reprice reservation for its new dates with current property rates
+        property = Property.objects.only(*PRICING_FIELDS).get(pk=instance.property_id)
+        apply_quote(instance, quote(property, reservation_from, reservation_to))
+        now = timezone.now()
+        instance.reserved = reservation_from <= now < reservation_to
+        try:
+            with transaction.atomic():
+                return super().update(instance, validated_data)
+        except IntegrityError as error:
+            if not is_overlap_violation(error):
+                raise
+            raise serializers.ValidationError('This property is already reserved for the selected dates')
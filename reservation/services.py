@@ -0,0 +1,57 @@
+import time
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from holidaybooking import metrics
+from reservation.models import Reservation
+from reservation.pricing import apply_quote, quote
+
+# Define booking contention metrics
+booking_attempts = metrics.counter(
+    'reservation_booking_attempts_total', 'Reservation booking attempts by outcome', ['outcome'])
+booking_duration = metrics.histogram(
+    'reservation_booking_duration_seconds', 'Time spent inserting a reservation by outcome', ['outcome'])
+
+
+class BookingConflict(Exception):
+    """
+    Raised when reservation dates overlap another reservation of the same property
+    """
+
+
+def book_property(guest, property, reservation_from, reservation_to):
+    """
+    Create reservation with its final reserved state and price snapshot in a single insert guarded by the
+    reservation exclusion constraint, so concurrent bookings of the same dates can not both succeed
+    :param guest:
+    :param property:
+    :param reservation_from:
+    :param reservation_to:
+    :return: created reservation
+    """
+    now = timezone.now()
+    reservation = Reservation(guest=guest, property=property, reservation_from=reservation_from,
+                              reservation_to=reservation_to, reserved=reservation_from <= now < reservation_to)
+    apply_quote(reservation, quote(property, reservation_from, reservation_to))
+    started = time.perf_counter()
+    try:
+        with transaction.atomic():
+            reservation.save(force_insert=True)
+    except IntegrityError as error:
+        if not is_overlap_violation(error):
+            raise
+        booking_duration.observe(time.perf_counter() - started, outcome='conflict')
+        booking_attempts.inc(outcome='conflict')
+        raise BookingConflict('This property is already reserved for the selected dates') from error
+    booking_duration.observe(time.perf_counter() - started, outcome='created')
+    booking_attempts.inc(outcome='created')
+    return reservation
+
+
+def is_overlap_violation(error):
+    """
+    Check whether an integrity error was raised by the reservation exclusion constraint
+    :param error:
+    :return:
+    """
+    diag = getattr(error.__cause__, 'diag', None)
+    return getattr(diag, 'constraint_name', None) == 'reservation_no_overlap'
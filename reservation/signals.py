@@ -1,39 +1,70 @@
-from django.utils import timezone
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
-from reservation.models import Reservation
+from reservation.cache import invalidate_cache
+from reservation.models import Property, Review, Media, Feature, Category, Reservation
 from django.conf import settings
 
 
-@receiver(post_save, sender=Reservation)
-def change_reservation_status_on_create(sender, instance, created, **kwargs):
+@receiver([post_save, post_delete], sender=Review)
+def update_property_review_aggregates(sender, instance, **kwargs):
     """
-    Create a signal to change reservation state (reserved boolean field) to true when a reservation instance is made
+    Create a signal to refresh stored review aggregates of the reviewed property when a review is saved or deleted
     :param sender:
     :param instance:
-    :param created:
     :param kwargs:
     :return:
     """
-    if created:
-        instance.reserved = True
-        instance.save()
-
-
-# @receiver(post_save, sender=Reservation)
-# def change_reservation_status_on_date_duration(sender, instance, created, **kwargs):
-#     """
-#     Create a signal to change the reservation state (reserved boolean field) based on checking reservation dates
-#     :param created:
-#     :param sender:
-#     :param instance:
-#     :param kwargs:
-#     :return:
-#     """
-#     if created:
-#         time_now = timezone.now()
-#         if instance.reservation_from <= time_now <= instance.reservation_to:
-#             instance.reserved = True
-#         else:
-#             instance.reserved = False
-#         instance.save()
+    Property.objects.filter(pk=instance.property_id).refresh_review_aggregates()
+
+
+@receiver([post_save, post_delete], sender=Property)
+def invalidate_property_cache(sender, instance, **kwargs):
+    """
+    Create a signal to expire cached responses of a property, property list and category list property counts when
+    a property is saved or deleted
+    :param sender:
+    :param instance:
+    :param kwargs:
+    :return:
+    """
+    invalidate_cache(f'property:{instance.pk}', 'property:list', 'category:list')
+
+
+@receiver([post_save, post_delete], sender=Media)
+@receiver([post_save, post_delete], sender=Review)
+@receiver([post_save, post_delete], sender=Feature)
+def invalidate_property_relation_cache(sender, instance, **kwargs):
+    """
+    Create a signal to expire cached responses of a property when its media, reviews or features are saved or
+    deleted, the new cache version changes their etag and last modified time without writing the property row
+    :param sender:
+    :param instance:
+    :param kwargs:
+    :return:
+    """
+    invalidate_cache(f'property:{instance.property_id}', 'property:list')
+
+
+@receiver([post_save, post_delete], sender=Reservation)
+def invalidate_reservation_cache(sender, instance, **kwargs):
+    """
+    Create a signal to expire cached property list responses when a reservation is saved or deleted, property lists
+    searched by check in and check out dates only show properties available in the requested period
+    :param sender:
+    :param instance:
+    :param kwargs:
+    :return:
+    """
+    invalidate_cache('property:list')
+
+
+@receiver([post_save, post_delete], sender=Category)
+def invalidate_category_cache(sender, instance, **kwargs):
+    """
+    Create a signal to expire cached responses of a category and category list when a category is saved or deleted
+    :param sender:
+    :param instance:
+    :param kwargs:
+    :return:
+    """
+    invalidate_cache(f'category:{instance.pk}', 'category:list')
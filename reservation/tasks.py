@@ -1,17 +1,78 @@
+from datetime import timedelta
 from celery import shared_task
+from django.conf import settings
+from django.db.models import Q
 from django.utils import timezone
-from reservation.models import Reservation
+from PIL import UnidentifiedImageError
+from holidaybooking.locks import single_instance_task
+from reservation.imaging import create_photo_variants
+from reservation.models import Reservation, Media, MediaUpload
+from reservation.uploads import discard_upload_file
+
+
+def sync_reservation_state(now=None):
+    """
+    Flip reservation state only for reservations crossing a reservation window boundary
+    :param now: point in time to evaluate reservation windows at, defaults to current time
+    :return: number of activated and deactivated reservations
+    """
+    now = now or timezone.now()
+    # Reservations whose window has started and not yet ended become reserved
+    activated = Reservation.objects.filter(
+        reserved=False, reservation_to__gt=now, reservation_from__lte=now).update(reserved=True)
+    # Reservations whose window has ended or not yet started are released
+    deactivated = Reservation.objects.filter(reserved=True).filter(
+        Q(reservation_to__lte=now) | Q(reservation_from__gt=now)).update(reserved=False)
+    return {'activated': activated, 'deactivated': deactivated}
 
 
 @shared_task
+@single_instance_task(timeout=10 * 60)
 def update_reservation_state():
     """
     Create a celery cron job to monitor reservation state of a reserved property
     """
-    now = timezone.now()
-    for reservation in Reservation.objects.all():
-        if reservation.reservation_from <= now <= reservation.reservation_to:
-            reservation.reserved = True
-        else:
-            reservation.reserved = False
-        reservation.save()
+    return sync_reservation_state()
+
+
+@shared_task(bind=True, max_retries=3, default_retry_delay=30)
+def process_media_photo(self, media_id):
+    """
+    Create a celery task to record photo dimensions and create resized photo variants after upload
+    :param media_id:
+    :return: number of processed photos
+    """
+    media = Media.objects.filter(pk=media_id).first()
+    if media is None:
+        return {'processed': 0}
+    if not media.photo:
+        media.processing_state = Media.PROCESSING_READY
+        media.save(update_fields=['processing_state'])
+        return {'processed': 0}
+    try:
+        media.width, media.height, media.variants = create_photo_variants(media)
+        media.processing_state = Media.PROCESSING_READY
+    except UnidentifiedImageError:
+        media.processing_state = Media.PROCESSING_FAILED
+    except OSError as error:
+        # Retry storage errors before marking photo processing as failed
+        if self.request.retries < self.max_retries:
+            raise self.retry(exc=error)
+        media.processing_state = Media.PROCESSING_FAILED
+    media.save(update_fields=['width', 'height', 'variants', 'processing_state'])
+    return {'processed': int(media.processing_state == Media.PROCESSING_READY)}
+
+
+@shared_task
+@single_instance_task(timeout=60 * 60)
+def clean_stale_media_uploads():
+    """
+    Create a celery cron job to remove chunked video uploads left unfinished by clients
+    :return: number of removed uploads
+    """
+    expired_at = timezone.now() - timedelta(hours=settings.MEDIA_UPLOAD_EXPIRY_HOURS)
+    uploads = list(MediaUpload.objects.filter(state=MediaUpload.UPLOADING, updated_at__lt=expired_at))
+    for upload in uploads:
+        discard_upload_file(upload)
+    MediaUpload.objects.filter(pk__in=[upload.pk for upload in uploads]).delete()
+    return {'removed': len(uploads)}
@@ -1,3 +1,676 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import shutil
+import tempfile
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APITestCase
+from account.models import User
+from reservation.benchmarks import BENCHMARK_CACHES, SCENARIOS, seed_benchmark_data
+from reservation.budgets import QUERY_BUDGETS
+from reservation.exports import CSV_FORMAT, NDJSON_FORMAT, escape_csv_cell, export_reservations, \
+    filter_reservations, write_rows
+from reservation.models import Category, Feature, FeatureCategory, MediaUpload, Property, PropertyRate, Reservation, \
+    StayDiscount
+from reservation.pricing import quote, quote_many
+from reservation.services import BookingConflict, book_property
+from reservation.uploads import get_chunks
 
-# Create your tests here.
+# Use a local memory cache in tests instead of redis
+TEST_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+def create_user(email, role=User.GUEST, **fields):
+    values = {'first_name': 'Test', 'last_name': 'User', 'role': role}
+    values.update(fields)
+    return User.objects.create_user(email, 'password', **values)
+
+
+def create_property(owner, **fields):
+    """
+    Create an available property of a new category with test defaults
+    :param owner:
+    :param fields: property fields overriding defaults
+    :return:
+    """
+    now = timezone.now()
+    category = Category.objects.create(name='apartment', description='Apartment stays')
+    values = {
+        'name': 'Test apartment', 'description': 'Test apartment', 'owner': owner, 'category': category,
+        'address': '1 Test Street', 'size': 50, 'number_of_bedrooms': 1, 'number_of_beds': 1, 'number_of_baths': 1,
+        'number_of_adult_guests': 2, 'number_of_child_guests': 0, 'price_per_night': Decimal('100.00'),
+        'available': True, 'available_from': now - timedelta(days=365), 'available_to': now + timedelta(days=365),
+    }
+    values.update(fields)
+    return Property.objects.create(**values)
+
+
+@override_settings(CACHES=BENCHMARK_CACHES)
+class QueryBudgetTest(APITestCase):
+    """
+    Test that api endpoints and tasks stay within their query budgets
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.dataset = seed_benchmark_data(properties=30, reviews_per_property=5, media_per_property=2,
+                                          features_per_property=3, reservations_per_property=2)
+
+    def setUp(self):
+        self.client.force_authenticate(self.dataset['guest'])
+
+    def assertWithinQueryBudget(self, name, iteration=0):
+        """
+        Run a benchmark scenario and assert its number of queries does not exceed its budget
+        :param name: scenario name
+        :param iteration:
+        :return:
+        """
+        with CaptureQueriesContext(connection) as queries:
+            SCENARIOS[name](self.client, self.dataset, iteration)
+        executed = '\n'.join(query['sql'] for query in queries.captured_queries)
+        self.assertLessEqual(len(queries), QUERY_BUDGETS[name],
+                             f'{name} ran {len(queries)} queries over its budget of {QUERY_BUDGETS[name]}:\n{executed}')
+        return len(queries)
+
+    def assertQueriesDoNotGrowWithPageSize(self, path):
+        """
+        Assert listing more rows of an endpoint does not run more queries
+        :param path:
+        :return:
+        """
+        counts = []
+        for page_size in (1, 20):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(path, {'page_size': page_size})
+            self.assertEqual(response.status_code, 200)
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1], f'{path} runs more queries for larger pages: {counts}')
+
+    def test_property_list_query_budget(self):
+        self.assertWithinQueryBudget('property-list')
+
+    def test_property_list_queries_do_not_grow_with_page_size(self):
+        self.assertQueriesDoNotGrowWithPageSize('/properties/')
+
+    def test_property_list_expanded_queries_do_not_grow_with_page_size(self):
+        self.assertQueriesDoNotGrowWithPageSize('/properties/?expand=media,reviews,features')
+
+    def test_property_detail_query_budget(self):
+        self.assertWithinQueryBudget('property-detail')
+
+    def test_property_search_query_budget(self):
+        self.assertWithinQueryBudget('property-search')
+
+    def test_property_available_query_budget(self):
+        self.assertWithinQueryBudget('property-available')
+
+    def test_category_list_query_budget(self):
+        self.assertWithinQueryBudget('category-list')
+
+    def test_category_list_queries_do_not_grow_with_page_size(self):
+        self.assertQueriesDoNotGrowWithPageSize('/categories/')
+
+    def test_review_list_query_budget(self):
+        self.assertWithinQueryBudget('review-list')
+
+    def test_reservation_create_query_budget(self):
+        self.assertWithinQueryBudget('reservation-create')
+
+    def test_reservation_state_task_query_budget(self):
+        self.assertWithinQueryBudget('reservation-state-task')
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ReservationOverlapTest(APITestCase):
+    """
+    Test that the reservation exclusion constraint rejects overlapping bookings of a property
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.host = create_user('host@example.com', role=User.HOST)
+        cls.guest = create_user('guest@example.com')
+        cls.property = create_property(cls.host)
+        # Start stays at midnight so every stay covers whole nights
+        cls.check_in = (timezone.now() + timedelta(days=30)).replace(hour=0, minute=0, second=0, microsecond=0)
+        cls.reservation = book_property(cls.guest, cls.property, cls.check_in, cls.check_in + timedelta(days=3))
+
+    def setUp(self):
+        self.client.force_authenticate(self.guest)
+
+    def book(self, reservation_from, reservation_to):
+        return self.client.post('/reservations/', {
+            'property': self.property.pk, 'reservation_from': reservation_from.isoformat(),
+            'reservation_to': reservation_to.isoformat()}, format='json')
+
+    def test_booking_overlapping_dates_raises_conflict(self):
+        with self.assertRaises(BookingConflict):
+            book_property(self.guest, self.property, self.check_in + timedelta(days=2),
+                          self.check_in + timedelta(days=5))
+
+    def test_overlapping_create_is_rejected(self):
+        response = self.book(self.check_in + timedelta(days=1), self.check_in + timedelta(days=4))
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Reservation.objects.filter(property=self.property).count(), 1)
+
+    def test_back_to_back_create_is_allowed(self):
+        # Periods are half open so a stay may start when the previous one ends
+        response = self.book(self.check_in + timedelta(days=3), self.check_in + timedelta(days=5))
+        self.assertEqual(response.status_code, 201)
+        response = self.book(self.check_in - timedelta(days=2), self.check_in)
+        self.assertEqual(response.status_code, 201)
+
+    def test_overlapping_update_is_rejected(self):
+        later = book_property(self.guest, self.property, self.check_in + timedelta(days=5),
+                              self.check_in + timedelta(days=7))
+        response = self.client.patch(f'/reservations/{later.pk}/', {
+            'reservation_from': (self.check_in + timedelta(days=2)).isoformat()}, format='json')
+        self.assertEqual(response.status_code, 400)
+        later.refresh_from_db()
+        self.assertEqual(later.reservation_from, self.check_in + timedelta(days=5))
+
+    def test_update_recomputes_reserved_state(self):
+        now = timezone.now()
+        response = self.client.patch(f'/reservations/{self.reservation.pk}/', {
+            'reservation_from': (now - timedelta(days=1)).isoformat(),
+            'reservation_to': (now + timedelta(days=1)).isoformat()}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.reservation.refresh_from_db()
+        self.assertTrue(self.reservation.reserved)
+        self.assertEqual(self.reservation.nights, 2)
+
+
+class PricingTest(TestCase):
+    """
+    Test that stays are priced from rates, stay discounts and service fees with exact decimal amounts
+    """
+    # Monday of a week whose nights are priced
+    monday = date(2030, 1, 7)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.host = create_user('host@example.com', role=User.HOST)
+        cls.property = create_property(cls.host, price_per_night=Decimal('100.00'))
+
+    def price(self, nights, property=None):
+        return quote(property or self.property, self.monday, self.monday + timedelta(days=nights))
+
+    def add_rate(self, price, **fields):
+        return PropertyRate.objects.create(property=self.property, name='rate', price_per_night=Decimal(price),
+                                           **fields)
+
+    def test_stay_is_priced_per_night_with_service_fee(self):
+        stay = self.price(3)
+        self.assertEqual(stay.nights, 3)
+        self.assertEqual(stay.nightly_total, Decimal('300.00'))
+        self.assertEqual(stay.discount, Decimal('0.00'))
+        self.assertEqual(stay.subtotal, Decimal('300.00'))
+        self.assertEqual(stay.service_fee, Decimal('36.00'))
+        self.assertEqual(stay.cancellation_fee, Decimal('0'))
+        self.assertEqual(stay.total, Decimal('336.00'))
+
+    def test_weekday_rate_prices_matching_nights(self):
+        self.add_rate('80.00', weekday=1)
+        self.assertEqual(self.price(3).nightly_total, Decimal('280.00'))
+
+    def test_season_rate_prices_nights_in_season_only(self):
+        # Season days are the first and last nights of the season, check out day is not a night of the stay
+        self.add_rate('200.00', start_date=self.monday + timedelta(days=1), end_date=self.monday + timedelta(days=1))
+        self.add_rate('300.00', start_date=self.monday + timedelta(days=3))
+        self.assertEqual(self.price(3).nightly_total, Decimal('400.00'))
+
+    def test_rate_with_higher_priority_wins(self):
+        self.add_rate('80.00', weekday=1, priority=0)
+        self.add_rate('150.00', start_date=self.monday, end_date=self.monday + timedelta(days=30), priority=1)
+        self.assertEqual(self.price(3).nightly_total, Decimal('450.00'))
+        PropertyRate.objects.filter(weekday=1).update(priority=2)
+        self.assertEqual(self.price(3).nightly_total, Decimal('380.00'))
+
+    def test_longest_applying_stay_discount_wins(self):
+        StayDiscount.objects.create(property=self.property, min_nights=3, percent=Decimal('10'))
+        StayDiscount.objects.create(property=self.property, min_nights=7, percent=Decimal('20'))
+        self.assertEqual(self.price(2).discount, Decimal('0.00'))
+        self.assertEqual(self.price(5).discount, Decimal('50.00'))
+        stay = self.price(7)
+        self.assertEqual(stay.discount, Decimal('140.00'))
+        self.assertEqual(stay.subtotal, Decimal('560.00'))
+        self.assertEqual(stay.total, Decimal('627.20'))
+
+    def test_discount_is_rounded_half_up_to_cents(self):
+        property = create_property(self.host, price_per_night=Decimal('10.05'))
+        StayDiscount.objects.create(property=property, min_nights=2, percent=Decimal('5'))
+        stay = self.price(2, property)
+        # 5% of 20.10 is 1.005, rounded half to even it would be 1.00
+        self.assertEqual(stay.discount, Decimal('1.01'))
+        self.assertEqual(stay.subtotal, Decimal('19.09'))
+        self.assertEqual(stay.service_fee, Decimal('2.29'))
+        self.assertEqual(stay.total, Decimal('21.38'))
+
+    @override_settings(RESERVATION_SERVICE_FEE_RATE=Decimal('0.15'))
+    def test_service_fee_is_rounded_half_up_to_cents(self):
+        property = create_property(self.host, price_per_night=Decimal('0.15'))
+        # 15% of 0.30 is 0.045, rounded half to even it would be 0.04
+        self.assertEqual(self.price(2, property).service_fee, Decimal('0.05'))
+
+    def test_paid_cancellation_fee_is_charged_per_night(self):
+        property = create_property(self.host, cancellation_policy=Property.PAID_CANCELLATION,
+                                   cancellation_fee_per_night=Decimal('5.00'))
+        stay = self.price(3, property)
+        self.assertEqual(stay.cancellation_fee, Decimal('15.00'))
+        # Cancellation fees are not part of the total
+        self.assertEqual(stay.total, Decimal('336.00'))
+
+    def test_quote_many_prices_stays_in_order_by_calendar_nights(self):
+        other = create_property(self.host, price_per_night=Decimal('50.00'))
+        check_in = timezone.make_aware(datetime(2030, 1, 7, 15))
+        quotes = quote_many([(other, check_in, check_in + timedelta(days=2, hours=-4)),
+                             (self.property, self.monday, self.monday + timedelta(days=1))])
+        self.assertEqual([stay.property_id for stay in quotes], [other.pk, self.property.pk])
+        self.assertEqual([stay.nights for stay in quotes], [2, 1])
+        self.assertEqual([stay.nightly_total for stay in quotes], [Decimal('100.00'), Decimal('100.00')])
+
+
+@override_settings(CACHES=TEST_CACHES)
+class QuoteApiTest(APITestCase):
+    """
+    Test that quotes answered by the api match the price snapshot stored on reservations
+    """
+
+    def test_quote_matches_reservation_price_snapshot(self):
+        host = create_user('host@example.com', role=User.HOST)
+        guest = create_user('guest@example.com')
+        property = create_property(host, cancellation_policy=Property.PAID_CANCELLATION,
+                                   cancellation_fee_per_night=Decimal('5.00'))
+        check_in = timezone.localdate() + timedelta(days=30)
+        self.client.force_authenticate(guest)
+        response = self.client.post('/quotes/', {
+            'check_in': check_in.isoformat(), 'check_out': (check_in + timedelta(days=3)).isoformat(),
+            'properties': [property.pk]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        stay = response.data[0]
+        reservation_from = timezone.make_aware(datetime.combine(check_in, datetime.min.time()))
+        reservation = book_property(guest, property, reservation_from, reservation_from + timedelta(days=3))
+        for field in ['nights', 'subtotal', 'service_fee', 'cancellation_fee', 'total']:
+            self.assertEqual(str(stay[field]), str(getattr(reservation, field)), field)
+
+
+@override_settings(CACHES=TEST_CACHES, ALLOWED_HOSTS=['api.example.com', 'internal.example.com'])
+class CachedReadTest(APITestCase):
+    """
+    Test that cached list responses are served until their data changes and answer conditional requests
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('guest@example.com')
+        cls.categories = [Category.objects.create(name=name, description=f'{name} stays')
+                          for name in ['apartment', 'house']]
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(self.user)
+
+    def get_categories(self, **headers):
+        return self.client.get('/categories/', {'page_size': 1}, HTTP_HOST='api.example.com', **headers)
+
+    def test_cached_response_is_served_until_invalidated(self):
+        category = self.categories[-1]
+        self.assertEqual(self.get_categories().data['results'][0]['name'], 'house')
+        # Query-set updates send no signals so the cached response is still served
+        Category.objects.filter(pk=category.pk).update(name='villa')
+        self.assertEqual(self.get_categories().data['results'][0]['name'], 'house')
+        with self.captureOnCommitCallbacks(execute=True):
+            category.name = 'cabin'
+            category.save()
+        self.assertEqual(self.get_categories().data['results'][0]['name'], 'cabin')
+
+    def test_responses_are_cached_by_host(self):
+        external = self.get_categories()
+        internal = self.client.get('/categories/', {'page_size': 1}, HTTP_HOST='internal.example.com')
+        self.assertTrue(external.data['next'].startswith('http://api.example.com/'))
+        self.assertTrue(internal.data['next'].startswith('http://internal.example.com/'))
+
+    def test_matching_etag_is_answered_not_modified(self):
+        response = self.get_categories()
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('ETag', response)
+        self.assertEqual(self.get_categories(HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+    def test_etag_changes_when_data_changes(self):
+        etag = self.get_categories()['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.categories[-1].save()
+        response = self.get_categories(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_unmodified_since_last_modified_is_answered_not_modified(self):
+        response = self.get_categories()
+        self.assertIn('Last-Modified', response)
+        response = self.get_categories(HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class KeysetCursorPaginationTest(APITestCase):
+    """
+    Test that cursor pages split rows tied on the first ordering field without skipping or repeating rows
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('guest@example.com')
+        # Share names between categories so pages end in the middle of tied rows
+        for name in ['b', 'a', 'b', 'a', 'b', 'a', 'c', 'b']:
+            Category.objects.create(name=name, description=f'{name} stays')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(self.user)
+
+    def read_pages(self, url, link):
+        """
+        Follow next or previous links from a page url
+        :param url:
+        :param link: next or previous
+        :return: ids of each page and the last response
+        """
+        pages = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            pages.append([category['id'] for category in response.data['results']])
+            url = response.data[link]
+        return pages, response
+
+    def assertPagesThroughTies(self, ordering):
+        expected = list(Category.objects.order_by(ordering, ordering.replace('name', 'id'))
+                        .values_list('id', flat=True))
+        pages, last = self.read_pages(f'/categories/?ordering={ordering}&page_size=3', 'next')
+        self.assertEqual(sum(pages, []), expected)
+        self.assertTrue(all(len(page) == 3 for page in pages[:-1]))
+        # Walk back from the last page
+        previous_pages, first = self.read_pages(last.data['previous'], 'previous')
+        self.assertEqual(sum(reversed(previous_pages), []) + pages[-1], expected)
+        self.assertIsNone(first.data['previous'])
+
+    def test_ascending_pages_through_ties(self):
+        self.assertPagesThroughTies('name')
+
+    def test_descending_pages_through_ties(self):
+        self.assertPagesThroughTies('-name')
+
+
+@override_settings(CACHES=TEST_CACHES, MEDIA_UPLOAD_MAX_CHUNK_SIZE=16)
+class MediaUploadTest(APITestCase):
+    """
+    Test that videos uploaded in resumable chunks are checked and joined in order
+    """
+    # Define leading bytes of an mp4 video followed by its content
+    video = b'\x00\x00\x00\x18ftypmp42' + b'0123456789' * 3
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # Keep stored chunks and videos in a temporary media root
+        cls.media_root = tempfile.mkdtemp()
+        cls.media_settings = override_settings(MEDIA_ROOT=cls.media_root)
+        cls.media_settings.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.media_settings.disable()
+        shutil.rmtree(cls.media_root, ignore_errors=True)
+        super().tearDownClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.host = create_user('host@example.com', role=User.HOST)
+        cls.property = create_property(cls.host)
+
+    def setUp(self):
+        self.client.force_authenticate(self.host)
+        response = self.client.post(f'/properties/{self.property.pk}/video-uploads/', {
+            'name': 'Tour', 'filename': 'tour.mp4', 'total_size': len(self.video)}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.upload_url = f'/properties/{self.property.pk}/video-uploads/{response.data["id"]}/'
+        self.upload = MediaUpload.objects.get(pk=response.data['id'])
+
+    def send_chunk(self, start, end, data=None, total=None):
+        data = self.video[start:end + 1] if data is None else data
+        return self.client.put(f'{self.upload_url}chunk/', data, content_type='application/octet-stream',
+                               HTTP_CONTENT_RANGE=f'bytes {start}-{end}/{total or len(self.video)}')
+
+    def send_video(self, chunk_size):
+        for start in range(0, len(self.video), chunk_size):
+            end = min(start + chunk_size, len(self.video)) - 1
+            self.assertEqual(self.send_chunk(start, end).status_code, 200)
+
+    def complete(self):
+        return self.client.post(f'{self.upload_url}complete/')
+
+    def test_chunks_are_joined_into_media_video(self):
+        self.send_video(16)
+        response = self.complete()
+        self.assertEqual(response.status_code, 201)
+        self.upload.refresh_from_db()
+        self.assertEqual(self.upload.state, MediaUpload.COMPLETE)
+        with self.upload.media.video.open('rb') as video:
+            self.assertEqual(video.read(), self.video)
+        self.assertEqual(get_chunks(self.upload), [])
+
+    def test_chunk_at_wrong_offset_answers_received_size(self):
+        self.assertEqual(self.send_chunk(0, 9).status_code, 200)
+        response = self.send_chunk(12, 15)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['received_size'], 10)
+
+    def test_first_chunk_shorter_than_video_signature_is_buffered(self):
+        self.assertEqual(self.send_chunk(0, 2).status_code, 200)
+        self.assertEqual(self.send_chunk(3, 5).status_code, 200)
+        self.assertEqual(self.send_chunk(6, 15).status_code, 200)
+        self.assertEqual(self.send_chunk(16, len(self.video) - 1).status_code, 200)
+        self.assertEqual(self.complete().status_code, 201)
+
+    def test_video_signature_is_checked_once_enough_bytes_arrive(self):
+        self.assertEqual(self.send_chunk(0, 2).status_code, 200)
+        response = self.send_chunk(3, 9, data=b'\x18mpeg4x')
+        self.assertEqual(response.status_code, 400)
+        self.upload.refresh_from_db()
+        self.assertEqual(self.upload.received_size, 3)
+
+    def test_completing_with_missing_chunk_is_rejected(self):
+        self.send_video(16)
+        _, name = get_chunks(self.upload)[1]
+        default_storage.delete(name)
+        self.assertEqual(self.complete().status_code, 400)
+
+    def test_completing_incomplete_upload_is_rejected(self):
+        self.send_video(16)
+        MediaUpload.objects.filter(pk=self.upload.pk).update(received_size=16)
+        self.assertEqual(self.complete().status_code, 400)
+
+    def test_chunk_larger_than_allowed_chunk_size_is_rejected(self):
+        self.assertEqual(self.send_chunk(0, 16).status_code, 400)
+
+    def test_chunk_past_upload_size_is_rejected(self):
+        self.send_video(16)
+        # Pretend the last chunk was not saved so the client resends it with a range past the upload size
+        MediaUpload.objects.filter(pk=self.upload.pk).update(received_size=32)
+        self.assertEqual(self.send_chunk(32, 35, data=b'8989').status_code, 400)
+
+    def test_chunk_of_other_total_size_is_rejected(self):
+        self.assertEqual(self.send_chunk(0, 9, total=len(self.video) + 1).status_code, 400)
+
+    def test_chunk_body_shorter_than_content_range_is_rejected(self):
+        self.assertEqual(self.send_chunk(0, 9, data=self.video[:5]).status_code, 400)
+
+
+@override_settings(TIME_ZONE='Asia/Tokyo')
+class ReservationExportTest(TestCase):
+    """
+    Test that exported reservations are filtered by days of the current time zone and csv cells are not read as
+    formulas
+    """
+    day = date(2030, 3, 10)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.host = create_user('host@example.com', role=User.HOST)
+        cls.guest = create_user('guest@example.com')
+        cls.property = create_property(cls.host)
+        # Book half hour stays around the bounds of the day, local midnight is 15:00 utc of the day before
+        cls.before = cls.reserve(cls.guest, cls.local(cls.day - timedelta(days=1), 23, 30))
+        cls.first = cls.reserve(cls.guest, cls.local(cls.day, 0, 0))
+        cls.last = cls.reserve(cls.guest, cls.local(cls.day, 23, 30))
+        cls.after = cls.reserve(cls.guest, cls.local(cls.day + timedelta(days=1), 0, 0))
+
+    @staticmethod
+    def local(day, hour, minute):
+        return timezone.make_aware(datetime(day.year, day.month, day.day, hour, minute))
+
+    @classmethod
+    def reserve(cls, guest, reservation_from):
+        return Reservation.objects.create(property=cls.property, guest=guest, reservation_from=reservation_from,
+                                          reservation_to=reservation_from + timedelta(minutes=30))
+
+    def select(self, **dates):
+        return set(filter_reservations(owner=self.host, **dates).values_list('pk', flat=True))
+
+    def export(self, export_format, **dates):
+        columns, rows = export_reservations(filter_reservations(owner=self.host, **dates))
+        return ''.join(write_rows(columns, rows, export_format, chunk_size=2))
+
+    def test_date_range_includes_whole_local_days(self):
+        self.assertEqual(self.select(date_from=self.day, date_to=self.day), {self.first.pk, self.last.pk})
+
+    def test_date_from_starts_at_local_midnight(self):
+        self.assertEqual(self.select(date_from=self.day), {self.first.pk, self.last.pk, self.after.pk})
+
+    def test_date_to_ends_at_next_local_midnight(self):
+        self.assertEqual(self.select(date_to=self.day), {self.before.pk, self.first.pk, self.last.pk})
+
+    def test_reservations_of_other_hosts_are_not_exported(self):
+        other_host = create_user('other@example.com', role=User.HOST)
+        self.assertEqual(set(filter_reservations(owner=other_host)), set())
+
+    def test_csv_cells_read_as_formulas_are_escaped(self):
+        names = ['=1+2', '+1', '-1', '@SUM(A1)', '\tTab', '\rReturn', 'Ann']
+        day = self.day + timedelta(days=5)
+        for number, name in enumerate(names):
+            guest = create_user(f'guest{number}@example.com', first_name=name)
+            self.reserve(guest, self.local(day, number, 0))
+        rows = list(csv.DictReader(io.StringIO(self.export(CSV_FORMAT, date_from=day), newline='')))
+        self.assertEqual([row['guest_first_name'] for row in rows], [f"'{name}" for name in names[:-1]] + ['Ann'])
+        self.assertEqual({row['property_id'] for row in rows}, {str(self.property.pk)})
+
+    def test_ndjson_values_are_not_escaped(self):
+        guest = create_user('formula@example.com', first_name='=1+2')
+        day = self.day + timedelta(days=5)
+        self.reserve(guest, self.local(day, 0, 0))
+        rows = [json.loads(line) for line in self.export(NDJSON_FORMAT, date_from=day).splitlines()]
+        self.assertEqual([row['guest_first_name'] for row in rows], ['=1+2'])
+
+    def test_only_text_cells_are_escaped(self):
+        self.assertEqual(escape_csv_cell(-1), -1)
+        self.assertEqual(escape_csv_cell(Decimal('-1.00')), Decimal('-1.00'))
+        self.assertEqual(escape_csv_cell('a=b'), 'a=b')
+
+
+@override_settings(CACHES=TEST_CACHES, PROPERTY_IMPORT_BATCH_SIZE=2)
+class PropertyImportTest(APITestCase):
+    """
+    Test that imported rows are validated per row and only valid rows are bulk inserted with their features
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.host = create_user('host@example.com', role=User.HOST)
+        cls.category = Category.objects.create(name='apartment', description='Apartment stays')
+        cls.feature_category = FeatureCategory.objects.create(name='kitchen', description='Kitchen')
+
+    def setUp(self):
+        self.client.force_authenticate(self.host)
+
+    def row(self, name, **fields):
+        now = timezone.now()
+        values = {
+            'name': name, 'description': name, 'category': self.category.pk, 'address': '1 Test Street', 'size': 50,
+            'latitude': 31.95, 'longitude': 35.93, 'number_of_bedrooms': 1, 'number_of_beds': 1,
+            'number_of_baths': 1, 'number_of_adult_guests': 2, 'number_of_child_guests': 0,
+            'price_per_night': '100.00', 'available_from': (now + timedelta(days=1)).isoformat(),
+            'available_to': (now + timedelta(days=365)).isoformat(),
+        }
+        values.update(fields)
+        return values
+
+    def post_import(self, body, content_type):
+        response = self.client.post('/properties/import/', body, content_type=content_type)
+        self.assertEqual(response.status_code, 200)
+        return [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+
+    def test_ndjson_rows_report_errors_by_line_and_insert_valid_rows(self):
+        features = [{'name': 'Oven', 'feature_category': self.feature_category.pk},
+                    {'name': 'Fridge', 'description': 'Large', 'feature_category': self.feature_category.pk}]
+        lines = [
+            json.dumps(self.row('Sea view', features=features)),
+            json.dumps(self.row('Missing category', category=self.category.pk + 100)),
+            '{"name": ',
+            '',
+            json.dumps(self.row('City view')),
+            json.dumps(self.row('Bad feature', features=[{'name': 'Oven', 'feature_category': 0}])),
+        ]
+        with CaptureQueriesContext(connection) as queries:
+            events = self.post_import('\n'.join(lines), 'application/x-ndjson')
+
+        errors = {event['line']: event['errors'] for event in events if 'errors' in event}
+        self.assertEqual(list(errors), [2, 3, 6])
+        self.assertIn('category', errors[2])
+        self.assertEqual(errors[3], {'non_field_errors': ['Line is not valid json']})
+        self.assertIn('features', errors[6])
+        self.assertEqual([event for event in events if 'lines' in event], [
+            {'lines': [1, 2], 'imported': 1}, {'lines': [3, 5], 'imported': 1}, {'lines': [6, 6], 'imported': 0}])
+        self.assertEqual(events[-1], {'imported': 2, 'failed': 3})
+
+        # Valid rows of a batch are inserted in one statement and rows without features add no feature insert
+        property_inserts = [query for query in queries.captured_queries
+                            if query['sql'].startswith(f'INSERT INTO "{Property._meta.db_table}"')]
+        feature_inserts = [query for query in queries.captured_queries
+                           if query['sql'].startswith(f'INSERT INTO "{Feature._meta.db_table}"')]
+        self.assertEqual((len(property_inserts), len(feature_inserts)), (2, 1))
+        properties = Property.objects.filter(owner=self.host).order_by('pk')
+        self.assertEqual([(property.name, property.slug) for property in properties],
+                         [('Sea view', 'sea-view'), ('City view', 'city-view')])
+        self.assertEqual(sorted(properties[0].features.values_list('name', 'description', 'feature_category')),
+                         [('Fridge', 'Large', self.feature_category.pk), ('Oven', '', self.feature_category.pk)])
+        self.assertFalse(properties[1].features.exists())
+
+    def test_csv_rows_report_errors_by_line(self):
+        columns = list(self.row('Sea view')) + ['features']
+        body = io.StringIO()
+        writer = csv.DictWriter(body, columns)
+        writer.writeheader()
+        writer.writerow(self.row('Sea view', features=json.dumps(
+            [{'name': 'Oven', 'feature_category': self.feature_category.pk}])))
+        writer.writerow(self.row('Bad features', features='[{"name"'))
+        writer.writerow(self.row('No features', features=''))
+        events = self.post_import(body.getvalue(), 'text/csv')
+
+        self.assertEqual([event['line'] for event in events if 'errors' in event], [3])
+        self.assertEqual(events[-1], {'imported': 2, 'failed': 1})
+        self.assertEqual(list(Property.objects.filter(owner=self.host).order_by('pk').values_list('name', flat=True)),
+                         ['Sea view', 'No features'])
+        self.assertEqual(Feature.objects.filter(property__owner=self.host).count(), 1)
+
+    def test_unknown_content_type_is_rejected(self):
+        response = self.client.post('/properties/import/', '{}', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Property.objects.exists())
@@ -0,0 +1,179 @@
+import re
+import shutil
+import tempfile
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from django.core.files.storage import default_storage
+from reservation.models import Media, MediaUpload
+from reservation.validators import VIDEO_SIGNATURE_SIZE, validate_video_signature
+
+# Define size of blocks streamed from request body to chunk file
+STREAM_BLOCK_SIZE = 64 * 1024
+
+# Match content range header of an uploaded chunk like "bytes 0-1048575/5242880"
+CONTENT_RANGE_PATTERN = re.compile(r'^bytes (?P<start>\d+)-(?P<end>\d+)/(?P<total>\d+)$')
+
+
+class UploadError(Exception):
+    """
+    Raised when an uploaded chunk can not be appended to a chunked upload
+    """
+
+
+class UploadOffsetMismatch(UploadError):
+    """
+    Raised when an uploaded chunk does not start where received data ends, the client should resume from the
+    received size
+    """
+
+
+def get_upload_dir(upload):
+    """
+    Get directory in the default storage keeping the chunks of an upload
+    :param upload:
+    :return:
+    """
+    return f'{settings.MEDIA_UPLOAD_CHUNK_DIR}/{upload.pk}'
+
+
+def get_chunk_name(upload, start):
+    # Pad start offsets so chunk names sort in upload order
+    return f'{get_upload_dir(upload)}/{start:012d}.part'
+
+
+def get_chunks(upload):
+    """
+    Get start offsets and storage names of the stored chunks of an upload in upload order
+    :param upload:
+    :return:
+    """
+    directory = get_upload_dir(upload)
+    try:
+        _, files = default_storage.listdir(directory)
+    except FileNotFoundError:
+        return []
+    return [(int(name.split('.')[0]), f'{directory}/{name}') for name in sorted(files)]
+
+
+def read_upload_head(upload, size):
+    """
+    Read leading bytes of an upload from its stored chunks
+    :param upload:
+    :param size: number of bytes to read
+    :return:
+    """
+    head = b''
+    for _, name in get_chunks(upload):
+        if len(head) >= size:
+            break
+        with default_storage.open(name) as chunk:
+            head += chunk.read(size - len(head))
+    return head
+
+
+def parse_content_range(content_range):
+    """
+    Parse content range header of an uploaded chunk into start offset, end offset and total size
+    :param content_range:
+    :return:
+    """
+    match = CONTENT_RANGE_PATTERN.match(content_range or '')
+    if match is None:
+        raise UploadError('Content-Range header must be formatted as "bytes start-end/total"')
+    start, end, total = (int(match.group(name)) for name in ('start', 'end', 'total'))
+    if end < start:
+        raise UploadError('Content-Range end must not be before start')
+    return start, end, total
+
+
+def append_chunk(upload, stream, content_range):
+    """
+    Stream an uploaded chunk to the default storage checking size and video type while it is received
+    :param upload: upload locked for update by caller
+    :param stream: request body stream
+    :param content_range: content range header of the chunk
+    :return: number of written bytes
+    """
+    start, end, total = parse_content_range(content_range)
+    if total != upload.total_size:
+        raise UploadError('Content-Range total does not match upload size')
+    if start != upload.received_size:
+        raise UploadOffsetMismatch(f'Chunk must start at received size {upload.received_size}')
+    chunk_size = end - start + 1
+    if chunk_size > settings.MEDIA_UPLOAD_MAX_CHUNK_SIZE or end >= upload.total_size:
+        raise UploadError('Chunk is larger than allowed chunk size or remaining upload size')
+
+    # Check video type once the leading bytes of the upload are received, short chunks are buffered with the
+    # leading bytes of previous chunks until enough bytes arrive
+    signature_end = min(VIDEO_SIGNATURE_SIZE, upload.total_size)
+    head = read_upload_head(upload, start) if start < signature_end else None
+    written = 0
+    with tempfile.SpooledTemporaryFile(max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE) as chunk_file:
+        while written < chunk_size:
+            block = stream.read(min(STREAM_BLOCK_SIZE, chunk_size - written))
+            if not block:
+                break
+            if head is not None:
+                head += block[:signature_end - len(head)]
+                if len(head) >= signature_end:
+                    try:
+                        validate_video_signature(upload.get_extension(), head)
+                    except ValidationError as error:
+                        raise UploadError(error.messages[0])
+                    head = None
+            chunk_file.write(block)
+            written += len(block)
+        # Reject bodies longer than content range
+        if stream.read(1):
+            raise UploadError('Chunk body is larger than Content-Range')
+        if written != chunk_size:
+            raise UploadError('Chunk body is shorter than Content-Range')
+        # Replace chunk stored by a previous attempt whose received size was not saved
+        name = get_chunk_name(upload, start)
+        default_storage.delete(name)
+        chunk_file.seek(0)
+        default_storage.save(name, File(chunk_file))
+
+    upload.received_size = start + written
+    upload.save(update_fields=['received_size', 'updated_at'])
+    return written
+
+
+def complete_upload(upload):
+    """
+    Attach the joined chunks of a fully received upload to a new property media and remove the chunks
+    :param upload: upload locked for update by caller
+    :return: created media
+    """
+    if upload.received_size != upload.total_size:
+        raise UploadError(f'Upload is incomplete, received {upload.received_size} of {upload.total_size} bytes')
+    media = Media(property_id=upload.property_id, name=upload.name, description=upload.description,
+                  processing_state=Media.PROCESSING_READY)
+    with tempfile.TemporaryFile() as upload_file:
+        # Join stored chunks in upload order
+        for start, name in get_chunks(upload):
+            if start != upload_file.tell():
+                raise UploadError(f'Upload chunk at {upload_file.tell()} bytes is missing')
+            with default_storage.open(name) as chunk:
+                shutil.copyfileobj(chunk, upload_file)
+        if upload_file.tell() != upload.total_size:
+            raise UploadError(f'Upload chunks hold {upload_file.tell()} of {upload.total_size} bytes')
+        upload_file.seek(0)
+        media.video.save(upload.filename, File(upload_file), save=False)
+    media.save()
+    upload.media = media
+    upload.state = MediaUpload.COMPLETE
+    upload.save(update_fields=['media', 'state', 'updated_at'])
+    discard_upload_file(upload)
+    return media
+
+
+def discard_upload_file(upload):
+    """
+    Remove stored chunks of an upload
+    :param upload:
+    :return:
+    """
+    for _, name in get_chunks(upload):
+        default_storage.delete(name)
@@ -1,5 +1,5 @@
 from django.urls import path, include
-from reservation import views
+from reservation import async_views, views
 from rest_framework_nested import routers
 
 
@@ -9,16 +9,27 @@ router.register('properties', views.PropertyViewSet, basename='properties')
 router.register('categories', views.CategoryViewSet, basename='categories')
 router.register('feature-categories', views.FeatureCategoryViewSet, basename='feature-categories')
 router.register('reservations', views.ReservationViewSet, basename='reservations')
+router.register('quotes', views.QuoteViewSet, basename='quotes')
 
 # Define nested router for property media
 property_router = routers.NestedDefaultRouter(router, 'properties', lookup='property')
 property_router.register('media', views.MediaViewSet, basename='property-media')
+property_router.register('video-uploads', views.MediaUploadViewSet, basename='property-video-uploads')
 property_router.register('reviews', views.ReviewViewSet, basename='property-reviews')
 property_router.register('features', views.FeatureViewSet, basename='property-features')
+property_router.register('rates', views.PropertyRateViewSet, basename='property-rates')
+property_router.register('stay-discounts', views.StayDiscountViewSet, basename='property-stay-discounts')
 
 urlpatterns = [
     # Include view set routers
     path('', include(router.urls)),
     # Include view set nested routers
     path('', include(property_router.urls)),
+    # Define async read endpoints served without a thread per request under asgi
+    path('async/properties/', async_views.AsyncPropertyListView.as_view(), name='async-properties-list'),
+    path('async/properties/<int:pk>/', async_views.AsyncPropertyDetailView.as_view(),
+         name='async-properties-detail'),
+    path('async/categories/', async_views.AsyncCategoryListView.as_view(), name='async-categories-list'),
+    path('async/properties/<int:property_pk>/reviews/', async_views.AsyncReviewListView.as_view(),
+         name='async-property-reviews-list'),
 ]
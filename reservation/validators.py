@@ -1,5 +1,22 @@
 from django.core.exceptions import ValidationError
 
+# Define maximum sizes and allowed extensions of property media files
+MAX_IMAGE_SIZE_IN_MB = 5
+MAX_VIDEO_SIZE_IN_MB = 100
+VIDEO_EXTENSIONS = ['mp4', 'webm', 'mkv', 'flv', 'wmv']
+
+# Define leading bytes identifying each allowed video container, mp4 signature starts after the box size
+VIDEO_SIGNATURES = {
+    'mp4': (4, b'ftyp'),
+    'webm': (0, b'\x1a\x45\xdf\xa3'),
+    'mkv': (0, b'\x1a\x45\xdf\xa3'),
+    'flv': (0, b'FLV'),
+    'wmv': (0, b'\x30\x26\xb2\x75\x8e\x66\xcf\x11'),
+}
+
+# Define number of leading bytes needed to check any video signature
+VIDEO_SIGNATURE_SIZE = max(offset + len(signature) for offset, signature in VIDEO_SIGNATURES.values())
+
 
 def validate_image_size(file):
     """
@@ -7,7 +24,7 @@ def validate_image_size(file):
     :param file:
     :return:
     """
-    max_image_size_in_mb = 5
+    max_image_size_in_mb = MAX_IMAGE_SIZE_IN_MB
     if file.size > (max_image_size_in_mb * 1024 * 1024):
         raise ValidationError(f'Image size can not be larger than {max_image_size_in_mb} MB')
 
@@ -18,6 +35,18 @@ def validate_video_size(file):
     :param file:
     :return:
     """
-    max_video_size_in_mb = 100
+    max_video_size_in_mb = MAX_VIDEO_SIZE_IN_MB
     if file.size > (max_video_size_in_mb * 1024 * 1024):
         raise ValidationError(f'Video size can not be larger than {max_video_size_in_mb}')
+
+
+def validate_video_signature(extension, head):
+    """
+    Custom validator for leading bytes of uploaded videos to match the video file extension
+    :param extension:
+    :param head: first bytes of the video file
+    :return:
+    """
+    offset, signature = VIDEO_SIGNATURES[extension]
+    if head[offset:offset + len(signature)] != signature:
+        raise ValidationError(f'Video content does not match {extension} file type')
@@ -1,43 +1,86 @@
+import io
+import json
+import shutil
+import tempfile
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+from django.http import StreamingHttpResponse
+from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.mixins import CreateModelMixin, DestroyModelMixin, UpdateModelMixin, RetrieveModelMixin
-from rest_framework.permissions import IsAuthenticated
-from rest_framework.viewsets import ModelViewSet, GenericViewSet
+from rest_framework.permissions import IsAuthenticated, SAFE_METHODS
+from rest_framework.response import Response
+from rest_framework.viewsets import ModelViewSet, GenericViewSet, ViewSet
 from rest_framework.filters import SearchFilter, OrderingFilter
-from reservation.models import Property, Category, Media, Feature, FeatureCategory, Review, Reservation
-from reservation.serializers import PropertySerializer, CategorySerializer, MediaSerializer, ReviewSerializer, \
-    FeatureCategorySerializer, FeatureSerializer, ReservationSerializer, CreateReservationSerializer, \
-    UpdateReservationSerializer
-from reservation.permissions import CanAddOrUpdateProperty, AdminOnlyActions, CanAddOrUpdateReservation
-
-
-class PropertyViewSet(ModelViewSet):
+from reservation.cache import CachedReadMixin
+from reservation.filters import FullTextSearchFilter, NearbyPropertyFilter, AvailablePropertyFilter
+from reservation.pagination import KeysetCursorPagination, IdCursorPagination
+from reservation.models import Property, Category, Media, MediaUpload, Feature, FeatureCategory, Review, Reservation, \
+    PropertyRate, StayDiscount
+from reservation.serializers import PropertySerializer, PropertyListSerializer, CategorySerializer, MediaSerializer, \
+    MediaUploadSerializer, ReviewSerializer, FeatureCategorySerializer, FeatureSerializer, ReservationSerializer, \
+    CreateReservationSerializer, UpdateReservationSerializer, PropertyRateSerializer, StayDiscountSerializer, \
+    QuoteRequestSerializer, QuoteSerializer, ExportRequestSerializer
+from reservation.pricing import PRICING_FIELDS, quote_many
+from reservation.importers import IMPORT_CONTENT_TYPES, import_properties, read_rows
+from reservation.exports import EXPORT_CONTENT_TYPES, export_earnings, export_reservations, filter_reservations, \
+    write_rows
+from reservation.uploads import UploadError, UploadOffsetMismatch, append_chunk, complete_upload
+from reservation.permissions import CanAddOrUpdateProperty, AdminOnlyActions, CanAddOrUpdateReservation, \
+    CanExportReservations, can_export_all_reservations
+
+
+class PropertyViewSet(CachedReadMixin, ModelViewSet):
     """
     Create view set for property model
     """
-    # Use django-filter library to apply generic back-end filtering and search filter
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    # Set namespace of cached property responses
+    cache_namespace = 'property'
 
-    # Add search filter fields
-    search_fields = ['name', 'description']
+    # Use django-filter library to apply generic back-end filtering, and custom filters for full text search and
+    # available and nearby properties
+    filter_backends = [DjangoFilterBackend, FullTextSearchFilter, AvailablePropertyFilter, NearbyPropertyFilter,
+                       OrderingFilter]
+
+    # Add generic filter fields
+    filterset_fields = {'rating_average': ['gte', 'lte']}
 
     # Add sorting filter fields
-    ordering_fields = ['name', 'price_per_night']
+    ordering_fields = ['name', 'price_per_night', 'rating_average', 'rating_count']
 
     # Set custom permission class
     permission_classes = [IsAuthenticated, CanAddOrUpdateProperty]
 
+    # Set cursor pagination class
+    pagination_class = KeysetCursorPagination
+
     def get_queryset(self):
         """
         Define property api query-set
         :return:
         """
-        return Property.objects.select_related('category').prefetch_related('media').all()
+        queryset = Property.objects.all()
+        if self.request.method not in SAFE_METHODS:
+            return queryset
+        # Load only columns and relations of requested fields, and columns properties can be ordered and cached by
+        serializer_class = self.get_serializer_class()
+        requested_fields = self.get_requested_fields()
+        return queryset.only(*serializer_class.get_model_fields(requested_fields), 'created_at', 'updated_at',
+                             *self.ordering_fields).prefetch_related(
+            *serializer_class.get_prefetch_fields(requested_fields))
 
     def get_serializer_class(self):
         """
         Define property api serializer
         :return:
         """
+        # Use compact serializer to list properties
+        if self.action == 'list' and self.request.method in SAFE_METHODS:
+            return PropertyListSerializer
         return PropertySerializer
 
     def get_serializer_context(self):
@@ -45,18 +88,57 @@ class PropertyViewSet(ModelViewSet):
         Define property api context
         :return:
         """
-        return {'request': self.request}
+        context = {'request': self.request}
+        if self.request.method in SAFE_METHODS:
+            context['requested_fields'] = self.get_requested_fields()
+        return context
+
+    def get_requested_fields(self):
+        """
+        Define property fields requested with fields and expand query parameters
+        :return:
+        """
+        if not hasattr(self, '_requested_fields'):
+            self._requested_fields = self.get_serializer_class().get_requested_fields(self.request.query_params)
+        return self._requested_fields
+
+    @action(detail=False, methods=['post'], url_path='import')
+    def bulk_import(self, request, *args, **kwargs):
+        """
+        Import properties with their features from csv or newline delimited json request body and stream back
+        row errors and progress as newline delimited json
+        :param request:
+        :return:
+        """
+        import_format = IMPORT_CONTENT_TYPES.get(request.content_type.split(';')[0].strip())
+        if import_format is None:
+            raise ValidationError(f'Content type must be one of {", ".join(IMPORT_CONTENT_TYPES)}')
+        # Spool request body before streaming the response, large bodies are written to a temporary file
+        body = tempfile.SpooledTemporaryFile(max_size=settings.PROPERTY_IMPORT_SPOOL_SIZE)
+        if request.stream is not None:
+            shutil.copyfileobj(request.stream, body)
+        body.seek(0)
+        lines = io.TextIOWrapper(body, encoding='utf-8', newline='')
 
+        def stream_events():
+            with lines:
+                events = import_properties(read_rows(lines, import_format), request.user,
+                                           settings.PROPERTY_IMPORT_BATCH_SIZE)
+                for event in events:
+                    yield json.dumps(event) + '\n'
 
-class CategoryViewSet(ModelViewSet):
+        return StreamingHttpResponse(stream_events(), content_type='application/x-ndjson')
+
+
+class CategoryViewSet(CachedReadMixin, ModelViewSet):
     """
     Create view set for category model
     """
-    # Use django-filter library to apply generic back-end filtering and search filter
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    # Set namespace of cached category responses
+    cache_namespace = 'category'
 
-    # Add search filter fields
-    search_fields = ['name', 'description']
+    # Use django-filter library to apply generic back-end filtering and full text search filter
+    filter_backends = [DjangoFilterBackend, FullTextSearchFilter, OrderingFilter]
 
     # Add sorting filter fields
     ordering_fields = ['name']
@@ -64,12 +146,27 @@ class CategoryViewSet(ModelViewSet):
     # Set permission classes
     permission_classes = [IsAuthenticated, AdminOnlyActions]
 
+    # Set cursor pagination class
+    pagination_class = KeysetCursorPagination
+
     def get_queryset(self):
         """
         Define category api query-set
         :return:
         """
-        return Category.objects.prefetch_related('properties').all()
+        # Count properties in the category query instead of loading all properties of listed categories
+        return Category.objects.annotate(property_count=Count('properties'))
+
+    def get_cache_namespaces(self, pk=None):
+        """
+        Define category cache namespaces, category details expire with category list as property counts change
+        :param pk:
+        :return:
+        """
+        namespaces = super().get_cache_namespaces(pk)
+        if pk is not None:
+            namespaces.append('category:list')
+        return namespaces
 
     def get_serializer_class(self):
         """
@@ -93,6 +190,9 @@ class MediaViewSet(ModelViewSet):
     # Set  permission classes
     permission_classes = [IsAuthenticated, CanAddOrUpdateProperty]
 
+    # Set cursor pagination class
+    pagination_class = IdCursorPagination
+
     def get_queryset(self):
         """
         Define media api queryset
@@ -115,6 +215,76 @@ class MediaViewSet(ModelViewSet):
         return {'request': self.request, 'property_id': self.kwargs.get('property_pk')}
 
 
+class MediaUploadViewSet(CreateModelMixin, RetrieveModelMixin, GenericViewSet):
+    """
+    Create chunked media upload view set to upload property videos in resumable chunks
+    """
+    # Set permission classes
+    permission_classes = [IsAuthenticated, CanAddOrUpdateProperty]
+
+    def get_queryset(self):
+        """
+        Define media upload api queryset
+        :return:
+        """
+        return MediaUpload.objects.filter(property_id=self.kwargs.get('property_pk'), owner_id=self.request.user.id)
+
+    def get_serializer_class(self):
+        """
+        Define media upload api serializer
+        :return:
+        """
+        return MediaUploadSerializer
+
+    def get_serializer_context(self):
+        """
+        Define media upload api context
+        :return:
+        """
+        return {'request': self.request, 'property_id': self.kwargs.get('property_pk')}
+
+    @action(detail=True, methods=['put'])
+    def chunk(self, request, *args, **kwargs):
+        """
+        Append chunk streamed in request body at the offset given by content range header
+        :param request:
+        :return:
+        """
+        if request.stream is None:
+            raise ValidationError('Chunk body is empty')
+        with transaction.atomic():
+            # Lock upload so chunks of the same upload are appended one at a time
+            upload = get_object_or_404(self.get_queryset().select_for_update(), pk=kwargs['pk'])
+            if upload.state != MediaUpload.UPLOADING:
+                raise ValidationError('Upload is already complete')
+            try:
+                append_chunk(upload, request.stream, request.headers.get('Content-Range'))
+            except UploadOffsetMismatch as error:
+                return Response({'detail': str(error), 'received_size': upload.received_size},
+                                status=status.HTTP_409_CONFLICT)
+            except UploadError as error:
+                raise ValidationError(str(error))
+        return Response(self.get_serializer(upload).data)
+
+    @action(detail=True, methods=['post'])
+    def complete(self, request, *args, **kwargs):
+        """
+        Attach fully uploaded video to a new property media
+        :param request:
+        :return:
+        """
+        with transaction.atomic():
+            upload = get_object_or_404(self.get_queryset().select_for_update(), pk=kwargs['pk'])
+            if upload.state != MediaUpload.UPLOADING:
+                raise ValidationError('Upload is already complete')
+            try:
+                media = complete_upload(upload)
+            except UploadError as error:
+                raise ValidationError(str(error))
+        return Response(MediaSerializer(media, context=self.get_serializer_context()).data,
+                        status=status.HTTP_201_CREATED)
+
+
 class ReviewViewSet(ModelViewSet):
     """
     Create review view set for review model
@@ -122,6 +292,9 @@ class ReviewViewSet(ModelViewSet):
     # Set permission classes
     permission_classes = [IsAuthenticated]
 
+    # Set cursor pagination class
+    pagination_class = KeysetCursorPagination
+
     def get_queryset(self):
         """
         Define review api queryset
@@ -151,6 +324,9 @@ class FeatureCategoryViewSet(ModelViewSet):
     # Set permission classes
     permission_classes = [IsAuthenticated, AdminOnlyActions]
 
+    # Set cursor pagination class
+    pagination_class = IdCursorPagination
+
     def get_queryset(self):
         """
         Define feature category api queryset
@@ -180,6 +356,9 @@ class FeatureViewSet(ModelViewSet):
     # Set permission classes
     permission_classes = [IsAuthenticated, CanAddOrUpdateProperty]
 
+    # Set cursor pagination class
+    pagination_class = IdCursorPagination
+
     def get_queryset(self):
         """
         Define feature api queryset
@@ -202,6 +381,103 @@ class FeatureViewSet(ModelViewSet):
         return {'request': self.request, 'property_id': self.kwargs.get('property_pk')}
 
 
+class PropertyRateViewSet(ModelViewSet):
+    """
+    Create property rate view set for property rate model
+    """
+    # Set permission classes
+    permission_classes = [IsAuthenticated, CanAddOrUpdateProperty]
+
+    # Set cursor pagination class
+    pagination_class = IdCursorPagination
+
+    def get_queryset(self):
+        """
+        Define property rate api queryset
+        :return:
+        """
+        queryset = PropertyRate.objects.filter(property_id=self.kwargs.get('property_pk'))
+        # Let hosts manage rates of their own properties only
+        if not self.request.user.is_superuser:
+            queryset = queryset.filter(property__owner_id=self.request.user.id)
+        return queryset
+
+    def get_serializer_class(self):
+        """
+        Define property rate api serializer
+        :return:
+        """
+        return PropertyRateSerializer
+
+    def get_serializer_context(self):
+        """
+        Define property rate api context
+        :return:
+        """
+        return {'request': self.request, 'property_id': self.kwargs.get('property_pk')}
+
+
+class StayDiscountViewSet(ModelViewSet):
+    """
+    Create stay discount view set for length of stay discount model
+    """
+    # Set permission classes
+    permission_classes = [IsAuthenticated, CanAddOrUpdateProperty]
+
+    # Set cursor pagination class
+    pagination_class = IdCursorPagination
+
+    def get_queryset(self):
+        """
+        Define stay discount api queryset
+        :return:
+        """
+        queryset = StayDiscount.objects.filter(property_id=self.kwargs.get('property_pk'))
+        # Let hosts manage discounts of their own properties only
+        if not self.request.user.is_superuser:
+            queryset = queryset.filter(property__owner_id=self.request.user.id)
+        return queryset
+
+    def get_serializer_class(self):
+        """
+        Define stay discount api serializer
+        :return:
+        """
+        return StayDiscountSerializer
+
+    def get_serializer_context(self):
+        """
+        Define stay discount api context
+        :return:
+        """
+        return {'request': self.request, 'property_id': self.kwargs.get('property_pk')}
+
+
+class QuoteViewSet(ViewSet):
+    """
+    Create quote view set to price stays in a page of properties in one request
+    """
+    # Set permission classes
+    permission_classes = [IsAuthenticated]
+
+    def create(self, request, *args, **kwargs):
+        """
+        Price stay between check in and check out dates in each requested property
+        :param request:
+        :return:
+        """
+        serializer = QuoteRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        stay = serializer.validated_data
+        properties = Property.objects.only(*PRICING_FIELDS).in_bulk(stay['properties'])
+        unknown_ids = [property_id for property_id in stay['properties'] if property_id not in properties]
+        if unknown_ids:
+            raise ValidationError({'properties': f'Unknown properties: {", ".join(map(str, unknown_ids))}'})
+        quotes = quote_many([(properties[property_id], stay['check_in'], stay['check_out'])
+                             for property_id in dict.fromkeys(stay['properties'])])
+        return Response(QuoteSerializer(quotes, many=True).data)
+
+
 class ReservationViewSet(CreateModelMixin, RetrieveModelMixin, DestroyModelMixin, UpdateModelMixin, GenericViewSet):
     """
     Create reservation view set
@@ -225,6 +501,15 @@ class ReservationViewSet(CreateModelMixin, RetrieveModelMixin, DestroyModelMixin
         """
         return Reservation.objects.all()
 
+    @transaction.atomic
+    def create(self, request, *args, **kwargs):
+        """
+        Validate and insert reservation in a single transaction
+        :param request:
+        :return:
+        """
+        return super().create(request, *args, **kwargs)
+
     def get_serializer_class(self):
         """
         Define reservation api serializer
@@ -244,4 +529,41 @@ class ReservationViewSet(CreateModelMixin, RetrieveModelMixin, DestroyModelMixin
         """
         return {'request': self.request}
 
+    @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated, CanExportReservations])
+    def export(self, request, *args, **kwargs):
+        """
+        Stream reservations with their property and guest as csv or newline delimited json
+        :param request:
+        :return:
+        """
+        return self.get_export_response(request, export_reservations, 'reservations')
+
+    @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated, CanExportReservations])
+    def earnings(self, request, *args, **kwargs):
+        """
+        Stream monthly earnings of each property as csv or newline delimited json
+        :param request:
+        :return:
+        """
+        return self.get_export_response(request, export_earnings, 'earnings')
 
+    def get_export_response(self, request, export, name):
+        """
+        Build streaming export response of reservations the user can export, hosts export their properties only
+        :param request:
+        :param export: export function selecting columns and rows of reservations
+        :param name: name of downloaded file
+        :return:
+        """
+        serializer = ExportRequestSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+        owner = None if can_export_all_reservations(request.user) else request.user
+        columns, rows = export(filter_reservations(owner, params.get('date_from'), params.get('date_to')))
+        # Pin database chosen while the request is routed, rows are read after the view returns
+        rows = rows.using(rows.db)
+        response = StreamingHttpResponse(
+            write_rows(columns, rows, params['export_format'], settings.RESERVATION_EXPORT_CHUNK_SIZE),
+            content_type=EXPORT_CONTENT_TYPES[params['export_format']])
+        response['Content-Disposition'] = f'attachment; filename="{name}.{params["export_format"]}"'
+        return response